@@ -14,6 +14,7 @@ from sqlalchemy.orm import Session
 from core.auth import get_current_user
 from core.db import DB
 from core.models.message_task import MessageTask
+from core.models.message_task_log import MessageTaskLog
 from .base import success_response, error_response
 
 router = APIRouter(prefix="/message_tasks", tags=["消息任务"])
@@ -90,6 +91,39 @@ async def get_message_task(
         return success_response(data=message_task)
     except Exception as e:
         return error_response(code=500, message=str(e))
+@router.get("/{task_id}/logs", summary="获取消息任务的发送记录")
+async def list_message_task_logs(
+    task_id: str,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    获取消息任务的通知发送记录，按时间倒序
+    
+    参数:
+        task_id: 消息任务ID
+        limit: 每页返回的最大记录数
+        offset: 跳过的记录数
+        
+    返回:
+        包含发送记录列表的成功响应，或错误响应
+    """
+    try:
+        db=DB.get_session()
+        query = db.query(MessageTaskLog).filter(MessageTaskLog.task_id == task_id)
+        total = query.count()
+        logs = query.order_by(MessageTaskLog.created_at.desc()).offset(offset).limit(limit).all()
+        return success_response({
+            "list": logs,
+            "page": {
+                "limit": limit,
+                "offset": offset
+            },
+            "total": total
+        })
+    except Exception as e:
+        return error_response(code=500, message=str(e))
 @router.get("/message/test/{task_id}", summary="测试消息")
 async def test_message_task(
     task_id: str,
@@ -143,7 +177,8 @@ async def run_message_task(
             "count":0,
             "list":[]
         }
-        tasks=run(task_id,isTest=isTest)
+        # 手动执行优先于定时任务
+        tasks=run(task_id,isTest=isTest,priority="interactive")
         count=0
         if not tasks:
             raise HTTPException(status_code=404, detail="Message task not found")
@@ -176,6 +211,10 @@ class MessageTaskCreate(BaseModel):
     message_type: int=0
     cron_exp:str=""
     status: Optional[int] = 0
+    coalesce: Optional[int] = None
+    misfire_grace_time: Optional[int] = None
+    digest_window: Optional[int] = None
+    digest_size: Optional[int] = None
 
 @router.post("", summary="创建消息任务", status_code=status.HTTP_201_CREATED)
 async def create_message_task(
@@ -205,11 +244,17 @@ async def create_message_task(
             mps_id=task_data.mps_id,
             message_type=task_data.message_type,
             name=task_data.name,
-            status=task_data.status if task_data.status is not None else 0
+            status=task_data.status if task_data.status is not None else 0,
+            coalesce=task_data.coalesce if task_data.coalesce is not None else 1,
+            misfire_grace_time=task_data.misfire_grace_time,
+            digest_window=task_data.digest_window or 0,
+            digest_size=task_data.digest_size or 0
         )
         db.add(db_task)
         db.commit()
         db.refresh(db_task)
+        from jobs.mps import sync_job
+        sync_job(db_task.id)
         return success_response(data=db_task)
     except Exception as e:
         db.rollback()
@@ -257,8 +302,19 @@ async def update_message_task(
             db_task.message_type = task_data.message_type
         if task_data.name is not None:
             db_task.name = task_data.name
+        if task_data.coalesce is not None:
+            db_task.coalesce = task_data.coalesce
+        if task_data.misfire_grace_time is not None:
+            db_task.misfire_grace_time = task_data.misfire_grace_time
+        if task_data.digest_window is not None:
+            db_task.digest_window = task_data.digest_window
+        if task_data.digest_size is not None:
+            db_task.digest_size = task_data.digest_size
         db.commit()
         db.refresh(db_task)
+        # 只更新这一个任务的调度
+        from jobs.mps import sync_job
+        sync_job(task_id)
         return success_response(data=db_task)
     except Exception as e:
         db.rollback()
@@ -299,6 +355,8 @@ async def delete_message_task(
         
         db.delete(db_task)
         db.commit()
+        from jobs.mps import sync_job
+        sync_job(task_id)
         return success_response(message="Message task deleted successfully")
     except Exception as e:
         db.rollback()
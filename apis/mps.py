@@ -118,13 +118,9 @@ async def update_mps(
                     data={"time_span":time_span}
                 )
         result=[]    
-        def UpArt(mp):
-            from core.wx import WxGather
-            wx=WxGather().Model()
-            wx.get_Articles(mp.faker_id,Mps_id=mp.id,Mps_title=mp.mp_name,CallBack=UpdateArticle,start_page=start_page,MaxPage=end_page)
-            result=wx.articles
-        import threading
-        threading.Thread(target=UpArt,args=(mp,)).start()
+        from jobs.mps import TaskQueue,update_feed
+        # 手动更新优先于定时任务，与同一公众号的其他刷新串行执行
+        TaskQueue.add_task(update_feed,mp.id,start_page,end_page,serial_key=mp.id,dedupe_key=f"update:{mp.id}",priority="interactive")
         return success_response({
             "time_span":time_span,
             "list":result,
@@ -141,6 +137,30 @@ async def update_mps(
             )
         )
 
+@router.post("/{mp_id}/backfill", summary="回填公众号历史文章")
+async def backfill_mps(
+     mp_id: str,
+     pages: int = Query(None, ge=1, description="回填页数，默认max_page"),
+    current_user: dict = Depends(get_current_user)
+):
+    session = DB.get_session()
+    from core.models.feed import Feed
+    mp = session.query(Feed).filter(Feed.id == mp_id).first()
+    if not mp:
+        return error_response(
+                code=40401,
+                message="请选择一个公众号"
+            )
+    from jobs.backfill import Backfill
+    job=Backfill.add(mp,pages)
+    return success_response({
+        "feed_id":job.feed_id,
+        "page":job.page,
+        "max_page":job.max_page,
+        "fetched":job.fetched,
+        "status":job.status,
+    })
+
 @router.get("/{mp_id}", summary="获取公众号详情")
 async def get_mp(
     mp_id: str,
@@ -246,10 +266,9 @@ async def add_mp(
         feed = existing_feed if existing_feed else new_feed
          #在这里实现第一次添加获取公众号文章
         if not existing_feed:
-            from core.queue import TaskQueue
-            from core.wx import WxGather
-            Max_page=int(cfg.get("max_page","2"))
-            TaskQueue.add_task( WxGather().Model().get_Articles,faker_id=feed.faker_id,Mps_id=feed.id,CallBack=UpdateArticle,MaxPage=Max_page,Mps_title=mp_name)
+            # 按页回填历史文章，进度保存在数据库中，重启或频率限制冷却后继续
+            from jobs.backfill import Backfill
+            Backfill.add(feed,int(cfg.get("max_page","2")))
             
         return success_response({
             "id": feed.id,
@@ -1,20 +1,25 @@
 from fastapi import APIRouter, Request, HTTPException
-import httpx
 from fastapi.responses import Response
 import os
-import hashlib
-import time
-import json
 from core.config import cfg
+from core.res.proxy import ProxyEngine
+from core.res.variants import VariantSpec
 CACHE_DIR = cfg.get("cache.dir","data/cache")
-CACHE_TTL = 3600  # 缓存过期时间1小时
+# 缓存新鲜期，过期后在stale期限内先返回旧缓存并在后台重新验证 单位秒
+CACHE_TTL = cfg.get_int("cache.ttl",3600)
+CACHE_STALE_TTL = cfg.get_int("cache.stale_ttl",7*86400)
 
 if not os.path.exists(CACHE_DIR):
     os.makedirs(CACHE_DIR)
 
+Proxy = ProxyEngine(CACHE_DIR, fresh_ttl=CACHE_TTL, stale_ttl=CACHE_STALE_TTL,
+                    processes=cfg.get_int("cache.image_processes",2))
+
 router = APIRouter(prefix="/res", tags=["资源反向代理"])
+router.add_event_handler("shutdown", Proxy.aclose)
 @router.api_route("/logo/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "PATCH"], operation_id="reverse_proxy_logo")
 async def reverse_proxy(request: Request, path: str):
+    """代理公众号图片，支持 w/h(像素)、fmt(webp/jpeg/png)、q(质量) 参数生成缩略图"""
     hosts=["mmbiz.qpic.cn","mmbiz.qlogo.cn","mmecoa.qpic.cn"]
     path=path.replace("https://", "http://")
     from urllib.parse import urlparse
@@ -27,68 +32,17 @@ async def reverse_proxy(request: Request, path: str):
         headers={"Location":path},
     )
     
-    # 生成缓存文件名
-    cache_key = f"{request.method}_{path}".encode('utf-8')
-    cache_filename = os.path.join(CACHE_DIR, hashlib.sha256(cache_key).hexdigest())
-    
-    # 检查缓存是否存在且有效
-    if os.path.exists(cache_filename):
-        file_mtime = os.path.getmtime(cache_filename)
-        if time.time() - file_mtime < CACHE_TTL:
-            with open(cache_filename, 'rb') as f:
-                content = f.read()
-            
-            # 读取缓存的状态码和响应头
-            headers_filename = cache_filename + ".headers"
-            if os.path.exists(headers_filename):
-                with open(headers_filename, 'r', encoding='utf-8') as f:
-                    headers = json.load(f)
-            else:
-                headers = {}
-            
-            media_type = headers.get("Content-Type")
-            status_code = 200  # 默认状态码
-            
-            return Response(
-                content=content,
-                status_code=status_code,
-                headers=headers,
-                media_type=media_type
-            )
-    
-    target_url = path
-    
-    client = httpx.AsyncClient()
-    request_data = await request.body()
-    headers = dict(request.headers)
-    headers.pop("host", host)
-    headers.pop("referer", None)
-    print(headers)
-    resp = await client.request(
-        method=request.method,
-        url=target_url,
-        # headers=headers,
-        content=request_data
-    )
-    
-    content = resp.content
-    status_code = resp.status_code
-    headers = dict(resp.headers)
-    media_type = resp.headers.get("Content-Type")
-    try:
-        # 缓存响应
-        with open(cache_filename, 'wb') as f:
-            f.write(content)
-        
-        # 缓存响应头
-        headers_filename = cache_filename + ".headers"
-        with open(headers_filename, 'w', encoding='utf-8') as f:
-            json.dump(headers, f)
-    except Exception as e:
-        print(f"缓存响应失败: {str(e)}")    
-    return Response(
-        content=content,
-        status_code=status_code,
-        headers=headers,
-        media_type=media_type
-    )
\ No newline at end of file
+    # 文章图片已保存到本地图片库时直接返回
+    from core.res.images import Images
+    local_file=Images.resolve(path)
+    # ?w=320&h=0&fmt=webp&q=80 返回缩放/转换后的图片
+    spec=VariantSpec.parse(request.query_params) if request.method == "GET" else None
+    if spec is not None:
+        return await Proxy.variant(path, spec, source=local_file)
+    if local_file:
+        from fastapi.responses import FileResponse
+        return FileResponse(local_file,headers={"Cache-Control":"public, max-age=31536000, immutable"})
+
+    if request.method != "GET":
+        return await Proxy.passthrough(request.method, path, await request.body())
+    return await Proxy.get(path)
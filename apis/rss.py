@@ -238,13 +238,24 @@ async def get_mp_articles_source(
         # 转换为RSS格式数据
         from datetime import datetime, timezone, timedelta
         cst = timezone(timedelta(hours=8))
+        from core.res.images import Images,absolute_urls,localize_enabled
+        from core.res.variants import thumb_url
+        local_images=localize_enabled()
+        cover_width=cfg.get_int("rss.cover_width",0)
+        def cover(pic_url):
+            # 配置了封面宽度时输出WebP缩略图，否则优先使用已本地化的图片
+            if cover_width and pic_url and pic_url.startswith(("http://","https://")):
+                return thumb_url(pic_url,str(rss_domain),cover_width),"image/webp"
+            return (local_images and Images.public_url(pic_url,str(rss_domain))) or pic_url or "","image/jpeg"
         rss_list = [{
             "id": str(article.id),
             "title": article.title or "",
             "link":  f"{rss_domain}rss/feed/{article.id}" if cfg.get("rss.local",False) else article.url,
             "description": article.description if article.description != "" else article.title or "",
-            "content": article.content or "",
-            "image": article.pic_url or "",
+            # 已本地化的图片使用本站地址
+            "content": absolute_urls(article.content or "",str(rss_domain)),
+            "image": cover(article.pic_url)[0],
+            "image_type": cover(article.pic_url)[1],
             "mp_name":_feed.mp_name or "",
             "updated": datetime.fromtimestamp(article.publish_time, tz=cst),
             "feed": {
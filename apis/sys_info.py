@@ -1,14 +1,25 @@
+import hmac
 import platform
 import time
 import sys
 import psutil
-from fastapi import APIRouter,Depends
+from fastapi import APIRouter,Depends,Request
+from fastapi.responses import PlainTextResponse
 from typing import Dict, Any
 from core.auth import get_current_user
 from .base import success_response, error_response
-from driver.token import wx_cfg
+from driver.token import wx_cfg,Credentials,Accounts
 from core.config import cfg
 from jobs.mps import TaskQueue
+from core.queue.metrics import Metrics
+from core.wx.extract import Extractor
+from jobs.adaptive import Planner
+from jobs.refresh import Refresher
+from jobs.worker import Leases,lease_enabled
+from jobs.backfill import Backfill
+from jobs.digest import Digests
+from apis.res import Proxy
+from core.notice import Dispatcher
 from driver.success import getLoginInfo,getStatus
 router = APIRouter(prefix="/sys", tags=["系统信息"])
 
@@ -75,7 +86,7 @@ async def get_system_info(
     """
     try:
       
-        wx_cfg.reload()
+        Credentials.check()
         # 获取系统信息
         system_info = {
             'os': {
@@ -99,13 +110,61 @@ async def get_system_info(
                 'expiry_time':wx_cfg.get('expiry.expiry_time','') if getStatus() else "",
                 "info":getLoginInfo(),
                 "login":getStatus(),
+                "accounts":Accounts.get_status(),
             },
             "article":ARTICLE_INFO,
             'queue':TaskQueue.get_queue_info(),
+            'content_extract':Extractor.get_stats(),
+            'schedule':{'mode':cfg.get("gather.schedule_mode","cron"),'adaptive':Planner.get_status(),
+                        'dispatch':cfg.get("gather.dispatch","queue"),'feed_jobs':Leases.get_stats() if lease_enabled() else {}},
+            'feed_refresh':Refresher.get_stats(),
+            'backfill':Backfill.get_stats(),
+            'image_proxy':Proxy.get_stats(),
+            'notice':Dispatcher.get_stats(),
+            'digest':Digests.get_stats(),
         }
         return success_response(data=system_info)
     except Exception as e:
         return error_response(
             code=50001,
             message=f"获取系统信息失败: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+@router.get("/queue", summary="获取任务队列指标")
+async def get_queue_metrics(
+    current_user: dict = Depends(get_current_user)
+) -> Dict[str, Any]:
+    """获取任务队列状态和各类任务的执行指标
+
+    Returns:
+        BaseResponse格式的队列指标，包括:
+        - queues: 各队列的实时状态和最近的死信
+        - tasks: 按任务类型汇总的排队等待时间、执行时间分位数，成功/失败次数和频率限制次数
+    """
+    try:
+        queues = {}
+        for queue in Metrics.queues():
+            queues[queue.durable or queue.tag] = {**queue.get_queue_info(), "dead": queue.dead_letters(20)}
+        return success_response(data={"queues": queues, **Metrics.snapshot()})
+    except Exception as e:
+        return error_response(
+            code=50001,
+            message=f"获取队列指标失败: {str(e)}"
+        )
+
+async def metrics_auth(request: Request):
+    """配置了 queue.metrics.token 时可以用该令牌抓取，否则需要登录"""
+    token = cfg.get_str("queue.metrics.token", "")
+    auth = request.headers.get("Authorization", "")
+    bearer = auth[7:] if auth.lower().startswith("bearer ") else ""
+    if token:
+        # 固定时间比较，避免按响应时间逐位猜出令牌
+        expected = token.encode("utf-8")
+        for candidate in (bearer, request.query_params.get("token") or ""):
+            if candidate and hmac.compare_digest(candidate.encode("utf-8"), expected):
+                return None
+    return await get_current_user(bearer)
+
+@router.get("/metrics", summary="Prometheus 指标", response_class=PlainTextResponse)
+async def prometheus_metrics(_: Any = Depends(metrics_auth)):
+    return PlainTextResponse(Metrics.prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -2,12 +2,15 @@ import yaml
 import sys
 import os
 import argparse
+import copy
 from string import Template
 from core.print import print_warning, print_error,print_info
 from .file import FileCrypto
 class Config: 
     config_path=None
     config={}
+    # 解析过环境变量并展开为 点号路径->值 的配置快照，只在加载/保存配置时重建
+    _snapshot={}
     def __init__(self, config_path=None, encrypt=False):
         self.args = self.parse_args()
         self.config_path = config_path or self.args.config
@@ -116,10 +119,13 @@ class Config:
                     config = yaml.safe_load(content)
                 
                 if config is None:
+                    self._config = {}
+                    self._build_snapshot()
                     return {}
                 
                 self.config = config
                 self._config = self.replace_env_vars(config)
+                self._build_snapshot()
                 return self.config
         except Exception as e:
             print_error(f"加载配置文件 {self.config_path} 错误: {e}")
@@ -145,23 +151,48 @@ class Config:
             return v
         except:
             return v
+    def _build_snapshot(self):
+        """把解析过环境变量的配置展开成 点号路径->值，get时只需一次字典查找"""
+        snapshot={}
+        def walk(prefix,value):
+            if prefix:
+                snapshot[prefix]=self.__fix(value)
+            if isinstance(value,dict):
+                for k,v in value.items():
+                    walk(f"{prefix}.{k}" if prefix else str(k),v)
+        walk("",self._config if isinstance(self._config,dict) else {})
+        self._snapshot=snapshot
     def get(self,key,default:any=None):
-        _config=self.replace_env_vars(self.config)
-        
-        # 支持嵌套key访问
-        keys = key.split('.') if isinstance(key, str) else [key]
-        value = _config
+        # 支持嵌套key访问，如 rss.add_cover
         try:
-            for k in keys:
-                value = value[k]
-            val=self.__fix(value)
-            if val is None and default is not None  :
-                return default
-            else:
-                return val
-        except (KeyError, TypeError):
+            val=self._snapshot[key if isinstance(key, str) else str(key)]
+        except KeyError:
             print_warning("Key {} not found in configuration".format(key))
-        return default 
+            return default
+        if isinstance(val,(dict,list)):
+            # 避免调用方修改快照
+            return copy.deepcopy(val)
+        if val is None and default is not None  :
+            return default
+        return val
+    def get_bool(self,key,default:bool=False)->bool:
+        val=self.get(key,default)
+        if isinstance(val,str):
+            return val.strip().lower() in ("true","1","yes","on")
+        return bool(val)
+    def get_int(self,key,default:int=0)->int:
+        try:
+            return int(float(self.get(key,default)))
+        except (TypeError,ValueError):
+            return default
+    def get_float(self,key,default:float=0.0)->float:
+        try:
+            return float(self.get(key,default))
+        except (TypeError,ValueError):
+            return default
+    def get_str(self,key,default:str="")->str:
+        val=self.get(key,default)
+        return default if val is None else str(val)
 
 cfg=Config()
 def set_config(key:str,value:str):
@@ -0,0 +1,179 @@
+import re
+from html import escape
+from lxml import html as lxml_html
+from lxml import etree
+
+# 文章HTML清理规则，按声明顺序编译，在一次lxml树遍历中全部应用
+# action:
+#   remove      移除匹配的节点(tags/attr+contains/attr+equals/class_or_id)
+#   comments    移除注释
+#   strip_root  移除正文根节点上的属性
+#   rewrite     将属性from的值移到属性to
+#   style       替换style中匹配pattern的部分
+#   drop_empty  移除没有文本且不含媒体的节点
+CLEAN_RULES = [
+    {"action": "remove", "tags": ["script", "style", "noscript", "iframe", "link", "head", "header", "footer", "nav", "aside"]},
+    {"action": "comments"},
+    {"action": "remove", "attr": "style", "contains": ["display: none", "display:none"]},
+    {"action": "remove", "attr": "aria-hidden", "contains": ["true"]},
+    {"action": "remove", "tags": ["div"], "class_or_id": ["ad", "ads", "advertisement", "banner"]},
+    {"action": "strip_root", "attrs": ["style"]},
+    {"action": "rewrite", "tags": ["img"], "from": "data-src", "to": "src"},
+    {"action": "style", "tags": ["img"], "pattern": r"width\s*:\s*\d+\s*px", "replace": "width: 1080px"},
+    {"action": "drop_empty", "keep": ["img", "video", "audio", "picture", "source", "track", "canvas", "svg", "embed", "object", "br", "hr", "mpvoice", "mpvideo",
+                                     # 空单元格删除后同一行后面的列会错位
+                                     "td", "th", "tr", "col", "colgroup"]},
+]
+
+def _drop(el) -> None:
+    """移除节点，保留其后的文本"""
+    parent = el.getparent()
+    if parent is None:
+        return
+    if el.tail:
+        prev = el.getprevious()
+        if prev is not None:
+            prev.tail = (prev.tail or "") + el.tail
+        else:
+            parent.text = (parent.text or "") + el.tail
+    parent.remove(el)
+
+class HtmlCleaner:
+    """单次遍历的文章HTML清理器
+
+    规则在初始化时编译，清理时只解析一次文档、遍历一次节点树，输出紧凑HTML
+    """
+
+    def __init__(self, rules: list = None):
+        self.remove_tags = set()
+        self.remove_attrs = []
+        self.remove_tokens = {}
+        self.remove_comments = False
+        self.strip_root = []
+        self.rewrites = {}
+        self.styles = {}
+        self.drop_empty = False
+        self.keep_empty = set()
+        for rule in rules if rules is not None else CLEAN_RULES:
+            self._compile(rule)
+
+    def _compile(self, rule: dict) -> None:
+        action = rule.get("action")
+        tags = rule.get("tags", [])
+        if action == "remove":
+            if "attr" in rule:
+                self.remove_attrs.append((rule["attr"], tuple(rule.get("contains", []))))
+            elif "class_or_id" in rule:
+                for tag in tags:
+                    self.remove_tokens.setdefault(tag, set()).update(rule["class_or_id"])
+            else:
+                self.remove_tags.update(tags)
+        elif action == "comments":
+            self.remove_comments = True
+        elif action == "strip_root":
+            self.strip_root.extend(rule.get("attrs", []))
+        elif action == "rewrite":
+            for tag in tags:
+                self.rewrites.setdefault(tag, []).append((rule["from"], rule["to"]))
+        elif action == "style":
+            pattern = re.compile(rule["pattern"])
+            for tag in tags:
+                self.styles.setdefault(tag, []).append((pattern, rule["replace"]))
+        elif action == "drop_empty":
+            self.drop_empty = True
+            self.keep_empty.update(rule.get("keep", []))
+        else:
+            raise ValueError(f"未知的清理规则: {action}")
+
+    def _should_remove(self, el) -> bool:
+        tag = el.tag
+        if not isinstance(tag, str):
+            # 注释、处理指令等非元素节点
+            return self.remove_comments
+        if tag in self.remove_tags:
+            return True
+        attrib = el.attrib
+        for name, contains in self.remove_attrs:
+            value = attrib.get(name)
+            if value is not None and any(c in value for c in contains):
+                return True
+        tokens = self.remove_tokens.get(tag)
+        if tokens:
+            names = f"{attrib.get('class', '')} {attrib.get('id', '')}"
+            if tokens.intersection(re.split(r"[\s_-]+", names)):
+                return True
+        return False
+
+    def _rewrite(self, el) -> None:
+        tag = el.tag
+        for src, dst in self.rewrites.get(tag, ()):
+            value = el.attrib.pop(src, None)
+            if value:
+                el.set(dst, value)
+        for pattern, replace in self.styles.get(tag, ()):
+            style = el.get("style")
+            if style:
+                el.set("style", pattern.sub(replace, style))
+
+    def _is_empty(self, el) -> bool:
+        return (len(el) == 0
+                and el.tag not in self.keep_empty
+                and not (el.text or "").strip())
+
+    def clean_element(self, root) -> None:
+        """原地清理以root为根的节点树(前序处理删除/改写，后序处理空节点)"""
+        for name in self.strip_root:
+            root.attrib.pop(name, None)
+        stack = [(root, False)]
+        while stack:
+            el, visited = stack.pop()
+            if visited:
+                if self.drop_empty and el is not root and self._is_empty(el):
+                    _drop(el)
+                continue
+            if el is not root and self._should_remove(el):
+                _drop(el)
+                continue
+            if not isinstance(el.tag, str):
+                continue
+            self._rewrite(el)
+            stack.append((el, True))
+            stack.extend((child, False) for child in reversed(el))
+
+    def to_html(self, el, inner: bool = False) -> str:
+        """序列化为紧凑HTML，inner=True时只输出子节点"""
+        if not inner:
+            return lxml_html.tostring(el, encoding="unicode")
+        parts = [escape(el.text or "", quote=False)]
+        parts.extend(lxml_html.tostring(child, encoding="unicode") for child in el)
+        return "".join(parts)
+
+    def clean(self, html_content: str, root_id: str = None) -> str:
+        """清理HTML
+
+        Args:
+            html_content: 完整页面或HTML片段
+            root_id: 指定时从完整页面中取该id的节点作为正文，找不到返回空字符串
+
+        Returns:
+            清理后的紧凑HTML
+        """
+        if not html_content or not html_content.strip():
+            return ""
+        try:
+            if root_id:
+                root = lxml_html.document_fromstring(html_content).get_element_by_id(root_id, None)
+                if root is None:
+                    return ""
+                self.clean_element(root)
+                return self.to_html(root)
+            root = lxml_html.fragment_fromstring(html_content, create_parent="div")
+            self.clean_element(root)
+            return self.to_html(root, inner=True)
+        except (etree.ParserError, ValueError):
+            return ""
+
+cleaner = HtmlCleaner()
+
+def clean_html(html_content: str, root_id: str = None) -> str:
+    return cleaner.clean(html_content, root_id=root_id)
@@ -1,5 +1,6 @@
 import re
-from typing import Any, Dict, List, Union
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
 # """
 # 模板引擎使用示例
 
@@ -8,50 +9,339 @@ from typing import Any, Dict, List, Union
 # 2. 条件判断: {% if condition %}...{% endif %}
 # 3. 循环结构: {% for item in items %}...{% endfor %}
 # """
+
+# Split template into static parts, control blocks {% ... %} and variables {{ ... }}
+_TOKEN_PATTERN = re.compile(
+    r'(\{\%.*?\%\})|'  # control blocks {% ... %}
+    r'(\{\{.*?\}\})'    # variables {{ ... }}
+)
+
+_SAFE_GLOBALS = {
+    'None': None,
+    'True': True,
+    'False': False,
+    'bool': bool,
+    'int': int,
+    'float': float,
+    'str': str,
+    'list': list,
+    'dict': dict,
+    'tuple': tuple,
+    'len': len,
+    'sum': sum,
+    'min': min,
+    'max': max,
+    'abs': abs,
+    'round': round
+}
+
+_FORBIDDEN = (
+    'import', 'open', 'exec', 'eval', 'system', 'subprocess',
+    '__import__', 'getattr', 'setattr', 'delattr', 'compile',
+    'globals', 'locals', 'vars', 'dir', 'help', 'reload',
+    'input', 'file', 'execfile', 'exit', 'quit'
+)
+
+_DANGEROUS = '[Error: Potentially dangerous expression detected]'
+
+# A compiled node appends its output for the given context and eval globals
+_Node = Callable[[Dict[str, Any], Dict[str, Any], List[str]], None]
+
+
+def _is_safe_expression(expr: str) -> bool:
+    """Check if an expression contains potentially dangerous operations."""
+    expr_lower = expr.lower()
+    return not any(keyword in expr_lower for keyword in _FORBIDDEN)
+
+
+def _compile_expression(expr: str):
+    """Compile an expression to a code object, returns (code, error)."""
+    if not _is_safe_expression(expr):
+        return None, _DANGEROUS
+    try:
+        # eval() strips leading whitespace of source strings, compile() does not
+        return compile(expr.lstrip(' \t'), '<string>', 'eval'), None
+    except Exception as e:
+        return None, f'[Error: {str(e)}]'
+
+
+def _lookup(context: Dict[str, Any], names: Tuple[str, ...], default: Any) -> Any:
+    """Resolve nested attribute access like user.name on dicts and objects."""
+    current = context.get(names[0], {})
+    for name in names[1:]:
+        if isinstance(current, dict):
+            current = current.get(name, default)
+        else:
+            current = getattr(current, name, default)
+        if current is None:
+            return None
+    return current
+
+
+def _text_node(text: str) -> _Node:
+    def render(context, env, out):
+        out.append(text)
+    return render
+
+
+def _variable_node(var_expr: str) -> _Node:
+    """Compile {{ var }}, {{ var.attr }} and {{= expression }}."""
+    if var_expr.startswith('='):
+        code, error = _compile_expression(var_expr[1:])
+        if error is not None:
+            return _text_node(error)
+
+        def render(context, env, out):
+            try:
+                out.append(str(eval(code, env, context)))
+            except Exception as e:
+                out.append(f'[Error: {str(e)}]')
+        return render
+
+    if '.' in var_expr:
+        names = tuple(var_expr.split('.'))
+
+        def render(context, env, out):
+            value = _lookup(context, names, '')
+            out.append('' if value is None else str(value))
+        return render
+
+    def render(context, env, out):
+        out.append(str(context.get(var_expr, '')))
+    return render
+
+
+def _condition(condition: str) -> Callable[[Dict[str, Any], Dict[str, Any]], bool]:
+    """Compile the condition of an if block into a predicate."""
+    if not _is_safe_expression(condition):
+        return lambda context, env: False
+
+    # Special handling for loop variables
+    if 'loop.' in condition:
+        has_not = 'not ' in condition
+        loop_var = condition.split('loop.')[-1].strip()
+        if has_not:
+            loop_var = loop_var.replace('not ', '').strip()
+        default = {'last': False, 'first': False, 'index': 0, 'index0': 0}.get(loop_var)
+
+        def test(context, env):
+            if default is None:
+                return has_not
+            try:
+                result = context.get('loop', {}).get(loop_var, default)
+            except Exception:
+                return False
+            return not result if has_not else bool(result)
+        return test
+
+    # Function calls with = prefix
+    if condition.startswith('='):
+        code, error = _compile_expression(condition[1:])
+
+        def test(context, env):
+            if error is not None:
+                return False
+            try:
+                return bool(eval(code, env, context.copy()))
+            except Exception:
+                return False
+        return test
+
+    # Nested attribute access (e.g. user.is_admin)
+    if '.' in condition:
+        names = tuple(condition.split('.'))
+
+        def test(context, env):
+            try:
+                value = _lookup(context, names, None)
+            except Exception:
+                return False
+            if value is None or (isinstance(value, (list, dict, set)) and not value):
+                return False
+            return bool(value)
+        return test
+
+    # Direct variable reference, other expressions are evaluated
+    code, error = _compile_expression(condition)
+
+    def test(context, env):
+        try:
+            if condition in context:
+                value = context[condition]
+                if isinstance(value, (list, dict, set)):
+                    return len(value) > 0
+                return bool(value)
+            if error is not None:
+                return False
+            return bool(eval(code, env, context.copy()))
+        except Exception:
+            return False
+    return test
+
+
+def _sequence(nodes: List[_Node]) -> _Node:
+    if len(nodes) == 1:
+        return nodes[0]
+
+    def render(context, env, out):
+        for node in nodes:
+            node(context, env, out)
+    return render
+
+
+def _if_node(condition: str, body: List[_Node], orelse: List[_Node]) -> _Node:
+    test = _condition(condition)
+    body = _sequence(body)
+    orelse = _sequence(orelse)
+
+    def render(context, env, out):
+        if test(context, env):
+            body(context, env, out)
+        else:
+            orelse(context, env, out)
+    return render
+
+
+def _for_node(block: str, body: List[_Node]) -> _Node:
+    """Compile {% for item in items %}, rendered items are joined with newlines."""
+    loop_var, iterable = (part.strip() for part in block[4:].split(' in ', 1))
+    code, error = _compile_expression(iterable)
+    body = _sequence(body)
+
+    def render(context, env, out):
+        if iterable in context:
+            items = context[iterable]
+        elif error is not None:
+            return
+        else:
+            try:
+                items = eval(code, env, context)
+            except Exception:
+                return
+        items = list(items) if items else []
+        total_items = len(items)
+        parent = context.get('loop')
+        loop_output = []
+        for item_idx, item in enumerate(items):
+            loop_context = context.copy()
+            loop_context[loop_var] = item
+            loop_context['loop'] = {
+                'index': item_idx + 1,
+                'index0': item_idx,
+                'first': item_idx == 0,
+                'last': item_idx == total_items - 1,
+                'length': total_items,
+                'parentloop': parent  # Save parent loop context
+            }
+            item_output = []
+            body(loop_context, env, item_output)
+            loop_output.append(''.join(item_output))
+        if loop_output:
+            out.append('\n'.join(loop_output))
+    return render
+
+
+def _parse(tokens: List[str], pos: int, stops: Tuple[str, ...]) -> Tuple[List[_Node], int, Optional[str]]:
+    """
+    Parse tokens into nodes until one of the stop tags.
+
+    Returns (nodes, position of the stop tag, stop tag), the stop tag is None at the end of the template.
+    """
+    nodes = []
+    while pos < len(tokens):
+        part = tokens[pos]
+        if part.startswith('{{') and part.endswith('}}'):
+            nodes.append(_variable_node(part[2:-2].strip()))
+            pos += 1
+            continue
+        if not (part.startswith('{%') and part.endswith('%}')):
+            nodes.append(_text_node(part))
+            pos += 1
+            continue
+
+        block = part[2:-2].strip()
+        if block in stops:
+            return nodes, pos, block
+        pos += 1
+        if block.startswith('if '):
+            body, pos, stop = _parse(tokens, pos, ('else', 'endif') + stops)
+            orelse = []
+            if stop == 'else':
+                orelse, pos, stop = _parse(tokens, pos + 1, ('endif',) + stops)
+            if stop == 'endif':
+                nodes.append(_if_node(block[3:].strip(), body, orelse))
+                pos += 1
+            else:
+                # Without a matching endif the tag is ignored and its content rendered as is
+                nodes.extend(body + orelse)
+        elif block.startswith('for ') and ' in ' in block:
+            body, pos, stop = _parse(tokens, pos, ('endfor',) + stops)
+            nodes.append(_for_node(block, body))
+            if stop == 'endfor':
+                pos += 1
+        # Stray endif/endfor/else and unknown blocks render nothing
+    return nodes, pos, None
+
+
+class CompiledTemplate:
+    """A template parsed once into a tree of render functions, expressions compiled to code objects."""
+
+    def __init__(self, template: str):
+        tokens = [part for part in _TOKEN_PATTERN.split(template) if part]
+        nodes, _, _ = _parse(tokens, 0, ())
+        self._render = _sequence(nodes)
+
+    def render(self, context: Dict[str, Any], env: Dict[str, Any]) -> str:
+        output = []
+        self._render(context, env, output)
+        return ''.join(output)
+
+
+@lru_cache(maxsize=256)
+def compile_template(template: str) -> CompiledTemplate:
+    """Compile a template, compiled templates are cached by template content."""
+    return CompiledTemplate(template)
+
+
 class TemplateParser:
     """A lightweight template engine supporting variables, conditions and loops."""
-    
+
     def __init__(self, template: str):
         """Initialize the template parser with a template string."""
         self.template = template
         self.compiled = None
         self.custom_functions = {}
-        
+
     def register_function(self, name: str, func: callable) -> None:
         """
         Register a custom function to be available in template expressions.
-        
+
         Args:
             name: The name to use in templates
             func: The function to register
         """
         self.custom_functions[name] = func
-        
+
     def register_functions(self, functions: Dict[str, callable]) -> None:
         """
         Register multiple custom functions at once.
-        
+
         Args:
             functions: Dictionary of function names to functions
         """
         self.custom_functions.update(functions)
 
     def compile_template(self) -> None:
-        """Compile the template into an intermediate representation."""
-        # Split template into static parts and control blocks
-        pattern = re.compile(
-            r'(\{\%.*?\%\})|'  # control blocks {% ... %}
-            r'(\{\{.*?\}\})'    # variables {{ ... }}
-        )
-        self.compiled = pattern.split(self.template)
-        
+        """Compile the template into a render tree (shared by parsers with the same template)."""
+        self.compiled = compile_template(self.template)
+
     def render(self, context: Dict[str, Any]) -> str:
         """
         Render the template with the given context.
-        
+
         Args:
             context: A dictionary containing variables for template rendering
-            
+
         Returns:
             The rendered template as a string
         """
@@ -59,489 +349,13 @@ class TemplateParser:
         for key in context.keys():
             if not isinstance(key, str) or not key.isidentifier():
                 raise ValueError(f"Invalid context key: {key}. Keys must be valid Python identifiers")
-        
+
         if self.compiled is None:
             self.compile_template()
-            
-        output = []
-        i = 0
-        while i < len(self.compiled):
-            part = self.compiled[i]
-            
-            if part is None:
-                i += 1
-                continue
-                
-            # Handle static text (preserve original formatting)
-            if not (part.startswith('{{') or part.startswith('{%')):
-                output.append(part)
-                i += 1
-                continue
-                
-            # Handle variables {{ var }} and nested {{ var.attr }} and eval expressions
-            if part.startswith('{{') and part.endswith('}}'):
-                # print(f"\nProcessing variable part: {part}")
-                var_expr = part[2:-2].strip()
-                # print(f"Extracted expression: {var_expr}")
-                
-                # Check if this is an eval expression (starts with =)
-                if var_expr.startswith('='):
-                    try:
-                        # Evaluate the expression (after =)
-                        expr = var_expr[1:]
-                        if not self._is_safe_expression(expr):
-                            raise ValueError("Potentially dangerous expression detected")
-                            
-                        # Create safe evaluation environment
-                        safe_globals = self._get_safe_globals()
-                        eval_globals = {**safe_globals, **self.custom_functions}
-                        
-                        result = eval(expr, eval_globals, context)
-                        output.append(str(result))
-                    except Exception as e:
-                        output.append(f'[Error: {str(e)}]')
-                elif '.' in var_expr:
-                    # print(f"DEBUG - Processing nested variable: {var_expr}")  # Debug
-                    # Handle nested attribute access
-                    parts = var_expr.split('.')
-                    current = context.get(parts[0], {})
-                    for part_name in parts[1:]:
-                        if isinstance(current, dict):
-                            current = current.get(part_name, '')
-                        else:
-                            current = getattr(current, part_name, '')
-                        if current is None:
-                            current = ''
-                            break
-                    output.append(str(current))
-                else:
-                    # Simple variable access
-                    output.append(str(context.get(var_expr, '')))
-                i += 1
-                
-            # Handle control blocks {% ... %}
-            elif part.startswith('{%') and part.endswith('%}'):
-                block = part[2:-2].strip()
-                
-                # Handle if condition
-                if block.startswith('if '):
-                    condition = block[3:].strip()
-                    result, updated_context = self._evaluate_condition(condition, context)
-                    # Merge all variables except special ones and functions
-                    for k, v in updated_context.items():
-                        if not k.startswith('__') and k not in self.custom_functions:
-                            # Only update context if the key doesn't exist or was modified
-                            if k not in context or context[k] != v:
-                                context[k] = v
-                    # Ensure final_price is available in context if it was calculated
-                    if 'final_price' in updated_context:
-                        context['final_price'] = updated_context['final_price']
-                    
-                    # Find matching endif using helper method
-                    endif_idx = self._skip_control_block(i, 'if', 'endif')
-                    if endif_idx == len(self.compiled):
-                        i += 1
-                        continue
-                    
-                    # Find else if exists
-                    else_idx = -1
-                    for j in range(i+1, endif_idx):
-                        part = self.compiled[j]
-                        if isinstance(part, str) and part.strip() in ('{% else %}', 'else'):
-                            else_idx = j
-                            break
-                    
-                    # Process the appropriate block
-                    if result:
-                        # Process if block (from current position to else or endif)
-                        end_idx = else_idx if else_idx != -1 else endif_idx
-                        if_content = self.compiled[i+1:end_idx]
-                        
-                        if_parser = TemplateParser('')
-                        if_parser.compiled = if_content
-                        rendered = if_parser.render(context)
-                        output.append(rendered)
-                    elif else_idx != -1:
-                        # Process else block
-                        else_content = self.compiled[else_idx+1:endif_idx]
-                        
-                        else_parser = TemplateParser('')
-                        else_parser.compiled = else_content
-                        rendered = else_parser.render(context)
-                        output.append(rendered)
-                    
-                    # Skip to after endif
-                    i = endif_idx + 1
-                    continue
-                    
-                # Handle for loop
-                elif block.startswith('for ') and ' in ' in block:
-                    loop_var, iterable = self._parse_for_block(block)
-                    items = self._get_iterable(iterable, context)
-                    
-                    # Collect loop content
-                    loop_content = []
-                    j = i + 1
-                    endfor_idx = j
-                    while j < len(self.compiled):
-                        inner_part = self.compiled[j]
-                        if (isinstance(inner_part, str) and 
-                            inner_part.startswith('{% endfor %}')):
-                            endfor_idx = j
-                            break
-                        loop_content.append(str(inner_part) if inner_part else '')
-                        j += 1
-                        
-                    # Render loop with preserved formatting and indentation
-                    loop_output = []
-                    total_items = len(items)
-                    
-                    # Get the indentation level from the template
-                    for_line = self.compiled[i]
-                    indent = ''
-                    if isinstance(for_line, str):
-                        indent_match = re.match(r'^(\s*)', for_line)
-                        if indent_match:
-                            indent = indent_match.group(1)
-                    
-                    for item_idx, item in enumerate(items):
-                        loop_context = context.copy()
-                        loop_context[loop_var] = item
-                        
-                        # Add loop variable with iteration info
-                        loop_context['loop'] = {
-                            'index': item_idx + 1,
-                            'index0': item_idx,
-                            'first': item_idx == 0,
-                            'last': item_idx == total_items - 1,
-                            'length': total_items,
-                            'parentloop': context.get('loop')  # Save parent loop context
-                        }
-                        
-                        # Render loop content with current item
-                        item_output = []
-                        j = 0
-                        while j < len(loop_content):
-                            part = loop_content[j]
-                            if part is None:
-                                j += 1
-                                continue
-                            
-                            # Handle if conditions inside for loop
-                            if (isinstance(part, str) and 
-                                part.startswith('{% if ') and 
-                                part.endswith('%}')):
-                                condition = part[6:-2].strip()
-                                result, _ = self._evaluate_condition(condition, loop_context)
-                                
-                                # Find matching endif
-                                endif_idx = j + 1
-                                nested_depth = 1
-                                while endif_idx < len(loop_content):
-                                    inner_part = loop_content[endif_idx]
-                                    if (isinstance(inner_part, str) and 
-                                        inner_part.startswith('{% if ') and 
-                                        inner_part.endswith('%}')):
-                                        nested_depth += 1
-                                    elif (isinstance(inner_part, str) and 
-                                          inner_part.startswith('{% endif %}')):
-                                        nested_depth -= 1
-                                        if nested_depth == 0:
-                                            break
-                                    endif_idx += 1
-                                
-                                # Process if block if condition is true
-                                if result:
-                                    if_content = loop_content[j+1:endif_idx]
-                                    rendered = self._render_parts(if_content, loop_context)
-                                    item_output.append(rendered)
-                                
-                                # Skip to after endif
-                                j = endif_idx + 1
-                            
-                            # Handle variable references
-                            elif isinstance(part, str) and part.startswith('{{') and part.endswith('}}'):
-                                var_expr = part[2:-2].strip()
-                                # print(f"DEBUG - Evaluating variable: {var_expr}")  # Debug
-                            
-                                if var_expr.startswith('='):
-                                    # Handle eval expressions
-                                    try:
-                                        expr = var_expr[1:]
-                                        if not self._is_safe_expression(expr):
-                                            raise ValueError("Potentially dangerous expression detected")
-                                        
-                                        safe_globals = self._get_safe_globals()
-                                        eval_globals = {**safe_globals, **self.custom_functions}
-                                    
-                                        result = eval(expr, eval_globals, loop_context)
-                                        value = str(result)
-                                    except Exception as e:
-                                        value = f'[Error: {str(e)}]'
-                                elif '.' in var_expr:
-                                    # Handle nested attributes
-                                    parts = var_expr.split('.')
-                                    current = loop_context.get(parts[0], {})
-                                    for part_name in parts[1:]:
-                                        if isinstance(current, dict):
-                                            current = current.get(part_name, '')
-                                        else:
-                                            current = getattr(current, part_name, '')
-                                        if current is None:
-                                            current = ''
-                                            break
-                                    value = str(current)
-                                else:
-                                    # Handle simple variable
-                                    value = str(loop_context.get(var_expr, ''))
-                            
-                                # print(f"DEBUG - Variable value: {value}")  # Debug
-                                item_output.append(value)
-                                j += 1
-                            
-                            else:
-                                # Handle literal text (preserve whitespace and newlines)
-                                item_output.append(str(part))
-                                j += 1
-                        
-                        rendered_item = ''.join(item_output)
-                        # print(f"DEBUG - Rendered item {item_idx}:\n{repr(rendered_item)}")  # Debug
-                        loop_output.append(rendered_item)
-                    
-                    if loop_output:
-                        # Join all loop items with newlines and add to output
-                        loop_result = '\n'.join(loop_output)
-                        output.append(loop_result)
-                    else:
-                        # print("DEBUG - No loop output generated")
-                        pass
-                    
-                    # Skip to end of loop
-                    i = endfor_idx + 1
-                    
-                # Handle endif/endfor
-                elif block in ('endif', 'endfor'):
-                    i += 1
-                    
-                else:
-                    i += 1
-                    
-            # Static text
-            else:
-                output.append(str(part) if part else '')
-                i += 1
-                
-        # Clean up the output by removing excessive newlines
-        result = ''.join(output)
-        return self._clean_output(result)
-    
-    def _get_safe_globals(self) -> Dict[str, Any]:
-        """Return a dictionary of safe builtins for eval/exec."""
-        safe_builtins = {
-            'None': None,
-            'True': True,
-            'False': False,
-            'bool': bool,
-            'int': int,
-            'float': float,
-            'str': str,
-            'list': list,
-            'dict': dict,
-            'tuple': tuple,
-            'len': len,
-            'sum': sum,
-            'min': min,
-            'max': max,
-            'abs': abs,
-            'round': round
-        }
-        return safe_builtins
-
-    def _is_safe_expression(self, expr: str) -> bool:
-        """Check if an expression contains potentially dangerous operations."""
-        forbidden = [
-            'import', 'open', 'exec', 'eval', 'system', 'subprocess',
-            '__import__', 'getattr', 'setattr', 'delattr', 'compile',
-            'globals', 'locals', 'vars', 'dir', 'help', 'reload',
-            'input', 'file', 'execfile', 'reload', 'exit', 'quit'
-        ]
-        expr_lower = expr.lower()
-        return not any(keyword in expr_lower for keyword in forbidden)
-
-    def _evaluate_condition(self, condition: str, context: Dict[str, Any]) -> tuple:
-        """
-        Evaluate a condition expression or code block in the given context.
-        Returns (result, updated_context) where updated_context contains any new variables
-        created during evaluation.
-        """
-        try:
-            if not self._is_safe_expression(condition):
-                raise ValueError(f"Potentially dangerous expression: {condition}")
-                
-            # Special handling for loop variables
-            if 'loop.' in condition:
-                # Handle not conditions
-                has_not = 'not ' in condition
-                loop_var = condition.split('loop.')[-1].strip()
-                if has_not:
-                    loop_var = loop_var.replace('not ', '').strip()
-                
-                loop_info = context.get('loop', {})
-                result = False
-                
-                if loop_var == 'last':
-                    result = loop_info.get('last', False)
-                elif loop_var == 'first':
-                    result = loop_info.get('first', False)
-                elif loop_var == 'index':
-                    result = bool(loop_info.get('index', 0))
-                elif loop_var == 'index0':
-                    result = bool(loop_info.get('index0', 0))
-                
-                # Invert result if 'not' was present
-                return (not result if has_not else result), context
-                    
-            # Create safe evaluation environment
-            safe_globals = self._get_safe_globals()
-            eval_globals = {**safe_globals, **self.custom_functions}
-            
-            # Make a copy of context to avoid modifying the original
-            local_vars = context.copy()
-            
-            # Handle multi-line code blocks
-            if '\n' in condition.strip():
-                # Compile and execute the code block in restricted environment
-                code = compile(condition, '<string>', 'exec')
-                exec(code, eval_globals, local_vars)
-                # The last expression's value should be in __result__
-                result = bool(local_vars.get('__result__', False))
-                # Return result and updated context (excluding special vars)
-                updated_context = {k: v for k, v in local_vars.items() 
-                                 if not k.startswith('__') and k not in self.custom_functions}
-                
-                # Debug output
-                print(f"DEBUG - Condition evaluation result: {result}")
-                print(f"DEBUG - Local vars after execution: {local_vars.keys()}")
-                print(f"DEBUG - Updated context to return: {updated_context.keys()}")
-                
-                # Ensure all calculated variables are included
-                for k, v in local_vars.items():
-                    if (not k.startswith('__') and 
-                        k not in self.custom_functions and 
-                        k not in updated_context):
-                        updated_context[k] = v
-                
-                return result, updated_context
-            
-            # Handle function calls with = prefix
-            if condition.startswith('='):
-                result = bool(eval(condition[1:], eval_globals, local_vars))
-                return result, local_vars
-            
-            # Handle nested attribute access (e.g. user.is_admin)
-            if '.' in condition:
-                parts = condition.split('.')
-                current = local_vars.get(parts[0], {})
-                for part in parts[1:]:
-                    if isinstance(current, dict):
-                        current = current.get(part, None)
-                    else:
-                        current = getattr(current, part, None)
-                    if current is None:
-                        return False, local_vars
-                # Handle empty collections
-                if isinstance(current, (list, dict, set)) and not current:
-                    return False, local_vars
-                return bool(current), local_vars
-            
-            # Handle direct variable reference
-            if condition in local_vars:
-                value = local_vars[condition]
-                if isinstance(value, (list, dict, set)):
-                    return len(value) > 0, local_vars
-                return bool(value), local_vars
-                
-            # Evaluate other expressions
-            result = bool(eval(condition, eval_globals, local_vars))
-            return result, local_vars
-            
-        except Exception:
-            return False, context
-            
-    def _skip_control_block(self, start_idx: int, start_tag: str, end_tag: str) -> int:
-        """Skip a control block until matching end tag is found."""
-        if start_idx >= len(self.compiled):
-            return len(self.compiled)
-            
-        depth = 1
-        i = start_idx + 1
-        # print(f"DEBUG - Searching for {end_tag} starting from {start_idx}")
-        
-        while i < len(self.compiled):
-            part = self.compiled[i]
-            if isinstance(part, str) and part.startswith('{%') and part.endswith('%}'):
-                block = part[2:-2].strip()
-                # print(f"DEBUG - Token {i}: {block} (depth={depth})")
-                
-                # Handle nested blocks
-                if block.startswith('if ') or block.startswith('for '):
-                    depth += 1
-                    # print(f"DEBUG - Found nested block, depth increased to {depth}")
-                elif block == end_tag:
-                    depth -= 1
-                    # print(f"DEBUG - Found {end_tag}, depth decreased to {depth}")
-                    if depth == 0:
-                        # print(f"DEBUG - Found matching {end_tag} at {i}")
-                        return i
-                elif block == 'else' and depth == 1:
-                    # print(f"DEBUG - Found else at {i}")
-                    # Don't decrease depth for else blocks
-                    pass
-                elif block in ['endif', 'endfor'] and depth > 1:
-                    depth -= 1
-                    # print(f"DEBUG - Found closing tag in nested block, depth decreased to {depth}")
-            
-            i += 1
-        
-        # print(f"DEBUG - Error: Reached end without finding matching {end_tag} (current depth: {depth})")
-        # print(f"DEBUG - Last processed block: {self.compiled[i-1] if i > 0 else 'None'}")
-        return len(self.compiled)
-
-    def _clean_output(self, output: str) -> str:
-        """Clean up the final output while preserving essential formatting."""
-        lines = output.split('\n')
-        cleaned = []
-        
-        for line in lines:
-            # Preserve all lines including empty ones that are part of the template structure
-            cleaned.append(line)
-            
-        # Join lines while preserving original newlines and indentation
-        return '\n'.join(cleaned) 
-        
-    def _parse_for_block(self, block: str) -> tuple:
-        """Parse a for block into loop variable and iterable parts."""
-        parts = block[4:].split(' in ', 1)
-        return parts[0].strip(), parts[1].strip()
-        
-    def _get_iterable(self, iterable: str, context: Dict[str, Any]) -> List[Any]:
-        """Get an iterable from context or evaluate expression."""
-        if iterable in context:
-            return context[iterable]
-        try:
-            if not self._is_safe_expression(iterable):
-                raise ValueError("Potentially dangerous expression detected")
-            
-            safe_globals = self._get_safe_globals()
-            return eval(iterable, safe_globals, context)
-        except Exception:
-            return []
-            
-    def _render_parts(self, parts: List[Union[str, None]], context: Dict[str, Any]) -> str:
-        """Render a list of template parts with the given context."""
-        temp_parser = TemplateParser('')
-        temp_parser.compiled = parts
-        return temp_parser.render(context)
+
+        # Safe evaluation environment shared by all expressions of this render
+        env = {**_SAFE_GLOBALS, **self.custom_functions}
+        return self.compiled.render(context, env)
 
 
 # Example usage
@@ -115,5 +115,41 @@ class TestTemplateParser(unittest.TestCase):
 }"""
         self.assertEqual(result.strip().replace("\n", "").replace(" ", ""), expected.strip().replace("\n", "").replace(" ", ""))
 
+    def test_nested_for_loop(self):
+        """Test nested for loops."""
+        template = "{% for x in xs %}{% for y in ys %}{{x}}{{y}}{% endfor %}{% endfor %}"
+        parser = TemplateParser(template)
+        result = parser.render({"xs": [1, 2], "ys": ["a", "b"]})
+        print(result)
+        self.assertEqual(result, "1a\n1b\n2a\n2b")
+
+    def test_if_else_in_for_loop(self):
+        """Test if-else inside a for loop."""
+        template = "{% for n in items %}{% if n > 1 %}big{% else %}small{% endif %}{% endfor %}"
+        parser = TemplateParser(template)
+        result = parser.render({"items": [1, 2]})
+        print(result)
+        self.assertEqual(result, "small\nbig")
+
+    def test_compiled_template_cache(self):
+        """Test templates are compiled once and shared."""
+        template = "{% for a in articles %}{{=a['n'] * 2}}{% if not loop.last %},{% endif %}{% endfor %}"
+        first = TemplateParser(template)
+        second = TemplateParser(template)
+        articles = [{"n": i} for i in range(3)]
+        self.assertEqual(first.render({"articles": articles}), "0,\n2,\n4")
+        self.assertEqual(second.render({"articles": articles[:1]}), "0")
+        self.assertIs(first.compiled, second.compiled)
+
+    def test_custom_functions_per_parser(self):
+        """Test custom functions are not shared through the compiled template."""
+        template = "{{=fmt(name)}}"
+        upper = TemplateParser(template)
+        upper.register_function("fmt", str.upper)
+        lower = TemplateParser(template)
+        lower.register_function("fmt", str.lower)
+        self.assertEqual(upper.render({"name": "Ab"}), "AB")
+        self.assertEqual(lower.render({"name": "Ab"}), "ab")
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -6,7 +6,15 @@ from .feed import Feed
 from .user import User
 # 导入消息任务模型
 from .message_task import MessageTask
+# 导入消息任务日志模型
+from .message_task_log import MessageTaskLog
+# 导入消息汇总缓冲模型
+from .message_digest import MessageDigest
 # 导入配置管理模型
 from .config_management import ConfigManagement
+# 导入公众号刷新租约模型
+from .feed_job import FeedJob
+# 导入历史文章回填模型
+from .backfill_job import BackfillJob
 # 导入基础模型
 from .base import *
\ No newline at end of file
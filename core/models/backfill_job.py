@@ -0,0 +1,35 @@
+# 从 sqlalchemy 导入所需的列类型和数据类型
+from .base import Base,Column, Integer, String, DateTime,Text
+
+# 定义 BackfillJob 类，公众号历史文章回填任务，每采集一页保存一次进度，重启或冷却后从断点继续
+class BackfillJob(Base):
+    from_attributes = True
+    # 指定数据库表名为 backfill_jobs
+    __tablename__ = 'backfill_jobs'
+
+    # 公众号ID，每个公众号只有一个回填任务
+    feed_id = Column(String(255), primary_key=True)
+    # 公众号的 fakeid
+    faker_id = Column(String(255), nullable=False)
+    # 公众号名称
+    mp_name = Column(String(255), nullable=True)
+    # 需要回填的总页数
+    max_page = Column(Integer, default=0)
+    # 下一次采集的页码(从0开始)，对应接口的 begin=page*每页数量
+    page = Column(Integer, default=0)
+    # 已采集到的最后一篇文章ID
+    last_aid = Column(String(255), nullable=True)
+    # 已采集的文章数
+    fetched = Column(Integer, default=0)
+    # 连续返回空页的次数，连续两次为空视为已到最早的文章
+    empty_pages = Column(Integer, default=0)
+    # 状态 DATA_STATUS.PENDING 待执行 ACTIVE 执行中 COMPLETED 完成
+    status = Column(Integer, default=3, index=True)
+    # 冷却结束时间(时间戳)，频率限制或登录失效后在此之前不执行
+    resume_at = Column(Integer, default=0)
+    # 最后一次错误
+    last_error = Column(Text, nullable=True)
+    # 定义创建时间字段
+    created_at = Column(DateTime)
+    # 定义更新时间字段
+    updated_at = Column(DateTime)
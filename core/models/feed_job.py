@@ -0,0 +1,33 @@
+# 从 sqlalchemy 导入所需的列类型和数据类型
+from .base import Base,Column, Integer, String, DateTime,Text
+
+# 定义 FeedJob 类，公众号刷新任务的租约表，供多个采集工作进程领取
+class FeedJob(Base):
+    from_attributes = True
+    # 指定数据库表名为 feed_jobs
+    __tablename__ = 'feed_jobs'
+
+    # 公众号ID，每个公众号只有一行，重复分发时合并
+    feed_id = Column(String(255), primary_key=True)
+    # 刷新后需要通知的消息任务ID集合(JSON)
+    task_ids = Column(Text, nullable=True)
+    # 状态 DATA_STATUS.PENDING 待领取 ACTIVE 已领取 COMPLETED 完成 FAILED 多次失败
+    status = Column(Integer, default=3, index=True)
+    # 领取该任务的工作进程
+    lease_owner = Column(String(255), nullable=True)
+    # 租约到期时间(时间戳)，到期未续约的任务可被其他工作进程领取
+    lease_until = Column(Integer, default=0)
+    # 最后一次心跳时间(时间戳)
+    heartbeat_at = Column(Integer, default=0)
+    # 最早可领取时间(时间戳)，失败重试时后延
+    available_at = Column(Integer, default=0, index=True)
+    # 已尝试次数
+    attempts = Column(Integer, default=0)
+    # 执行期间又被分发时置1，完成后重新进入待领取
+    rerun = Column(Integer, default=0)
+    # 最后一次错误
+    last_error = Column(Text, nullable=True)
+    # 定义创建时间字段
+    created_at = Column(DateTime)
+    # 定义更新时间字段
+    updated_at = Column(DateTime)
@@ -0,0 +1,25 @@
+# 从 sqlalchemy 导入所需的列类型和数据类型
+from .base import Base,Column, Integer, String, DateTime,Text
+
+# 定义 MessageDigest 类，消息任务汇总模式下等待合并发送的文章
+class MessageDigest(Base):
+    from_attributes = True
+    # 指定数据库表名为 message_digests
+    __tablename__ = 'message_digests'
+
+    # 任务ID:公众号ID:文章ID，同一任务的同一篇文章只缓冲一次
+    id = Column(String(255), primary_key=True)
+    # 消息任务ID
+    task_id = Column(String(255), nullable=False, index=True)
+    # 公众号ID
+    mps_id = Column(String(255), nullable=False)
+    # 公众号名称
+    mp_name = Column(String(255), nullable=True)
+    # 文章数据(JSON)
+    article = Column(Text, nullable=False)
+    # 发送批次号，发送时认领，为空表示等待发送
+    batch_id = Column(String(255), nullable=True, index=True)
+    # 认领时间(时间戳)，认领后长时间未完成的批次重新等待发送
+    claimed_at = Column(Integer, default=0)
+    # 定义创建时间字段
+    created_at = Column(DateTime)
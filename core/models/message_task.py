@@ -24,6 +24,14 @@ class MessageTask(Base):
     mps_id = Column(Text, nullable=False)
     # 定义 cron_exp 表达式
     cron_exp=Column(String(100),nullable='* * 1 * *')
+    # 错过多次执行时是否只补执行一次 1是 0否
+    coalesce = Column(Integer, default=1)
+    # 错过执行后多少秒内仍补执行(停机、重启期间错过的执行)，为空时使用 scheduler.misfire_grace_time
+    misfire_grace_time = Column(Integer, nullable=True)
+    # 汇总发送的时间窗口 单位分钟，大于0时各公众号的新文章合并为一条消息发送，0为每个公众号更新后立即通知
+    digest_window = Column(Integer, default=0)
+    # 汇总的文章数达到该数量时提前发送，0为不限制
+    digest_size = Column(Integer, default=0)
     # 定义任务状态字段，默认值为 pending
     status = Column(Integer, default=0)
     # 定义创建时间字段，默认值为当前 UTC 时间
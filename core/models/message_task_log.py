@@ -3,10 +3,10 @@ from .base import Base,Column, Integer, String, DateTime,JSON,Text
 # 从 datetime 模块导入 datetime 类，用于处理日期和时间
 from datetime import datetime
 
-# 定义 MessageTaskLog 类，继承自 Base 基类
-class MessageTask(Base):
+# 定义 MessageTaskLog 类，继承自 Base 基类，记录消息任务每次通知的发送结果
+class MessageTaskLog(Base):
     from_attributes = True
-    # 指定数据库表名为 message_tasks
+    # 指定数据库表名为 message_tasks_logs
     __tablename__ = 'message_tasks_logs'
     
     # 定义 id 字段，作为主键，同时创建索引
@@ -19,8 +19,10 @@ class MessageTask(Base):
     update_count=Column(Integer,default=0)
     # 日志
     log=Column(Text,nullable=True)
-    # 定义任务状态字段，默认值为 pending
+    # 定义任务状态字段，默认值为 pending，发送成功为 DATA_STATUS.COMPLETED 失败为 DATA_STATUS.FAILED
     status = Column(Integer, default=0)
+    # 发送尝试次数(含重试)
+    attempts = Column(Integer, default=0)
     # 定义创建时间字段，默认值为当前 UTC 时间
     created_at = Column(DateTime)
     # 定义更新时间字段，默认值为当前 UTC 时间，更新时自动更新为当前时间
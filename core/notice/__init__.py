@@ -2,16 +2,21 @@ from .wechat import send_wechat_message
 from .dingtalk import send_dingtalk_message
 from .feishu import send_feishu_message
 from .custom import send_custom_message
+from .dispatcher import Dispatcher
 
-def notice( webhook_url, title, text,notice_type: str=None):
+def notice( webhook_url, title, text,notice_type: str=None,**delivery):
     """
-    公用通知方法，根据类型判断调用哪种通知
+    公用通知方法，根据类型判断调用哪种通知，通知在后台异步发送
     
     参数:
     - notice_type: 通知类型，'wechat' 或 'dingtalk'
     - webhook_url: 对应机器人的Webhook地址
     - title: 消息标题
     - text: 消息内容
+    - delivery: 发送结果日志的参数(task_id、mps_id、update_count)，见 Dispatcher.submit
+    
+    返回:
+    - Future: 发送结果，未提交时为 None
     """
     if  len(str(webhook_url)) == 0:
         print('未提供webhook_url')
@@ -27,12 +32,12 @@ def notice( webhook_url, title, text,notice_type: str=None):
         notice_type = 'custom'
     
     if notice_type == 'wechat':
-        send_wechat_message(webhook_url, title, text)
+        return send_wechat_message(webhook_url, title, text, **delivery)
     elif notice_type == 'dingtalk':
-        send_dingtalk_message(webhook_url, title, text)
+        return send_dingtalk_message(webhook_url, title, text, **delivery)
     elif notice_type == 'feishu':
-        send_feishu_message(webhook_url, title, text)
+        return send_feishu_message(webhook_url, title, text, **delivery)
     elif notice_type == 'custom':
-        send_custom_message(webhook_url, title, text)
+        return send_custom_message(webhook_url, title, text, **delivery)
     else:
         print('不支持的通知类型')
\ No newline at end of file
@@ -1,8 +1,7 @@
-import requests
-import json
+from .dispatcher import Dispatcher
 
 
-def send_custom_message(webhook_url, title, text):
+def send_custom_message(webhook_url, title, text, **delivery):
     """
     发送微信消息
     
@@ -10,18 +9,10 @@ def send_custom_message(webhook_url, title, text):
     - webhook_url: 自定义Webhook地址
     - title: 消息标题
     - text: 消息内容
+    - delivery: 发送结果日志的参数(task_id、mps_id、update_count)，见 Dispatcher.submit
     """
-    headers = {'Content-Type': 'application/json'}
     data = {
         "title": title,
         "content": text
     }
-    try:
-        response = requests.post(
-            url=webhook_url,
-            headers=headers,
-            data=json.dumps(data)
-        )
-        print(response.text)
-    except Exception as e:
-        print('自定义webhook通知发送失败', e)
\ No newline at end of file
+    return Dispatcher.submit(webhook_url, data, **delivery)
\ No newline at end of file
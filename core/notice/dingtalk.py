@@ -1,6 +1,5 @@
-import requests
-import json
-def send_dingtalk_message(webhook_url, title, text, is_at_all=False, at_mobiles=[]):
+from .dispatcher import Dispatcher
+def send_dingtalk_message(webhook_url, title, text, is_at_all=False, at_mobiles=[], **delivery):
     """
     发送Markdown格式消息
     
@@ -10,8 +9,8 @@ def send_dingtalk_message(webhook_url, title, text, is_at_all=False, at_mobiles=
     - text: Markdown格式内容
     - is_at_all: 是否@所有人
     - at_mobiles: 要@的手机号列表
+    - delivery: 发送结果日志的参数(task_id、mps_id、update_count)，见 Dispatcher.submit
     """
-    headers = {'Content-Type': 'application/json'}
     data = {
         "msgtype": "markdown",
         "markdown": {
@@ -23,15 +22,7 @@ def send_dingtalk_message(webhook_url, title, text, is_at_all=False, at_mobiles=
             "isAtAll": is_at_all
         }
     }
-    try:
-        response = requests.post(
-            url=webhook_url,
-            headers=headers,
-            data=json.dumps(data)
-        )
-        print(response.text)
-    except Exception as e:
-        print('通知发送失败', e)
+    return Dispatcher.submit(webhook_url, data, **delivery)
 # 使用示例
 # markdown_text = """### 项目状态报告  
 # - **项目名称**: XX系统升级  
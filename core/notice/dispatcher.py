@@ -0,0 +1,285 @@
+"""通知和 WebHook 的异步发送
+
+发送在独立线程的事件循环中进行，调用方(采集队列的工作线程、定时任务)只负责提交，不等待对方接口返回:
+- 每个主机共用一个长连接池的 httpx.AsyncClient，请求带超时
+- 网络错误、超时、HTTP 429/5xx 和平台返回的频率限制按 notice.retry_backoff 指数退避重试，最多 notice.max_retries 次
+- 同一地址连续失败 notice.breaker_threshold 次后熔断 notice.breaker_cooldown 秒，期间直接判定失败；
+  冷却结束后放行一次试探请求，成功则恢复
+- 消息任务的发送结果写入 message_tasks_logs 表
+进程退出前最多等待 notice.timeout 秒，让已提交的发送完成。
+"""
+import json
+import time
+import atexit
+import random
+import asyncio
+import threading
+import uuid
+from concurrent.futures import Future
+from datetime import datetime
+from urllib.parse import urlsplit
+import httpx
+from core.config import cfg
+from core.print import print_warning, print_error
+
+# 钉钉、企业微信、飞书机器人返回的频率限制错误码，按可重试处理
+RATE_LIMIT_CODES = {130101, 45009, 11232}
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+def mask_url(url: str) -> str:
+    """去掉查询参数(通常包含 access_token)，用于日志和状态展示"""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}{parts.path}"
+
+class DeliveryError(Exception):
+    def __init__(self, message: str, retryable: bool = True, retry_after: float = None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """单个地址的熔断状态，只在事件循环线程中访问"""
+
+    def __init__(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+
+    def allow(self, cooldown: float) -> bool:
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and time.time() - self.opened_at >= cooldown:
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN and not self.probing:
+            self.probing = True
+            return True
+        return False
+
+    def success(self) -> None:
+        self.state = CLOSED
+        self.failures = 0
+        self.probing = False
+
+    def failure(self, threshold: int) -> bool:
+        """记录一次失败，返回是否进入熔断"""
+        self.failures += 1
+        self.probing = False
+        if self.state == HALF_OPEN or self.failures >= threshold:
+            opened = self.state != OPEN
+            self.state = OPEN
+            self.opened_at = time.time()
+            return opened
+        return False
+
+class WebhookDispatcher:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._semaphore = None
+        self._clients = {}
+        self._breakers = {}
+        self._pending = set()
+        self.stats = {"submitted": 0, "success": 0, "failed": 0, "retried": 0, "rejected": 0}
+        atexit.register(self.drain)
+
+    @property
+    def timeout(self) -> float:
+        return max(1.0, cfg.get_float("notice.timeout", 10))
+
+    @property
+    def max_retries(self) -> int:
+        return max(0, cfg.get_int("notice.max_retries", 3))
+
+    @property
+    def retry_backoff(self) -> float:
+        return max(0.0, cfg.get_float("notice.retry_backoff", 2))
+
+    @property
+    def breaker_threshold(self) -> int:
+        return max(1, cfg.get_int("notice.breaker_threshold", 5))
+
+    @property
+    def breaker_cooldown(self) -> float:
+        return max(1.0, cfg.get_float("notice.breaker_cooldown", 300))
+
+    def max_delivery_time(self) -> float:
+        """一次投递(含全部重试)的最长耗时：每次请求 timeout 秒，每次重试前最多等待300秒，不含排队等待并发数的时间"""
+        return self.timeout * (self.max_retries + 1) + 300 * self.max_retries
+
+    def _start(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def run():
+                    asyncio.set_event_loop(loop)
+                    self._semaphore = asyncio.Semaphore(max(1, cfg.get_int("notice.concurrency", 10)))
+                    ready.set()
+                    loop.run_forever()
+
+                self._thread = threading.Thread(target=run, daemon=True, name="notice-dispatcher")
+                self._thread.start()
+                ready.wait()
+                self._loop = loop
+            return self._loop
+
+    def submit(self, url: str, data=None, content: str = None, headers: dict = None, task_id: str = None,
+               mps_id: str = None, update_count: int = 0) -> Future:
+        """
+        提交一次发送，立即返回
+
+        参数:
+            url: 接收地址
+            data: 以 JSON 发送的数据
+            content: 已经格式化好的请求体，data 为空时使用
+            headers: 额外的请求头
+            task_id: 消息任务ID，不为空时发送结果写入 message_tasks_logs
+            mps_id: 公众号ID
+            update_count: 本次通知的文章数
+
+        返回:
+            Future: 结果为 {"ok", "status", "attempts", "error"}
+        """
+        body = content if data is None else json.dumps(data)
+        request_headers = {"Content-Type": "application/json"}
+        request_headers.update(headers or {})
+        loop = self._start()
+        with self._lock:
+            self.stats["submitted"] += 1
+        future = asyncio.run_coroutine_threadsafe(
+            self._deliver(url, body or "", request_headers, task_id, mps_id, update_count), loop)
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future: Future) -> None:
+        with self._lock:
+            self._pending.discard(future)
+
+    def _client(self, url: str) -> httpx.AsyncClient:
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        client = self._clients.get(key)
+        if client is None or client.is_closed:
+            size = max(1, cfg.get_int("notice.max_connections", 5))
+            client = self._clients[key] = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=size, max_keepalive_connections=size),
+                timeout=httpx.Timeout(self.timeout, connect=min(5.0, self.timeout)),
+            )
+        return client
+
+    async def _post(self, url: str, body: str, headers: dict) -> int:
+        try:
+            response = await self._client(url).post(url, content=body.encode("utf-8"), headers=headers)
+        except httpx.TransportError as e:
+            raise DeliveryError(f"{type(e).__name__}: {e}")
+        except Exception as e:
+            # 地址格式错误等，重试也不会成功
+            raise DeliveryError(f"{type(e).__name__}: {e}", retryable=False)
+        if response.status_code == 429 or response.status_code >= 500:
+            retry_after = response.headers.get("Retry-After")
+            raise DeliveryError(f"HTTP {response.status_code}",
+                                retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None)
+        if response.status_code >= 400:
+            raise DeliveryError(f"HTTP {response.status_code}: {response.text[:200]}", retryable=False)
+        try:
+            result = response.json()
+        except ValueError:
+            return response.status_code
+        if isinstance(result, dict):
+            code = result.get("errcode", 0)
+            if "feishu" in url or "larksuite" in url:
+                # 飞书使用 code 字段，旧版接口为 StatusCode；自定义接口的 code 含义不确定，不检查
+                code = result.get("code", result.get("StatusCode", code))
+            if code not in (0, None, "0"):
+                message = result.get("errmsg") or result.get("msg") or result.get("StatusMessage") or ""
+                raise DeliveryError(f"错误码{code}: {message}", retryable=code in RATE_LIMIT_CODES)
+        return response.status_code
+
+    async def _deliver(self, url: str, body: str, headers: dict, task_id: str, mps_id: str, update_count: int) -> dict:
+        breaker = self._breakers.setdefault(url, CircuitBreaker())
+        attempts, status, error = 0, None, None
+        while True:
+            if not breaker.allow(self.breaker_cooldown):
+                if attempts == 0:
+                    error = f"{mask_url(url)} 已熔断，跳过发送"
+                    self.stats["rejected"] += 1
+                break
+            attempts += 1
+            try:
+                # 重试等待期间不占用并发数
+                async with self._semaphore:
+                    status = await self._post(url, body, headers)
+                breaker.success()
+                error = None
+                break
+            except DeliveryError as e:
+                error = str(e)
+                if not e.retryable:
+                    # 对方正常响应，只是请求本身有误，不计入熔断
+                    breaker.success()
+                    break
+                if breaker.failure(self.breaker_threshold):
+                    print_warning(f"通知地址 {mask_url(url)} 连续失败{breaker.failures}次，"
+                                  f"熔断{int(self.breaker_cooldown)}秒")
+                if attempts > self.max_retries:
+                    break
+                delay = self.retry_backoff * 2 ** (attempts - 1) * random.uniform(0.8, 1.2)
+                if e.retry_after is not None:
+                    delay = max(delay, e.retry_after)
+                self.stats["retried"] += 1
+                await asyncio.sleep(min(delay, 300))
+        ok = error is None
+        self.stats["success" if ok else "failed"] += 1
+        if not ok:
+            print_error(f"通知发送失败 {mask_url(url)}: {error}")
+        if task_id:
+            await self._loop.run_in_executor(None, self._save_log, task_id, mps_id, update_count, ok, attempts, error, status)
+        return {"ok": ok, "status": status, "attempts": attempts, "error": error}
+
+    def _save_log(self, task_id: str, mps_id: str, update_count: int, ok: bool, attempts: int, error: str, status: int) -> None:
+        from core.db import DB
+        from core.models.base import DATA_STATUS
+        from core.models.message_task_log import MessageTaskLog
+        try:
+            session = DB.get_session()
+            now = datetime.now()
+            session.add(MessageTaskLog(
+                id=str(uuid.uuid4()),
+                task_id=task_id,
+                mps_id=(mps_id or "")[:255],
+                update_count=update_count,
+                log=f"发送成功 HTTP {status}" if ok else error,
+                status=DATA_STATUS.COMPLETED if ok else DATA_STATUS.FAILED,
+                attempts=attempts,
+                created_at=now,
+                updated_at=now,
+            ))
+            session.commit()
+        except Exception as e:
+            print_error(f"保存消息任务日志失败: {e}")
+
+    def drain(self, timeout: float = None) -> None:
+        """等待已提交的发送完成，进程退出时调用"""
+        deadline = time.time() + (self.timeout if timeout is None else timeout)
+        while time.time() < deadline:
+            with self._lock:
+                if not self._pending:
+                    return
+            time.sleep(0.05)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            pending = len(self._pending)
+        breakers = [{"url": mask_url(url), "state": b.state, "failures": b.failures}
+                    for url, b in list(self._breakers.items()) if b.state != CLOSED]
+        return {"pending": pending, "hosts": len(self._clients), "breakers": breakers, **self.stats}
+
+Dispatcher = WebhookDispatcher()
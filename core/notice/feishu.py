@@ -1,7 +1,6 @@
-import requests
-import json
+from .dispatcher import Dispatcher
 
-def send_feishu_message(webhook_url, title, text):
+def send_feishu_message(webhook_url, title, text, **delivery):
     """
     发送飞书 Markdown 格式消息
     
@@ -9,8 +8,8 @@ def send_feishu_message(webhook_url, title, text):
     - webhook_url: 飞书机器人 Webhook 地址
     - title: 消息标题
     - text: Markdown 格式内容
+    - delivery: 发送结果日志的参数(task_id、mps_id、update_count)，见 Dispatcher.submit
     """
-    headers = {'Content-Type': 'application/json'}
     data = {
         "msg_type": "interactive",
         "card": {
@@ -36,12 +35,4 @@ def send_feishu_message(webhook_url, title, text):
             }
         }
     }
-    try:
-        response = requests.post(
-            url=webhook_url,
-            headers=headers,
-            data=json.dumps(data)
-        )
-        print(response.text)
-    except Exception as e:
-        print('飞书通知发送失败', e)
\ No newline at end of file
+    return Dispatcher.submit(webhook_url, data, **delivery)
\ No newline at end of file
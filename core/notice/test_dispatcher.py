@@ -0,0 +1,178 @@
+import json
+import time
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from core.config import cfg
+from core.notice.dispatcher import WebhookDispatcher, CircuitBreaker, mask_url, CLOSED, OPEN, HALF_OPEN
+
+class Handler(BaseHTTPRequestHandler):
+    """Replies by path: /ok, /fail (503), /bad (400), /flaky and /limit fail on the first request."""
+    hits = {}
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        path = self.path.split("?")[0]
+        count = self.hits[path] = self.hits.get(path, 0) + 1
+        status, body = 200, {"errcode": 0}
+        if path == "/fail" or (path == "/flaky" and count == 1):
+            status = 503
+        elif path == "/bad":
+            status = 400
+        elif path == "/limit" and count == 1:
+            body = {"errcode": 130101, "errmsg": "send too fast"}
+        elif path == "/invalid":
+            body = {"errcode": 300001, "errmsg": "invalid token"}
+        elif path == "/feishu/hook":
+            body = {"code": 19021, "msg": "sign match fail"}
+        elif path == "/custom":
+            body = {"code": 1}
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Test cases for the per-address circuit breaker."""
+
+    def test_opens_after_threshold(self):
+        """The breaker opens after threshold consecutive failures."""
+        breaker = CircuitBreaker()
+        self.assertFalse(breaker.failure(3))
+        self.assertFalse(breaker.failure(3))
+        self.assertTrue(breaker.failure(3))
+        self.assertEqual(breaker.state, OPEN)
+        self.assertFalse(breaker.allow(60))
+
+    def test_half_open_allows_one_probe(self):
+        """After the cooldown one probe is allowed, success closes the breaker."""
+        breaker = CircuitBreaker()
+        breaker.failure(1)
+        breaker.opened_at -= 61
+        self.assertTrue(breaker.allow(60))
+        self.assertEqual(breaker.state, HALF_OPEN)
+        self.assertFalse(breaker.allow(60))
+        breaker.success()
+        self.assertEqual((breaker.state, breaker.failures), (CLOSED, 0))
+        self.assertTrue(breaker.allow(60))
+
+    def test_failed_probe_reopens(self):
+        """A failed probe opens the breaker again."""
+        breaker = CircuitBreaker()
+        breaker.failure(1)
+        breaker.opened_at -= 61
+        breaker.allow(60)
+        self.assertTrue(breaker.failure(5))
+        self.assertEqual(breaker.state, OPEN)
+        self.assertFalse(breaker.allow(60))
+
+class TestWebhookDispatcher(unittest.TestCase):
+    """Test cases for retries, error classification and the breaker in WebhookDispatcher."""
+    OPTIONS = {"notice.max_retries": 2, "notice.retry_backoff": 0, "notice.timeout": 2,
+               "notice.breaker_threshold": 2, "notice.breaker_cooldown": 1}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base = f"http://127.0.0.1:{cls.server.server_port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        Handler.hits.clear()
+        self.saved = {key: cfg._snapshot.get(key) for key in self.OPTIONS}
+        cfg._snapshot.update(self.OPTIONS)
+        self.dispatcher = WebhookDispatcher()
+
+    def tearDown(self):
+        self.dispatcher.drain(5)
+        for key, value in self.saved.items():
+            if value is None:
+                cfg._snapshot.pop(key, None)
+            else:
+                cfg._snapshot[key] = value
+
+    def send(self, path, **kwargs):
+        return self.dispatcher.submit(self.base + path, {"msgtype": "text"}, **kwargs).result(timeout=10)
+
+    def test_success(self):
+        """A 2xx reply with errcode 0 is delivered in one attempt."""
+        result = self.send("/ok")
+        self.assertEqual(result, {"ok": True, "status": 200, "attempts": 1, "error": None})
+        self.assertEqual(self.dispatcher.stats["success"], 1)
+
+    def test_retries_server_errors(self):
+        """5xx replies are retried."""
+        result = self.send("/flaky")
+        self.assertTrue(result["ok"])
+        self.assertEqual(result["attempts"], 2)
+        self.assertEqual(self.dispatcher.stats["retried"], 1)
+
+    def test_gives_up_after_max_retries(self):
+        """Delivery fails after notice.max_retries retries."""
+        cfg._snapshot["notice.breaker_threshold"] = 10
+        result = self.send("/fail")
+        self.assertFalse(result["ok"])
+        self.assertEqual(result["attempts"], 3)
+        self.assertEqual(Handler.hits["/fail"], 3)
+        self.assertIn("503", result["error"])
+
+    def test_open_breaker_stops_retries(self):
+        """Retries stop once the breaker for the address opens."""
+        result = self.send("/fail")
+        self.assertFalse(result["ok"])
+        self.assertEqual(result["attempts"], 2)
+        self.assertEqual(Handler.hits["/fail"], 2)
+
+    def test_rate_limit_code_is_retried(self):
+        """Platform rate limit codes are retried."""
+        result = self.send("/limit")
+        self.assertTrue(result["ok"])
+        self.assertEqual(result["attempts"], 2)
+
+    def test_client_errors_are_not_retried(self):
+        """4xx replies and other error codes fail without retries."""
+        for path in ("/bad", "/invalid"):
+            result = self.send(path)
+            self.assertFalse(result["ok"])
+            self.assertEqual(result["attempts"], 1)
+        self.assertIn("300001", self.send("/invalid")["error"])
+
+    def test_feishu_code_is_checked(self):
+        """The code field is checked for Feishu only."""
+        self.assertFalse(self.send("/feishu/hook")["ok"])
+        # code of custom endpoints is not interpreted
+        self.assertTrue(self.send("/custom")["ok"])
+
+    def test_breaker_rejects_then_probes(self):
+        """An open breaker rejects sends until the cooldown, then lets a probe through."""
+        cfg._snapshot["notice.max_retries"] = 0
+        self.assertFalse(self.send("/fail")["ok"])
+        self.assertFalse(self.send("/fail")["ok"])
+        rejected = self.send("/fail")
+        self.assertEqual(rejected["attempts"], 0)
+        self.assertEqual(Handler.hits["/fail"], 2)
+        self.assertEqual(self.dispatcher.stats["rejected"], 1)
+        self.assertEqual(self.dispatcher.get_stats()["breakers"][0]["state"], OPEN)
+        # other addresses are not affected
+        self.assertTrue(self.send("/ok")["ok"])
+        time.sleep(1.1)
+        self.assertEqual(self.send("/fail")["attempts"], 1)
+        self.assertEqual(Handler.hits["/fail"], 3)
+
+    def test_mask_url(self):
+        """Query strings with tokens are hidden in logs."""
+        self.assertEqual(mask_url("https://oapi.dingtalk.com/robot/send?access_token=secret"),
+                         "https://oapi.dingtalk.com/robot/send")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,7 @@
-import requests
-import json
+from .dispatcher import Dispatcher
 
 
-def send_wechat_message(webhook_url, title, text):
+def send_wechat_message(webhook_url, title, text, **delivery):
     """
     发送微信消息
     
@@ -10,22 +9,14 @@ def send_wechat_message(webhook_url, title, text):
     - webhook_url: 微信机器人Webhook地址
     - title: 消息标题
     - text: 消息内容
+    - delivery: 发送结果日志的参数(task_id、mps_id、update_count)，见 Dispatcher.submit
     """
     # 截取 text 确保字符数不超过 4096 个
     text = text[:2048]
-    headers = {'Content-Type': 'application/json'}
     data = {
         "msgtype": "markdown",
         "markdown": {
             "content": f"{text}"
         }
     }
-    try:
-        response = requests.post(
-            url=webhook_url,
-            headers=headers,
-            data=json.dumps(data)
-        )
-        print(response.text)
-    except Exception as e:
-        print('微信通知发送失败', e)
\ No newline at end of file
+    return Dispatcher.submit(webhook_url, data, **delivery)
\ No newline at end of file
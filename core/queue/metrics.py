@@ -0,0 +1,180 @@
+"""任务队列的执行指标
+
+每个任务执行完后记录 排队等待时间、执行时间、是否成功，按任务类型(任务函数名)汇总:
+- 最近 queue.metrics.size 次执行保存在环形缓冲区中，用于计算分位数
+- 累计的次数和直方图用于 Prometheus 抓取
+任务执行期间触发频率限制时调用 stall() 记录，计入当前线程正在执行的任务类型。
+"""
+import time
+import threading
+from collections import deque
+
+# 直方图分桶 单位秒
+BUCKETS = (0.1, 0.5, 1, 2, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+class _Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> list:
+        result, total = [], 0
+        for bound, count in zip(BUCKETS, self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+def _percentile(values: list, p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * p))], 3)
+
+def _summary(values: list) -> dict:
+    return {
+        "p50": _percentile(values, 0.5),
+        "p95": _percentile(values, 0.95),
+        "max": round(max(values), 3) if values else 0.0,
+        "mean": round(sum(values) / len(values), 3) if values else 0.0,
+    }
+
+class QueueMetrics:
+    def __init__(self, size: int = None):
+        from core.config import cfg
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # (结束时间, 队列, 任务类型, 优先级, 等待秒数, 执行秒数, 是否成功)
+        self._records = deque(maxlen=max(100, size or cfg.get_int("queue.metrics.size", 2000)))
+        # (队列, 任务类型) -> 累计指标
+        self._totals = {}
+        self._queues = []
+
+    def register(self, queue) -> None:
+        """登记队列，导出队列长度等实时状态"""
+        with self._lock:
+            if queue not in self._queues:
+                self._queues.append(queue)
+
+    def queues(self) -> list:
+        with self._lock:
+            return list(self._queues)
+
+    def _total(self, queue: str, task_type: str) -> dict:
+        key = (queue, task_type)
+        total = self._totals.get(key)
+        if total is None:
+            total = self._totals[key] = {"success": 0, "failure": 0, "stalls": 0,
+                                         "wait": _Histogram(), "run": _Histogram()}
+        return total
+
+    def begin(self, queue: str, task_type: str) -> None:
+        """标记当前线程开始执行任务"""
+        self._local.current = (queue, task_type)
+
+    def end(self) -> None:
+        self._local.current = None
+
+    def record(self, queue: str, task_type: str, lane: str, wait: float, run: float, ok: bool) -> None:
+        with self._lock:
+            self._records.append((time.time(), queue, task_type, lane, wait, run, ok))
+            total = self._total(queue, task_type)
+            total["success" if ok else "failure"] += 1
+            total["wait"].observe(wait)
+            total["run"].observe(run)
+
+    def stall(self) -> None:
+        """记录一次频率限制，计入当前线程正在执行的任务类型"""
+        queue, task_type = getattr(self._local, "current", None) or ("", "other")
+        with self._lock:
+            self._total(queue, task_type)["stalls"] += 1
+
+    def snapshot(self) -> dict:
+        """按队列和任务类型汇总，分位数基于环形缓冲区中最近的执行记录"""
+        with self._lock:
+            records = list(self._records)
+            totals = {key: {"success": t["success"], "failure": t["failure"], "stalls": t["stalls"]}
+                      for key, t in self._totals.items()}
+        grouped = {}
+        for _, queue, task_type, lane, wait, run, ok in records:
+            group = grouped.setdefault((queue, task_type), {"wait": [], "run": [], "lanes": {}})
+            group["wait"].append(wait)
+            group["run"].append(run)
+            group["lanes"][lane] = group["lanes"].get(lane, 0) + 1
+        tasks = []
+        for key in sorted(set(totals) | set(grouped)):
+            group = grouped.get(key, {"wait": [], "run": [], "lanes": {}})
+            tasks.append({
+                "queue": key[0],
+                "type": key[1],
+                **totals.get(key, {"success": 0, "failure": 0, "stalls": 0}),
+                "recent": len(group["run"]),
+                "lanes": group["lanes"],
+                "wait": _summary(group["wait"]),
+                "run": _summary(group["run"]),
+            })
+        window = time.time() - records[0][0] if records else 0
+        return {"window": round(window, 1), "size": self._records.maxlen, "tasks": tasks}
+
+    def prometheus(self) -> str:
+        """Prometheus 文本格式"""
+        def labels(**kwargs) -> str:
+            escape = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+            text = ",".join(f'{k}="{escape(v)}"' for k, v in kwargs.items())
+            return "{" + text + "}"
+
+        lines = []
+        with self._lock:
+            totals = sorted(self._totals.items())
+            for name, kind, doc in (("wait", "wait", "排队等待时间"), ("run", "run", "执行时间")):
+                metric = f"we_mp_rss_queue_task_{name}_seconds"
+                lines.append(f"# HELP {metric} {doc}")
+                lines.append(f"# TYPE {metric} histogram")
+                for (queue, task_type), total in totals:
+                    histogram = total[kind]
+                    for bound, count in histogram.cumulative():
+                        lines.append(f"{metric}_bucket{labels(queue=queue, type=task_type, le=bound)} {count}")
+                    lines.append(f"{metric}_bucket{labels(queue=queue, type=task_type, le='+Inf')} {histogram.count}")
+                    lines.append(f"{metric}_sum{labels(queue=queue, type=task_type)} {histogram.sum:.6f}")
+                    lines.append(f"{metric}_count{labels(queue=queue, type=task_type)} {histogram.count}")
+            lines.append("# HELP we_mp_rss_queue_tasks_total 执行完成的任务数")
+            lines.append("# TYPE we_mp_rss_queue_tasks_total counter")
+            for (queue, task_type), total in totals:
+                for result in ("success", "failure"):
+                    lines.append(f"we_mp_rss_queue_tasks_total{labels(queue=queue, type=task_type, result=result)} {total[result]}")
+            lines.append("# HELP we_mp_rss_queue_rate_limit_stalls_total 任务执行期间触发频率限制的次数")
+            lines.append("# TYPE we_mp_rss_queue_rate_limit_stalls_total counter")
+            for (queue, task_type), total in totals:
+                lines.append(f"we_mp_rss_queue_rate_limit_stalls_total{labels(queue=queue, type=task_type)} {total['stalls']}")
+            queues = list(self._queues)
+        gauges = (
+            ("pending", "等待执行的任务数"),
+            ("busy", "正在执行任务的工作线程数"),
+            ("workers", "工作线程数"),
+            ("delayed", "等待重试的任务数"),
+            ("dead_letters", "死信数"),
+        )
+        infos = [(queue.durable or queue.tag, queue.get_queue_info()) for queue in queues]
+        for key, doc in gauges:
+            metric = f"we_mp_rss_queue_{key}"
+            lines.append(f"# HELP {metric} {doc}")
+            lines.append(f"# TYPE {metric} gauge")
+            for name, info in infos:
+                if key == "pending":
+                    for lane, stats in info["lanes"].items():
+                        lines.append(f"{metric}{labels(queue=name, lane=lane)} {stats['pending']}")
+                else:
+                    lines.append(f"{metric}{labels(queue=name)} {info[key]}")
+        return "\n".join(lines) + "\n"
+
+Metrics = QueueMetrics()
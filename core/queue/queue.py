@@ -1,36 +1,251 @@
-import queue
+import heapq
 import threading
 import time
-import gc
+import pickle
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from typing import Callable, Any, Optional
 from core.print import print_error, print_info, print_warning, print_success
+from .metrics import Metrics
+
+# 优先级从高到低 interactive: 用户手动触发 scheduled: 定时任务 backfill: 补采等后台任务
+PRIORITIES = ("interactive", "scheduled", "backfill")
+DEFAULT_WEIGHTS = {"interactive": 6, "scheduled": 3, "backfill": 1}
+
+class _Task:
+    """队列中的一个任务"""
+    __slots__ = ("task", "args", "kwargs", "serial_key", "dedupe_key", "merge", "id", "attempts", "available_at",
+                 "priority", "enqueued_at")
+
+    def __init__(self, task, args, kwargs, serial_key=None, dedupe_key=None, merge=None, id=None, attempts=0, available_at=0.0,
+                 priority="scheduled"):
+        self.task = task
+        self.args = args
+        self.kwargs = kwargs
+        self.serial_key = serial_key
+        # 去重键相同的任务在执行前合并为一个，merge(旧参数, 旧关键字参数, 新参数, 新关键字参数) 返回合并后的参数
+        self.dedupe_key = dedupe_key
+        self.merge = merge
+        # 持久化任务在 data/queue.db 中的ID，只在内存中的任务为 None
+        self.id = id
+        self.attempts = attempts
+        self.available_at = available_at
+        self.priority = priority if priority in PRIORITIES else "scheduled"
+        # 进入待执行队列的时间，用于饥饿保护
+        self.enqueued_at = time.time()
+
+    @property
+    def name(self) -> str:
+        return getattr(self.task, "__qualname__", None) or repr(self.task)
+
 class TaskQueueManager:
-    """任务队列管理器，用于管理和执行排队任务"""
-    
-    def __init__(self,maxsize=0,tag:str=""):
-        """初始化任务队列"""
-        self._queue = queue.Queue(maxsize=maxsize)
+    """任务队列管理器，用于管理和执行排队任务
+
+    多个工作线程并行执行任务；指定了 serial_key 的任务按键串行，
+    同一公众号(或同一会话)的任务保持先后顺序，不同键的任务并行执行。
+    mode 为 process 时任务在进程池中执行(任务函数和参数需要可以被pickle)，串行调度仍由工作线程负责。
+    指定了 durable 的队列把任务保存到 data/queue.db，重启后继续执行，失败按次数退避重试，多次失败转入死信；
+    多个进程使用同名的持久化队列时，任务先认领再加载到内存，每个任务只由一个进程执行。
+    工作线程和持久化任务的恢复在 run_task_background 中启动，导入模块时不会启动。
+    指定了 dedupe_key 的任务在等待执行期间与同一键的新任务合并，队列长度只与不同的任务数有关。
+    任务按 priority 分为 interactive/scheduled/backfill 三个优先级，按 queue.weights 加权轮流取出，
+    等待超过 queue.max_wait 秒的任务不论优先级最先执行，低优先级的任务不会一直得不到执行。
+    """
+
+    def __init__(self,maxsize=0,tag:str="",workers:int=None,mode:str=None,durable:str=None):
+        """初始化任务队列
+
+        Args:
+            maxsize: 队列最大长度，0为不限制
+            tag: 队列名称
+            workers: 工作线程数，默认读取 queue.workers
+            mode: thread 线程执行 process 进程池执行，默认读取 queue.mode
+            durable: 持久化队列的名称，为空或 queue.durable 关闭时任务只保存在内存中
+        """
+        from core.config import cfg
         self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        # 优先级 -> 待执行的任务
+        self._pending = {lane: deque() for lane in PRIORITIES}
+        # 平滑加权轮询的当前权重
+        self._credit = dict.fromkeys(PRIORITIES, 0)
+        self._started = dict.fromkeys(PRIORITIES, 0)
+        self._aged = dict.fromkeys(PRIORITIES, 0)
+        # 失败后等待重试的任务 (最早执行时间, 序号, 任务)
+        self._delayed = []
+        self._seq = 0
+        # 正在执行的串行键 -> 等待同一键执行完的任务
+        self._serial = {}
+        # 已加载到内存中的持久化任务ID，回收超时任务时跳过
+        self._ids = set()
+        # 去重键 -> 等待执行的任务，开始执行后移除
+        self._keyed = {}
+        # 多次失败的任务，持久化队列的死信保存在 data/queue.db
+        self._dead = deque(maxlen=100)
+        self._paused = None
         self._is_running = False
+        self.maxsize=maxsize
         self.tag=tag
-        
-    def add_task(self, task: Callable[..., Any], *args: Any, **kwargs: Any) -> None:
+        self.workers=max(1,int(workers or cfg.get_int("queue.workers",4)))
+        self.mode=mode or cfg.get_str("queue.mode","thread") or "thread"
+        self.durable=durable if durable and cfg.get_bool("queue.durable",True) else None
+        self.max_retries=max(1,cfg.get_int("queue.max_retries",3))
+        self.retry_backoff=max(1,cfg.get_int("queue.retry_backoff",30))
+        self.visibility_timeout=max(10,cfg.get_int("queue.visibility_timeout",1800))
+        self.weights={lane: max(1,cfg.get_int(f"queue.weights.{lane}",weight)) for lane,weight in DEFAULT_WEIGHTS.items()}
+        self.max_wait=max(1,cfg.get_int("queue.max_wait",300))
+        self._store=None
+        self.owner=None
+        if self.durable:
+            from .store import get_store, new_owner
+            self._store=get_store()
+            self.owner=new_owner()
+        self._last_reap=time.time()
+        self._pool=None
+        self._threads=[]
+        self._started_at=time.time()
+        self._busy=0
+        self._busy_time=0.0
+        self.stats={"completed":0,"failed":0,"retried":0,"dead":0,"merged":0}
+        Metrics.register(self)
+
+    def add_task(self, task: Callable[..., Any], *args: Any, serial_key: Optional[str]=None,
+                 dedupe_key: Optional[str]=None, merge: Optional[Callable]=None, priority: str="scheduled",
+                 delay: float=0, **kwargs: Any) -> bool:
         """添加任务到队列
-        
+
         Args:
             task: 要执行的任务函数
             *args: 任务函数的参数
+            serial_key: 串行键，相同键的任务按添加顺序依次执行，为空时不限制
+            dedupe_key: 去重键，同一键已有任务在等待执行时合并到该任务，为空时不去重
+            merge: 合并函数 merge(旧参数, 旧关键字参数, 新参数, 新关键字参数) -> (参数, 关键字参数)，为空时保留等待中的任务
+            priority: 优先级 interactive/scheduled/backfill，合并时等待中的任务提升到两者中较高的优先级
+            delay: 延迟执行的秒数，合并时等待中的任务提前到两者中较早的时间
             **kwargs: 任务函数的关键字参数
+
+        Returns:
+            bool: 新加入队列返回 True，合并到已有任务返回 False
         """
-        with self._lock:
-            self._queue.put((task, args, kwargs))
+        available_at = time.time() + delay if delay > 0 else 0.0
+        if dedupe_key is not None and self._merge(dedupe_key, args, kwargs, merge, priority, available_at):
+            print_info(f"{self.tag}任务[{dedupe_key}]已在队列中，已合并")
+            return False
+        item = _Task(task, args, kwargs, serial_key, dedupe_key, merge, available_at=available_at, priority=priority)
+        if self._store is not None:
+            from .store import task_name
+            name = task_name(task)
+            if name is None:
+                print_warning(f"{self.tag}任务[{item.name}]不是模块级函数，只保存在内存中")
+            else:
+                try:
+                    item.id = self._store.put(self.durable, name, args, kwargs, serial_key,
+                                              dedupe_key, task_name(merge) if merge else None, item.priority,
+                                              available_at, self.owner, self.visibility_timeout)
+                except Exception as e:
+                    print_warning(f"{self.tag}任务[{item.name}]无法持久化，只保存在内存中: {e}")
+        with self._cond:
+            while self.maxsize and self._pending_count()>=self.maxsize:
+                self._cond.wait()
+            if dedupe_key is not None and self._merge(dedupe_key, args, kwargs, merge, priority, available_at, locked=True):
+                # 等待期间其他线程加入了同一键的任务
+                if item.id is not None:
+                    self._store.ack(item.id)
+                return False
+            if item.id is not None:
+                self._ids.add(item.id)
+            self._enqueue(item, delayed=available_at > time.time())
+            self._cond.notify()
         print_success(f"{self.tag}队列任务添加成功\n")
+        return True
+
+    def _merge(self, key: str, args: tuple, kwargs: dict, merge: Optional[Callable], priority: str = "scheduled",
+               available_at: float = 0.0, locked: bool = False) -> bool:
+        """把任务合并到同一去重键等待中的任务，没有等待中的任务返回 False"""
+        if not locked:
+            with self._cond:
+                return self._merge(key, args, kwargs, merge, priority, available_at, locked=True)
+        item = self._keyed.get(key)
+        if item is None:
+            return False
+        merge = merge or item.merge
+        if merge is not None:
+            item.args, item.kwargs = merge(item.args, item.kwargs, args, kwargs)
+        promoted = priority in PRIORITIES and PRIORITIES.index(priority) < PRIORITIES.index(item.priority)
+        if promoted:
+            lane = self._pending[item.priority]
+            if item in lane:
+                # 提升优先级，例如定时刷新还在排队时用户手动刷新同一公众号
+                lane.remove(item)
+                self._pending[priority].append(item)
+            item.priority = priority
+        advanced = item.available_at > max(available_at, time.time())
+        if advanced:
+            # 延迟中的任务提前执行，堆中原来的位置在取出时跳过
+            item.available_at = available_at
+            self._seq += 1
+            heapq.heappush(self._delayed, (available_at, self._seq, item))
+            self._cond.notify()
+        if item.id is not None and (merge is not None or promoted or advanced):
+            try:
+                self._store.update(item.id, item.args, item.kwargs, item.priority, item.available_at)
+            except Exception as e:
+                print_warning(f"{self.tag}任务[{key}]合并后的参数无法持久化: {e}")
+        self.stats["merged"] += 1
+        return True
+
+    def _pending_count(self) -> int:
+        return sum(len(lane) for lane in self._pending.values())
+
+    def _pick(self, now: float) -> Optional[str]:
+        """选择下一个取任务的优先级，调用时需持有锁"""
+        lanes = [lane for lane in PRIORITIES if self._pending[lane]]
+        if not lanes:
+            return None
+        # 饥饿保护：等待最久的任务超过 max_wait 时直接执行
+        oldest = min(lanes, key=lambda lane: self._pending[lane][0].enqueued_at)
+        if now - self._pending[oldest][0].enqueued_at > self.max_wait:
+            self._aged[oldest] += 1
+            return oldest
+        # 平滑加权轮询，权重相同时优先级高的先取
+        total = 0
+        for lane in lanes:
+            self._credit[lane] += self.weights[lane]
+            total += self.weights[lane]
+        lane = max(lanes, key=lambda lane: self._credit[lane])
+        self._credit[lane] -= total
+        return lane
+
+    def _enqueue(self, item: _Task, delayed: bool = False) -> None:
+        """加入待执行或等待重试的任务，调用时需持有锁"""
+        if item.dedupe_key is not None:
+            self._keyed.setdefault(item.dedupe_key, item)
+        if delayed:
+            self._seq += 1
+            heapq.heappush(self._delayed, (item.available_at, self._seq, item))
+        else:
+            self._pending[item.priority].append(item)
+
+    def _release(self, item: _Task) -> _Task:
+        """任务开始执行，之后加入的同一去重键的任务不再合并到它，调用时需持有锁"""
+        if item.dedupe_key is not None and self._keyed.get(item.dedupe_key) is item:
+            del self._keyed[item.dedupe_key]
+        return item
     def run_task_background(self)->None:
-        threading.Thread(target=self.run_tasks, daemon=True).start()  
-        print_warning("队列任务后台运行")
+        """启动工作线程"""
+        with self._lock:
+            if self._is_running:
+                return
+            self._is_running = True
+            self._started_at = time.time()
+            self._threads = [threading.Thread(target=self._worker, daemon=True, name=f"{self.tag}-worker-{i}") for i in range(self.workers)]
+        self._recover()
+        for thread in self._threads:
+            thread.start()
+        print_warning(f"队列任务后台运行，工作线程:{self.workers} 模式:{self.mode}")
     def run_tasks(self, timeout: float = 1.0) -> None:
-        """执行队列中的所有任务，并持续运行以接收新任务
-        
+        """在当前线程中执行队列中的任务，并持续运行以接收新任务
+
         Args:
             timeout: 等待新任务的超时时间(秒)
         """
@@ -38,85 +253,334 @@ class TaskQueueManager:
             if self._is_running:
                 return
             self._is_running = True
-            
+        self._recover()
+        self._worker(timeout)
+
+    def _recover(self) -> int:
+        """从 data/queue.db 认领并加载未完成和可见超时的任务，返回加载的任务数"""
+        if self._store is None:
+            return 0
+        from .store import resolve
+        with self._lock:
+            exclude = set(self._ids)
         try:
-            while self._is_running:
-                time.sleep(0.1)  # 避免过于频繁的任务获取 
-                try:
-                    # 阻塞获取任务，避免CPU空转
-                    task, args, kwargs = self._queue.get(timeout=timeout)
-                    
-                    try:
-                        # 记录任务开始时间
-                        start_time = time.time()
-                        task(*args, **kwargs)
-                        # 记录任务执行时间
-                        duration = time.time() - start_time
-                        print_info(f"\n任务执行完成，耗时: {duration:.2f}秒")
-                    except Exception as e:
-                        print_error(f"队列任务执行失败: {e}")
-                        # raise
-                    finally:
-                        # 确保任务完成标记和资源释放
-                        self._queue.task_done()
-                        # 强制垃圾回收
-                        gc.collect()
-                    
-                except queue.Empty:
-                    # 超时无任务，继续检查运行状态
+            rows = self._store.recover(self.durable, self.owner, self.visibility_timeout, exclude)
+        except Exception as e:
+            print_error(f"{self.tag}恢复持久化任务失败: {e}")
+            return 0
+        count = 0
+        for task_id, name, args, kwargs, serial_key, dedupe_key, merge_name, priority, attempts, available_at in rows:
+            try:
+                task = resolve(name)
+                merge = resolve(merge_name) if merge_name else None
+            except Exception as e:
+                self._store.bury(task_id, attempts, f"无法导入任务函数 {name}: {e}")
+                continue
+            item = _Task(task, args, kwargs, serial_key, dedupe_key, merge, task_id, attempts, available_at, priority)
+            with self._cond:
+                if task_id in self._ids:
+                    continue
+                if dedupe_key is not None and self._merge(dedupe_key, args, kwargs, merge, item.priority, available_at, locked=True):
+                    # 重启前同一键留下了多个任务
+                    self._store.ack(task_id)
                     continue
-                    
+                self._ids.add(task_id)
+                self._enqueue(item, delayed=available_at > time.time())
+                self._cond.notify()
+            count += 1
+        if count:
+            print_warning(f"{self.tag}恢复未完成的任务{count}个")
+        return count
+
+    def _reap(self) -> None:
+        """续期本队列认领的任务，回收其他进程超时未确认的任务"""
+        try:
+            self._store.renew(self.durable, self.owner, self.visibility_timeout)
+        except Exception as e:
+            print_error(f"{self.tag}续期持久化任务失败: {e}")
+        self._recover()
+
+    def _lease(self, item: _Task) -> bool:
+        """开始执行前确认任务仍由本队列认领，认领已过期并被其他进程取走时返回 False"""
+        try:
+            if self._store.lease(item.id, self.owner, self.visibility_timeout):
+                return True
+        except Exception as e:
+            # 读写失败时照常执行，至少执行一次
+            print_error(f"{self.tag}续期任务[{item.name}]失败: {e}")
+            return True
+        print_warning(f"{self.tag}任务[{item.name}]已由其他进程执行，跳过")
+        with self._lock:
+            self._ids.discard(item.id)
+        return False
+
+    def _take(self, timeout: float):
+        """取出下一个可以执行的任务；串行键正在执行的任务转入该键的等待队列"""
+        with self._cond:
+            while self._is_running:
+                now = time.time()
+                while self._delayed and self._delayed[0][0] <= now:
+                    at, _, item = heapq.heappop(self._delayed)
+                    if at != item.available_at:
+                        continue
+                    item.enqueued_at = now
+                    self._pending[item.priority].append(item)
+                while self._paused is None:
+                    lane = self._pick(now)
+                    if lane is None:
+                        break
+                    item = self._pending[lane].popleft()
+                    self._started[lane] += 1
+                    self._cond.notify_all()
+                    key = item.serial_key
+                    if key is None:
+                        return self._release(item)
+                    if key in self._serial:
+                        self._serial[key].append(item)
+                        continue
+                    self._serial[key] = deque()
+                    return self._release(item)
+                if self._store is not None and now - self._last_reap > self.visibility_timeout / 2:
+                    # 续期和回收其他进程超时未确认的任务，在工作线程之外执行
+                    self._last_reap = now
+                    threading.Thread(target=self._reap, daemon=True).start()
+                wait = timeout
+                if self._delayed:
+                    wait = max(0.01, min(wait, self._delayed[0][0] - now))
+                self._cond.wait(wait)
+            return None
+
+    def _next_serial(self, key):
+        """同一键的任务执行完后，取出该键的下一个任务，没有则释放该键"""
+        with self._cond:
+            waiting = self._serial.get(key)
+            if waiting:
+                return self._release(waiting.popleft())
+            self._serial.pop(key, None)
+            return None
+
+    def _execute(self, task, args, kwargs) -> None:
+        if self.mode == "process":
+            if self._pool is None:
+                with self._lock:
+                    if self._pool is None:
+                        self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            try:
+                self._pool.submit(task, *args, **kwargs).result()
+                return
+            except (TypeError, AttributeError, pickle.PicklingError) as e:
+                # 无法pickle的任务(如闭包)退回当前线程执行
+                if "pickle" not in str(e).lower():
+                    raise
+                print_warning(f"任务无法在进程池中执行，改为线程执行: {e}")
+        task(*args, **kwargs)
+
+    def _finish(self, item: _Task, error: Optional[str]) -> None:
+        """确认任务：成功删除，失败按次数退避重试，超过 queue.max_retries 次转入死信"""
+        try:
+            if error is None:
+                if item.id is not None:
+                    self._store.ack(item.id)
+                return
+            item.attempts += 1
+            if item.attempts >= self.max_retries:
+                print_error(f"{self.tag}任务[{item.name}]失败{item.attempts}次，转入死信: {error}")
+                if item.id is not None:
+                    self._store.bury(item.id, item.attempts, error)
+                else:
+                    self._dead.append({"name": item.name, "serial_key": item.serial_key, "attempts": item.attempts,
+                                       "error": error, "created_at": time.time()})
+                with self._lock:
+                    self.stats["dead"] += 1
+                return
+            item.available_at = time.time() + min(600, self.retry_backoff * 2 ** (item.attempts - 1))
+            if item.id is not None:
+                self._store.retry(item.id, item.attempts, item.available_at, error, self.visibility_timeout)
+            with self._cond:
+                self.stats["retried"] += 1
+                if item.dedupe_key is not None and self._merge(item.dedupe_key, item.args, item.kwargs, item.merge,
+                                                               item.priority, item.available_at, locked=True):
+                    # 失败期间已有同一键的新任务，合并到新任务中重试
+                    self.stats["merged"] -= 1
+                    if item.id is not None:
+                        self._store.ack(item.id)
+                        self._ids.discard(item.id)
+                    return
+                self._enqueue(item, delayed=True)
+                self._cond.notify()
+            return
+        except Exception as e:
+            print_error(f"{self.tag}记录任务结果失败: {e}")
         finally:
-            # 确保停止状态设置和资源清理
-            with self._lock:
-                self._is_running = False
-            # 清理可能残留的资源
-            gc.collect()
-    
+            if item.id is not None and (error is None or item.attempts >= self.max_retries):
+                with self._lock:
+                    self._ids.discard(item.id)
+
+    def _worker(self, timeout: float = 1.0) -> None:
+        while self._is_running:
+            item = self._take(timeout)
+            while item is not None:
+                if item.id is not None and not self._lease(item):
+                    key = item.serial_key
+                    item = self._next_serial(key) if key is not None else None
+                    continue
+                with self._lock:
+                    self._busy += 1
+                # 记录任务开始时间
+                start_time = time.time()
+                error = None
+                Metrics.begin(self.durable or self.tag, item.name)
+                try:
+                    self._execute(item.task, item.args, item.kwargs)
+                    print_info(f"\n任务执行完成，耗时: {time.time() - start_time:.2f}秒")
+                except Exception as e:
+                    error = str(e) or e.__class__.__name__
+                    print_error(f"队列任务执行失败: {e}")
+                finally:
+                    Metrics.end()
+                    duration = time.time() - start_time
+                    Metrics.record(self.durable or self.tag, item.name, item.priority,
+                                   max(0.0, start_time - item.enqueued_at), duration, error is None)
+                    with self._lock:
+                        self._busy -= 1
+                        self._busy_time += duration
+                        self.stats["completed" if error is None else "failed"] += 1
+                self._finish(item, error)
+                # 同一键的后续任务由当前线程接着执行，保证顺序
+                key = item.serial_key
+                item = self._next_serial(key) if key is not None else None
+
+    def pause(self, reason: str = "") -> None:
+        """暂停取出新任务(正在执行的任务不受影响)，未执行的任务保留到 resume"""
+        with self._cond:
+            if self._paused is None:
+                self._paused = reason or "paused"
+                print_warning(f"{self.tag}队列已暂停: {self._paused}")
+
+    def resume(self) -> None:
+        """恢复执行"""
+        with self._cond:
+            if self._paused is not None:
+                self._paused = None
+                self._cond.notify_all()
+                print_success(f"{self.tag}队列已恢复")
+
+    def _waiting(self) -> list:
+        """还没有开始执行的任务，调用时需持有锁"""
+        items = [item for lane in self._pending.values() for item in lane]
+        items += [item for at, _, item in self._delayed if at == item.available_at]
+        for waiting in self._serial.values():
+            items.extend(waiting)
+        return items
+
     def stop(self) -> None:
-        """停止任务执行"""
-        with self._lock:
+        """停止任务执行，未开始执行的持久化任务放弃认领，由其他进程或重启后的队列继续执行"""
+        with self._cond:
             self._is_running = False
-    
+            released = [item.id for item in self._waiting() if item.id is not None]
+            self._ids.difference_update(released)
+            self._cond.notify_all()
+        if self._store is not None and released:
+            try:
+                self._store.release(released)
+            except Exception as e:
+                print_error(f"{self.tag}释放持久化任务失败: {e}")
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
     def get_queue_info(self) -> dict:
         """
         获取队列的当前状态信息
-        
+
         返回:
             dict: 包含队列信息的字典，包括:
                 - is_running: 队列是否正在运行
                 - pending_tasks: 等待执行的任务数量
+                - delayed: 等待重试的任务数量
+                - workers/mode: 工作线程数和执行模式
+                - busy: 正在执行任务的工作线程数
+                - utilization: 启动以来工作线程的平均忙碌比例
+                - serial_keys: 正在串行执行的键数量
+                - dedupe_keys: 等待执行的去重键数量
+                - lanes: 各优先级的等待数量、权重、最久等待秒数、已取出数量和因饥饿保护提前取出的数量
+                - durable/paused: 持久化队列名称和暂停原因
+                - dead_letters: 死信数量
         """
         with self._lock:
-            return {
+            elapsed = max(time.time() - self._started_at, 1e-6)
+            now = time.time()
+            waiting = sum(len(q) for q in self._serial.values())
+            lanes = {lane: {
+                'pending': len(self._pending[lane]),
+                'weight': self.weights[lane],
+                'oldest_wait': round(now - self._pending[lane][0].enqueued_at, 1) if self._pending[lane] else 0,
+                'started': self._started[lane],
+                'aged': self._aged[lane],
+            } for lane in PRIORITIES}
+            info = {
                 'is_running': self._is_running,
-                'pending_tasks': self._queue.qsize()
+                'pending_tasks': self._pending_count() + waiting,
+                'delayed': sum(1 for at, _, item in self._delayed if at == item.available_at),
+                'workers': self.workers,
+                'mode': self.mode,
+                'busy': self._busy,
+                'utilization': round(min(1.0, self._busy_time / (elapsed * self.workers)), 4),
+                'serial_keys': len(self._serial),
+                'dedupe_keys': len(self._keyed),
+                'lanes': lanes,
+                'max_wait': self.max_wait,
+                'durable': self.durable,
+                'paused': self._paused,
+                'dead_letters': len(self._dead),
+                **self.stats,
             }
-            
+        if self._store is not None:
+            try:
+                info['dead_letters'] += self._store.counts(self.durable)['dead']
+            except Exception as e:
+                print_error(f"{self.tag}读取死信数量失败: {e}")
+        return info
+
+    def dead_letters(self, limit: int = 50) -> list:
+        """多次失败的任务"""
+        items = list(self._dead)[-limit:]
+        if self._store is not None:
+            items = self._store.dead_letters(self.durable, limit) + items
+        return items[:limit]
+
+    def retry_dead(self, task_id: int = None) -> int:
+        """重新投递持久化队列中的死信，task_id 为空时投递全部，返回投递数量"""
+        if self._store is None:
+            return 0
+        count = self._store.requeue_dead(self.durable, task_id)
+        self._recover()
+        return count
+
     def clear_queue(self) -> None:
-        """清空队列中的所有任务"""
-        with self._lock:
-            while not self._queue.empty():
-                try:
-                    self._queue.get_nowait()
-                    self._queue.task_done()
-                except queue.Empty:
-                    break
+        """清空队列中的所有任务(死信保留)"""
+        with self._cond:
+            cleared = self._waiting()
+            for waiting in self._serial.values():
+                waiting.clear()
+            for lane in self._pending.values():
+                lane.clear()
+            self._delayed.clear()
+            self._keyed.clear()
+            ids = [item.id for item in cleared if item.id is not None]
+            self._ids.difference_update(ids)
+            if self._store is not None:
+                self._store.clear(self.durable, ids)
+            self._cond.notify_all()
             print_success("队列已清空")
-            
+
     def delete_queue(self) -> None:
         """删除队列(停止并清空所有任务)"""
-        with self._lock:
-            self._is_running = False
-            while not self._queue.empty():
-                try:
-                    self._queue.get_nowait()
-                    self._queue.task_done()
-                except queue.Empty:
-                    break
-            print_success("队列已删除")
-TaskQueue = TaskQueueManager(tag="默认队列")
-TaskQueue.run_task_background()
+        self.clear_queue()
+        self.stop()
+        print_success("队列已删除")
+# 使用队列的进程启动时调用 TaskQueue.run_task_background()
+TaskQueue = TaskQueueManager(tag="默认队列",durable="default")
 if __name__ == "__main__":
     def task1():
         print("执行任务1")
@@ -124,7 +588,7 @@ if __name__ == "__main__":
     def task2(name):
         print(f"执行任务2，参数: {name}")
 
-    manager = TaskQueueManager()
+    manager = TaskQueueManager(workers=1)
     manager.add_task(task1)
     manager.add_task(task2, "测试任务")
-    manager.run_tasks()  # 按顺序执行任务1和任务2
\ No newline at end of file
+    manager.run_tasks()  # 按顺序执行任务1和任务2
@@ -0,0 +1,200 @@
+"""任务队列的持久化存储
+
+任务在加入队列时写入 data/queue.db(SQLite)，执行成功后删除，进程重启后未完成的任务重新加入队列:
+- 任务只有被某个队列认领(owner)后才会加载到内存，认领用带条件的 UPDATE 完成，多个进程共用同一队列时每个任务只由一个进程执行
+- 认领的任务设置可见超时，所属队列定时续期；超时仍未确认的任务视为执行者已退出，由其他队列重新认领(至少执行一次)
+- 执行失败按次数退避重试，超过 queue.max_retries 次转入死信，可在系统信息中查看或重新投递
+只有模块级函数(可以按 模块:名称 重新导入)且参数可以被 pickle 的任务会持久化，其余任务只保存在内存中。
+"""
+import os
+import time
+import uuid
+import socket
+import pickle
+import sqlite3
+import importlib
+import threading
+from typing import Callable, Optional
+
+READY = 0
+INFLIGHT = 1
+DEAD = 2
+
+def task_name(task: Callable) -> Optional[str]:
+    """任务函数的导入路径 模块:名称，闭包、lambda 和绑定方法返回 None"""
+    module = getattr(task, "__module__", None)
+    qualname = getattr(task, "__qualname__", "")
+    if not module or module == "__main__" or not qualname or "<" in qualname or "." in qualname:
+        return None
+    return f"{module}:{qualname}"
+
+def new_owner() -> str:
+    """队列的认领者标识 主机:进程:随机串"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+def resolve(name: str) -> Callable:
+    module, qualname = name.split(":", 1)
+    return getattr(importlib.import_module(module), qualname)
+
+class TaskStore:
+    """SQLite 任务表，多个队列共用，按队列名称区分"""
+
+    def __init__(self, path: str = "data/queue.db"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                queue TEXT NOT NULL,
+                name TEXT NOT NULL,
+                payload BLOB NOT NULL,
+                serial_key TEXT,
+                dedupe_key TEXT,
+                merge TEXT,
+                priority TEXT NOT NULL DEFAULT 'scheduled',
+                status INTEGER NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                available_at REAL NOT NULL DEFAULT 0,
+                visible_until REAL NOT NULL DEFAULT 0,
+                owner TEXT,
+                last_error TEXT,
+                created_at REAL NOT NULL
+            )""")
+            # 旧版本创建的表补充新增的列
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(tasks)")}
+            for column, ddl in (("dedupe_key", "TEXT"), ("merge", "TEXT"), ("priority", "TEXT NOT NULL DEFAULT 'scheduled'"),
+                                ("owner", "TEXT")):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE tasks ADD COLUMN {column} {ddl}")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_queue ON tasks(queue, status)")
+            self._conn = conn
+        return self._conn
+
+    def _execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            return self.conn.execute(sql, params)
+
+    def put(self, queue: str, name: str, args: tuple, kwargs: dict, serial_key: Optional[str] = None,
+            dedupe_key: Optional[str] = None, merge: Optional[str] = None, priority: str = "scheduled",
+            available_at: float = 0.0, owner: Optional[str] = None, visibility: float = 0) -> int:
+        """保存任务，指定 owner 时由该队列直接认领，参数无法 pickle 时抛出异常"""
+        payload = pickle.dumps((args, kwargs), protocol=pickle.HIGHEST_PROTOCOL)
+        now = time.time()
+        available_at = max(now, available_at)
+        return self._execute(
+            "INSERT INTO tasks (queue, name, payload, serial_key, dedupe_key, merge, priority, status, attempts, "
+            "available_at, visible_until, owner, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0, ?, ?, ?, ?)",
+            (queue, name, payload, serial_key, dedupe_key, merge, priority, INFLIGHT if owner else READY,
+             available_at, available_at + visibility if owner else 0, owner, now)).lastrowid
+
+    def update(self, task_id: int, args: tuple, kwargs: dict, priority: str, available_at: float) -> None:
+        """合并重复任务后更新参数、优先级和最早执行时间"""
+        payload = pickle.dumps((args, kwargs), protocol=pickle.HIGHEST_PROTOCOL)
+        self._execute("UPDATE tasks SET payload=?, priority=?, available_at=? WHERE id=?",
+                      (payload, priority, available_at, task_id))
+
+    def claim(self, task_id: int, owner: str, visibility: float) -> bool:
+        """认领待执行或可见超时的任务，其他队列已认领时返回 False"""
+        now = time.time()
+        return self._execute(
+            "UPDATE tasks SET status=?, owner=?, visible_until=? WHERE id=? AND (status=? OR (status=? AND visible_until<?))",
+            (INFLIGHT, owner, now + visibility, task_id, READY, INFLIGHT, now)).rowcount == 1
+
+    def lease(self, task_id: int, owner: str, visibility: float) -> bool:
+        """开始执行前续期，visibility 秒内未确认会被重新投递；任务已被其他队列认领或已删除时返回 False"""
+        return self._execute("UPDATE tasks SET visible_until=? WHERE id=? AND owner=? AND status=?",
+                             (time.time() + visibility, task_id, owner, INFLIGHT)).rowcount == 1
+
+    def renew(self, queue: str, owner: str, visibility: float) -> int:
+        """续期队列认领的全部任务(包括内存中等待执行和等待重试的任务)"""
+        return self._execute("UPDATE tasks SET visible_until=? WHERE queue=? AND owner=? AND status=?",
+                             (time.time() + visibility, queue, owner, INFLIGHT)).rowcount
+
+    def release(self, ids: list) -> None:
+        """放弃认领，任务重新等待其他队列认领"""
+        for task_id in ids:
+            self._execute("UPDATE tasks SET status=?, owner=NULL, visible_until=0 WHERE id=? AND status=?",
+                          (READY, task_id, INFLIGHT))
+
+    def ack(self, task_id: int) -> None:
+        """执行成功，删除任务"""
+        self._execute("DELETE FROM tasks WHERE id=?", (task_id,))
+
+    def retry(self, task_id: int, attempts: int, available_at: float, error: str, visibility: float) -> None:
+        """记录失败，任务仍由当前队列认领，到期后重试"""
+        self._execute("UPDATE tasks SET attempts=?, available_at=?, visible_until=?, last_error=? WHERE id=?",
+                      (attempts, available_at, available_at + visibility, error, task_id))
+
+    def bury(self, task_id: int, attempts: int, error: str) -> None:
+        """转入死信"""
+        self._execute("UPDATE tasks SET status=?, attempts=?, visible_until=0, owner=NULL, last_error=? WHERE id=?",
+                      (DEAD, attempts, error, task_id))
+
+    def recover(self, queue: str, owner: str, visibility: float, exclude: set = None) -> list:
+        """认领待执行和可见超时的任务，返回认领成功的 [(ID, 函数名, 参数, 关键字参数, 串行键, 去重键, 合并函数名, 优先级, 已尝试次数, 最早执行时间)]"""
+        rows = self._execute(
+            "SELECT id, name, payload, serial_key, dedupe_key, merge, priority, attempts, available_at FROM tasks "
+            "WHERE queue=? AND (status=? OR (status=? AND visible_until<?)) ORDER BY id",
+            (queue, READY, INFLIGHT, time.time())).fetchall()
+        tasks = []
+        for task_id, name, payload, serial_key, dedupe_key, merge, priority, attempts, available_at in rows:
+            if exclude and task_id in exclude:
+                continue
+            if not self.claim(task_id, owner, visibility):
+                # 其他进程已认领
+                continue
+            try:
+                args, kwargs = pickle.loads(payload)
+            except Exception as e:
+                self.bury(task_id, attempts, f"无法恢复任务参数: {e}")
+                continue
+            tasks.append((task_id, name, args, kwargs, serial_key, dedupe_key, merge, priority, attempts, available_at))
+        return tasks
+
+    def dead_letters(self, queue: str, limit: int = 50) -> list:
+        rows = self._execute(
+            "SELECT id, name, serial_key, attempts, last_error, created_at FROM tasks "
+            "WHERE queue=? AND status=? ORDER BY id DESC LIMIT ?", (queue, DEAD, limit)).fetchall()
+        return [{"id": r[0], "name": r[1], "serial_key": r[2], "attempts": r[3], "error": r[4], "created_at": r[5]}
+                for r in rows]
+
+    def requeue_dead(self, queue: str, task_id: int = None) -> int:
+        """重新投递死信，task_id 为空时投递全部"""
+        sql = "UPDATE tasks SET status=?, attempts=0, available_at=?, last_error=NULL WHERE queue=? AND status=?"
+        params = (READY, time.time(), queue, DEAD)
+        if task_id is not None:
+            sql += " AND id=?"
+            params += (task_id,)
+        return self._execute(sql, params).rowcount
+
+    def clear(self, queue: str, ids: list = ()) -> None:
+        """删除未认领的任务和 ids 中已认领未执行的任务，死信保留"""
+        self._execute("DELETE FROM tasks WHERE queue=? AND status=?", (queue, READY))
+        for task_id in ids:
+            self._execute("DELETE FROM tasks WHERE id=? AND status=?", (task_id, INFLIGHT))
+
+    def counts(self, queue: str) -> dict:
+        rows = self._execute("SELECT status, COUNT(*) FROM tasks WHERE queue=? GROUP BY status", (queue,)).fetchall()
+        names = {READY: "ready", INFLIGHT: "inflight", DEAD: "dead"}
+        result = {"ready": 0, "inflight": 0, "dead": 0}
+        result.update({names[status]: count for status, count in rows if status in names})
+        return result
+
+_store = None
+_store_lock = threading.Lock()
+def get_store() -> TaskStore:
+    """进程内共用的任务存储，路径读取 queue.path"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            from core.config import cfg
+            _store = TaskStore(cfg.get_str("queue.path", "data/queue.db") or "data/queue.db")
+        return _store
@@ -0,0 +1,259 @@
+import os
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from core.config import cfg
+from core.queue import store
+from core.queue.queue import TaskQueueManager
+from core.queue.store import TaskStore
+
+RESULTS = []
+_lock = threading.Lock()
+_running = {"now": 0, "max": 0}
+
+def record(value, pause=0.0):
+    with _lock:
+        _running["now"] += 1
+        _running["max"] = max(_running["max"], _running["now"])
+    time.sleep(pause)
+    with _lock:
+        _running["now"] -= 1
+        RESULTS.append(value)
+
+def fail(value):
+    raise RuntimeError(f"boom {value}")
+
+def merge_values(args, kwargs, new_args, new_kwargs):
+    return (args[0] + new_args[0],), kwargs
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+class QueueTestCase(unittest.TestCase):
+    OPTIONS = {}
+
+    def setUp(self):
+        RESULTS.clear()
+        _running.update(now=0, max=0)
+        self.dir = tempfile.mkdtemp()
+        self.saved_store = store._store
+        store._store = TaskStore(os.path.join(self.dir, "queue.db"))
+        self.saved = {key: cfg._snapshot.get(key) for key in self.OPTIONS}
+        cfg._snapshot.update(self.OPTIONS)
+        self.queues = []
+
+    def tearDown(self):
+        for queue in self.queues:
+            queue.stop()
+        for key, value in self.saved.items():
+            if value is None:
+                cfg._snapshot.pop(key, None)
+            else:
+                cfg._snapshot[key] = value
+        store._store = self.saved_store
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def make_queue(self, workers=1, durable=None):
+        queue = TaskQueueManager(tag="test", workers=workers, durable=durable)
+        self.queues.append(queue)
+        return queue
+
+class TestSerialKeys(QueueTestCase):
+    """Test cases for per-key ordering on the worker pool."""
+
+    def test_same_key_runs_in_order(self):
+        """Tasks with the same serial key run one at a time in submission order."""
+        queue = self.make_queue(workers=4)
+        for i in range(6):
+            queue.add_task(record, i, 0.02, serial_key="MP1")
+        queue.run_task_background()
+        self.assertTrue(wait_until(lambda: len(RESULTS) == 6))
+        self.assertEqual(RESULTS, list(range(6)))
+        self.assertEqual(_running["max"], 1)
+
+    def test_different_keys_run_in_parallel(self):
+        """Tasks with different serial keys use several workers."""
+        queue = self.make_queue(workers=4)
+        for i in range(4):
+            queue.add_task(record, i, 0.2, serial_key=f"MP{i}")
+        queue.run_task_background()
+        self.assertTrue(wait_until(lambda: len(RESULTS) == 4))
+        self.assertGreater(_running["max"], 1)
+        self.assertEqual(queue.get_queue_info()["serial_keys"], 0)
+
+class TestRetries(QueueTestCase):
+    """Test cases for durable retries and dead letters."""
+    OPTIONS = {"queue.max_retries": 2, "queue.retry_backoff": 1, "queue.durable": True}
+
+    def test_failed_task_is_retried_then_buried(self):
+        """A failing task is retried with backoff and then moved to the dead letters."""
+        queue = self.make_queue(durable="test")
+        queue.add_task(fail, 1)
+        queue.run_task_background()
+        self.assertTrue(wait_until(lambda: queue.stats["dead"] == 1))
+        self.assertEqual(queue.stats["retried"], 1)
+        self.assertEqual(queue.stats["failed"], 2)
+        dead = queue.dead_letters()
+        self.assertEqual(len(dead), 1)
+        self.assertEqual(dead[0]["attempts"], 2)
+        self.assertIn("boom 1", dead[0]["error"])
+        self.assertEqual(store._store.counts("test")["dead"], 1)
+
+    def test_dead_letter_can_be_requeued(self):
+        """retry_dead puts dead letters back into the queue."""
+        queue = self.make_queue(durable="test")
+        queue.add_task(fail, 1)
+        queue.run_task_background()
+        self.assertTrue(wait_until(lambda: queue.stats["dead"] == 1))
+        self.assertEqual(queue.retry_dead(), 1)
+        self.assertEqual(store._store.counts("test")["dead"], 0)
+        self.assertTrue(wait_until(lambda: store._store.counts("test")["dead"] == 1, timeout=5))
+
+    def test_pending_tasks_survive_restart(self):
+        """Tasks that did not run are recovered by a new queue with the same name."""
+        first = self.make_queue(durable="test")
+        first.add_task(record, "persisted")
+        first.stop()
+        second = self.make_queue(durable="test")
+        second.run_task_background()
+        self.assertTrue(wait_until(lambda: RESULTS == ["persisted"]))
+        self.assertTrue(wait_until(lambda: store._store.counts("test")["ready"] == 0))
+
+    def test_shared_queue_runs_each_task_once(self):
+        """Queues in several processes with the same name claim each task only once."""
+        first = self.make_queue(durable="test")
+        second = self.make_queue(durable="test")
+        for i in range(5):
+            first.add_task(record, f"first-{i}")
+            second.add_task(record, f"second-{i}", delay=0.2)
+        first.run_task_background()
+        second.run_task_background()
+        first._recover()
+        second._recover()
+        self.assertTrue(wait_until(lambda: len(RESULTS) == 10))
+        time.sleep(0.3)
+        self.assertEqual(sorted(RESULTS), sorted([f"first-{i}" for i in range(5)] + [f"second-{i}" for i in range(5)]))
+
+    def test_expired_claim_is_taken_over(self):
+        """A task whose claim expired is run by another queue, the old owner skips it."""
+        first = self.make_queue(durable="test")
+        first.add_task(record, "orphan")
+        store._store._execute("UPDATE tasks SET visible_until=0")
+        second = self.make_queue(durable="test")
+        second.run_task_background()
+        self.assertTrue(wait_until(lambda: RESULTS == ["orphan"]))
+        first.run_task_background()
+        time.sleep(0.3)
+        self.assertEqual(RESULTS, ["orphan"])
+
+    def test_memory_queue_dead_letters(self):
+        """Queues without a store keep dead letters in memory."""
+        queue = self.make_queue()
+        queue.add_task(lambda: fail(2))
+        queue.run_task_background()
+        self.assertTrue(wait_until(lambda: queue.stats["dead"] == 1))
+        self.assertEqual(queue.get_queue_info()["dead_letters"], 1)
+
+class TestDedupe(QueueTestCase):
+    """Test cases for coalescing tasks by idempotency key."""
+    OPTIONS = {"queue.durable": True}
+
+    def test_duplicates_are_merged(self):
+        """A task with a waiting duplicate is merged into it and runs once."""
+        queue = self.make_queue(durable="test")
+        self.assertTrue(queue.add_task(record, ["a"], dedupe_key="feed:1", merge=merge_values))
+        self.assertFalse(queue.add_task(record, ["b"], dedupe_key="feed:1", merge=merge_values))
+        self.assertTrue(queue.add_task(record, ["c"], dedupe_key="feed:2", merge=merge_values))
+        self.assertEqual(queue.stats["merged"], 1)
+        self.assertEqual(store._store.counts("test")["inflight"], 2)
+        queue.run_task_background()
+        self.assertTrue(wait_until(lambda: len(RESULTS) == 2))
+        self.assertEqual(RESULTS, [["a", "b"], ["c"]])
+
+    def test_merged_args_are_persisted(self):
+        """The merged arguments are what a restarted queue recovers."""
+        first = self.make_queue(durable="test")
+        first.add_task(record, ["a"], dedupe_key="feed:1", merge=merge_values)
+        first.add_task(record, ["b"], dedupe_key="feed:1", merge=merge_values)
+        first.stop()
+        second = self.make_queue(durable="test")
+        second.run_task_background()
+        self.assertTrue(wait_until(lambda: RESULTS == [["a", "b"]]))
+
+    def test_without_merge_keeps_waiting_task(self):
+        """Without a merge function the waiting task is kept unchanged."""
+        queue = self.make_queue()
+        queue.add_task(record, "first", dedupe_key="k")
+        queue.add_task(record, "second", dedupe_key="k")
+        queue.run_task_background()
+        self.assertTrue(wait_until(lambda: RESULTS == ["first"]))
+
+    def test_running_task_is_not_merged(self):
+        """Once a task has started, a new task with the same key is queued again."""
+        queue = self.make_queue()
+        queue.add_task(record, "first", 0.3, dedupe_key="k")
+        queue.run_task_background()
+        self.assertTrue(wait_until(lambda: _running["now"] == 1))
+        self.assertTrue(queue.add_task(record, "second", dedupe_key="k"))
+        self.assertTrue(wait_until(lambda: RESULTS == ["first", "second"]))
+
+    def test_merge_promotes_priority(self):
+        """Merging an interactive duplicate moves the waiting task to the interactive lane."""
+        queue = self.make_queue()
+        queue.add_task(record, "backfill", priority="backfill")
+        queue.add_task(record, "feed", dedupe_key="k", priority="backfill")
+        queue.add_task(record, "feed", dedupe_key="k", priority="interactive")
+        queue.run_task_background()
+        self.assertTrue(wait_until(lambda: len(RESULTS) == 2))
+        self.assertEqual(RESULTS, ["feed", "backfill"])
+
+class TestPriorityLanes(QueueTestCase):
+    """Test cases for weighted priority lanes and starvation protection."""
+    OPTIONS = {"queue.max_wait": 300}
+
+    def test_higher_lane_first(self):
+        """With one task in each lane they run from highest to lowest priority."""
+        queue = self.make_queue()
+        for lane in ("backfill", "scheduled", "interactive"):
+            queue.add_task(record, lane, priority=lane)
+        queue.run_task_background()
+        self.assertTrue(wait_until(lambda: len(RESULTS) == 3))
+        self.assertEqual(RESULTS, ["interactive", "scheduled", "backfill"])
+
+    def test_weighted_round_robin(self):
+        """Lower lanes still get their share according to the weights."""
+        queue = self.make_queue()
+        for i in range(6):
+            queue.add_task(record, "scheduled", priority="scheduled")
+            queue.add_task(record, "backfill", priority="backfill")
+        queue.run_task_background()
+        self.assertTrue(wait_until(lambda: len(RESULTS) == 12))
+        self.assertEqual(RESULTS[:4], ["scheduled", "scheduled", "backfill", "scheduled"])
+
+    def test_unknown_priority_is_scheduled(self):
+        """Unknown priorities fall back to the scheduled lane."""
+        queue = self.make_queue()
+        queue.add_task(record, "x", priority="urgent")
+        self.assertEqual(queue.get_queue_info()["lanes"]["scheduled"]["pending"], 1)
+
+    def test_starved_task_runs_first(self):
+        """A task waiting longer than max_wait runs before higher lanes."""
+        cfg._snapshot["queue.max_wait"] = 1
+        queue = self.make_queue()
+        queue.add_task(record, "old", priority="backfill")
+        queue._pending["backfill"][0].enqueued_at -= 10
+        queue.add_task(record, "new", priority="interactive")
+        queue.run_task_background()
+        self.assertTrue(wait_until(lambda: len(RESULTS) == 2))
+        self.assertEqual(RESULTS, ["old", "new"])
+        self.assertEqual(queue.get_queue_info()["lanes"]["backfill"]["aged"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
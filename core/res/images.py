@@ -0,0 +1,272 @@
+"""文章图片本地化
+
+下载文章中的图片，按内容哈希去重存放到 data/files/images/ 下，并把正文中的图片地址改写为本地地址。
+    images/<哈希前两位>/<哈希>.<扩展名>   图片文件，相同内容只存一份
+    images/index/<URL哈希>              URL -> 图片文件 的索引，供反向代理和导出复用
+    images/manifests/<文章ID>.json      每篇文章的图片清单
+"""
+import os
+import re
+import json
+import hashlib
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from core.config import cfg
+from core.print import print_warning
+from .avatar import files_dir
+
+images_dir = f"{files_dir}/images"
+# 本地图片的访问前缀，web.py 中 /files 挂载到 files_dir
+LOCAL_PREFIX = "/files/images/"
+
+CONTENT_TYPES = {
+    "image/jpeg": ".jpg",
+    "image/jpg": ".jpg",
+    "image/png": ".png",
+    "image/gif": ".gif",
+    "image/webp": ".webp",
+    "image/bmp": ".bmp",
+}
+# 可以包含脚本的图片格式，经 /files 同源访问时会造成存储型XSS，不保存到本地
+UNSAFE_TYPES = {"image/svg+xml"}
+MAGIC = [
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"\x89PNG", ".png"),
+    (b"GIF8", ".gif"),
+    (b"RIFF", ".webp"),
+    (b"BM", ".bmp"),
+]
+
+def _url_key(url: str) -> str:
+    # http/https 视为同一张图片
+    url = url.strip()
+    if url.startswith("//"):
+        url = "http:" + url
+    return hashlib.sha256(re.sub(r"^https?://", "", url).encode("utf-8")).hexdigest()
+
+def _sniff(content: bytes) -> str:
+    """按文件头识别图片格式，返回扩展名，不是已知格式返回空字符串"""
+    for magic, ext in MAGIC:
+        if content.startswith(magic):
+            # RIFF 也用于音视频，WebP 在第8字节处标记 WEBP
+            if ext == ".webp" and content[8:12] != b"WEBP":
+                continue
+            return ext
+    return ""
+
+def _mime(content_type: str) -> str:
+    return (content_type or "").split(";")[0].strip().lower()
+
+def _is_image(content: bytes, content_type: str) -> bool:
+    """响应是否为图片：文件头是已知格式，或者 Content-Type 为 image/*"""
+    if not content:
+        return False
+    mime = _mime(content_type)
+    if mime in UNSAFE_TYPES:
+        return False
+    return bool(_sniff(content)) or mime.startswith("image/")
+
+def _guess_ext(content: bytes, content_type: str, url: str) -> str:
+    ext = _sniff(content) or CONTENT_TYPES.get(_mime(content_type))
+    if ext:
+        return ext
+    # 微信图片地址 wx_fmt=png 之类，只接受已知的图片扩展名
+    match = re.search(r"wx_fmt=(\w+)", url)
+    if match:
+        ext = "." + match.group(1).lower().replace("jpeg", "jpg")
+        if ext in CONTENT_TYPES.values():
+            return ext
+    return ".jpg"
+
+class ImageStore:
+    """内容寻址的图片存储"""
+
+    def __init__(self, root: str = images_dir):
+        self.root = root
+        self.index_dir = os.path.join(root, "index")
+        self.manifest_dir = os.path.join(root, "manifests")
+        os.makedirs(self.index_dir, exist_ok=True)
+        os.makedirs(self.manifest_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        # URL哈希 -> 相对路径 的内存缓存
+        self._index = {}
+        # 同一URL同时只下载一次
+        self._inflight = {}
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=1)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def lookup(self, url: str):
+        """按原始URL查找已保存的图片，返回相对 images_dir 的路径"""
+        if not url:
+            return None
+        key = _url_key(url)
+        with self._lock:
+            rel = self._index.get(key)
+        if rel is None:
+            try:
+                with open(os.path.join(self.index_dir, key), "r", encoding="utf-8") as f:
+                    rel = f.read().strip()
+            except OSError:
+                return None
+        if rel.endswith(".svg") or not os.path.exists(os.path.join(self.root, rel)):
+            # 旧版本保存的SVG不再使用
+            return None
+        with self._lock:
+            self._index[key] = rel
+        return rel
+
+    def path(self, rel: str) -> str:
+        return os.path.join(self.root, rel)
+
+    def resolve(self, url: str):
+        """本地图片地址或已保存的原始URL -> 本地文件路径，未保存返回None"""
+        if not url:
+            return None
+        if url.startswith(LOCAL_PREFIX):
+            path = self.path(url[len(LOCAL_PREFIX):])
+            return path if os.path.exists(path) else None
+        rel = self.lookup(url)
+        return self.path(rel) if rel else None
+
+    def _save(self, content: bytes, content_type: str, url: str) -> str:
+        digest = hashlib.sha256(content).hexdigest()
+        rel = f"{digest[:2]}/{digest}{_guess_ext(content, content_type, url)}"
+        path = self.path(rel)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(content)
+            os.replace(tmp, path)
+        return rel
+
+    def _index_url(self, url: str, rel: str) -> None:
+        key = _url_key(url)
+        with open(os.path.join(self.index_dir, key), "w", encoding="utf-8") as f:
+            f.write(rel)
+        with self._lock:
+            self._index[key] = rel
+
+    def fetch(self, url: str, timeout: int = 20) -> dict:
+        """下载并保存图片，已保存的直接返回
+
+        Returns:
+            {"url","path","size","content_type"}，失败返回None
+        """
+        rel = self.lookup(url)
+        if rel:
+            return {"url": url, "path": rel, "size": os.path.getsize(self.path(rel)), "content_type": ""}
+        key = _url_key(url)
+        with self._lock:
+            event = self._inflight.get(key)
+            owner = event is None
+            if owner:
+                event = self._inflight[key] = threading.Event()
+        if not owner:
+            event.wait(timeout)
+            rel = self.lookup(url)
+            return {"url": url, "path": rel, "size": os.path.getsize(self.path(rel)), "content_type": ""} if rel else None
+        try:
+            target = "http:" + url if url.startswith("//") else url
+            resp = self.session.get(target, timeout=timeout, headers={
+                "User-Agent": cfg.get("user_agent", "") or "Mozilla/5.0",
+                "Accept": "image/webp,image/apng,image/*,*/*;q=0.8",
+            })
+            resp.raise_for_status()
+            content_type = resp.headers.get("Content-Type", "")
+            if not _is_image(resp.content, content_type):
+                # 防盗链提示页、错误页等不保存
+                raise ValueError(f"响应不是图片 Content-Type: {content_type or '无'}")
+            rel = self._save(resp.content, content_type, url)
+            self._index_url(url, rel)
+            return {"url": url, "path": rel, "size": len(resp.content), "content_type": content_type}
+        except Exception as e:
+            print_warning(f"下载图片失败: {url} {e}")
+            return None
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    def fetch_all(self, urls: list, workers: int = None) -> dict:
+        """并发下载多张图片，返回 URL -> 结果"""
+        urls = list(dict.fromkeys(u for u in urls if u))
+        if not urls:
+            return {}
+        workers = workers or int(cfg.get("gather.image_workers", 4) or 4)
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(urls)))) as pool:
+            return {url: result for url, result in zip(urls, pool.map(self.fetch, urls)) if result}
+
+    def localize(self, html: str, article_id: str, cover: str = None):
+        """下载正文(和封面)中的图片并改写为本地地址，写入文章图片清单
+
+        Returns:
+            (改写后的HTML, 清单)
+        """
+        from lxml import html as lxml_html
+        from core.content_clean import cleaner
+        root = None
+        urls = []
+        if html and html.strip():
+            root = lxml_html.fragment_fromstring(html, create_parent="div")
+            for img in root.iter("img"):
+                url = (img.get("data-src") or img.get("src") or "").strip()
+                if url.startswith(("http://", "https://", "//")):
+                    urls.append(url)
+        if cover:
+            urls.append(cover)
+        results = self.fetch_all(urls)
+
+        content = html
+        if root is not None and results:
+            for img in root.iter("img"):
+                url = (img.get("data-src") or img.get("src") or "").strip()
+                result = results.get(url)
+                if result is not None:
+                    img.set("src", LOCAL_PREFIX + result["path"])
+                    img.attrib.pop("data-src", None)
+            content = cleaner.to_html(root, inner=True)
+        manifest = {
+            "article_id": article_id,
+            "cover": results.get(cover) if cover else None,
+            "images": [results[url] for url in dict.fromkeys(urls) if url in results and url != cover],
+            "failed": [url for url in dict.fromkeys(urls) if url not in results],
+        }
+        self.save_manifest(article_id, manifest)
+        return content, manifest
+
+    def _manifest_path(self, article_id: str) -> str:
+        return os.path.join(self.manifest_dir, re.sub(r"[^\w\-]", "_", str(article_id)) + ".json")
+
+    def save_manifest(self, article_id: str, manifest: dict) -> None:
+        with open(self._manifest_path(article_id), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+
+    def get_manifest(self, article_id: str):
+        try:
+            with open(self._manifest_path(article_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def public_url(self, url: str, base: str = ""):
+        """已保存的原始图片地址 -> 本地访问地址(带base前缀)，未保存返回None"""
+        if not url or url.startswith(LOCAL_PREFIX):
+            return f"{base.rstrip('/')}{url}" if url else None
+        rel = self.lookup(url)
+        return f"{base.rstrip('/')}{LOCAL_PREFIX}{rel}" if rel else None
+
+def absolute_urls(html: str, base: str) -> str:
+    """把正文中的本地图片地址补全为绝对地址，供RSS阅读器访问"""
+    if not html or not base:
+        return html
+    return html.replace(f'src="{LOCAL_PREFIX}', f'src="{base.rstrip("/")}{LOCAL_PREFIX}')
+
+def localize_enabled() -> bool:
+    return cfg.get_bool("gather.localize_images", False)
+
+Images = ImageStore()
@@ -0,0 +1,364 @@
+"""图片反向代理引擎
+
+- 进程内共享一个长连接池的 httpx.AsyncClient
+- 同一URL并发未命中时只向上游请求一次(single-flight)，其余请求等待缓存写完后从缓存返回
+- 上游响应在后台任务中写入缓存，同时转发给发起请求的客户端，客户端断开不影响缓存写入
+- 缓存读写使用异步文件I/O，不阻塞事件循环
+- 过期后在 stale 期限内先返回旧缓存，后台带 ETag/Last-Modified 重新验证(stale-while-revalidate)
+- 按 ?w=&h=&fmt= 在进程池中生成缩略图/WebP变体，缓存在原图旁边(见 core.res.variants)
+
+缓存文件格式: 第一行为响应元数据JSON，其后为响应体；文件修改时间即缓存时间。
+"""
+import os
+import json
+import time
+import asyncio
+import hashlib
+import anyio
+import httpx
+from concurrent.futures import ProcessPoolExecutor
+from fastapi.responses import Response, StreamingResponse, FileResponse
+from core.print import print_warning
+from .variants import VariantSpec, render
+
+# 不转发给客户端的响应头
+HOP_HEADERS = {"connection", "keep-alive", "transfer-encoding", "content-encoding", "content-length",
+               "proxy-authenticate", "proxy-authorization", "te", "trailer", "upgrade", "set-cookie"}
+CHUNK_SIZE = 64 * 1024
+# 转发给客户端的数据块最多缓冲的个数，客户端读取过慢时不在内存中堆积整个响应
+TEE_CHUNKS = 16
+
+class TeeQueue(asyncio.Queue):
+    """转发给客户端的数据块，客户端断开或读取过慢时 closed 为 True，停止转发，缓存照常写完"""
+
+    def __init__(self, maxsize: int = TEE_CHUNKS):
+        super().__init__(maxsize)
+        self.closed = False
+
+class ProxyEngine:
+
+    def __init__(self, cache_dir: str, fresh_ttl: int = 3600, stale_ttl: int = 7 * 86400,
+                 max_connections: int = 100, timeout: float = 15, processes: int = 2):
+        self.cache_dir = cache_dir
+        self.fresh_ttl = fresh_ttl
+        self.stale_ttl = stale_ttl
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.processes = processes
+        self._client = None
+        self._pool = None
+        # 无法生成变体的图片(如动图)直接返回原图
+        self._no_variant = set()
+        self._inflight = {}
+        # 持有后台任务的引用，避免任务在完成前被回收
+        self._tasks = set()
+        self.stats = {"hit": 0, "stale": 0, "miss": 0, "coalesced": 0, "revalidated": 0, "error": 0,
+                      "variant_hit": 0, "variant_render": 0}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=20),
+                timeout=httpx.Timeout(self.timeout, connect=5),
+                follow_redirects=True,
+                headers={"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36"},
+            )
+        return self._client
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=max(1, self.processes))
+        return self._pool
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def cache_path(self, url: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha256(f"GET_{url}".encode("utf-8")).hexdigest())
+
+    async def _read_meta(self, path: str):
+        """读取缓存元数据，返回 (元数据, 缓存时间, 响应体偏移)，不存在返回None"""
+        try:
+            stat = await anyio.Path(path).stat()
+            async with await anyio.open_file(path, "rb") as f:
+                line = await f.readline()
+            return json.loads(line), stat.st_mtime, len(line)
+        except (OSError, ValueError):
+            return None
+
+    async def _stream_file(self, path: str, offset: int):
+        async with await anyio.open_file(path, "rb") as f:
+            await f.seek(offset)
+            while True:
+                chunk = await f.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
+    def _cached_response(self, path: str, meta: dict, offset: int, state: str) -> StreamingResponse:
+        headers = dict(meta.get("headers", {}))
+        headers["X-Cache"] = state
+        return StreamingResponse(self._stream_file(path, offset), status_code=meta.get("status", 200),
+                                 headers=headers, media_type=headers.get("content-type"))
+
+    @staticmethod
+    def _headers(resp: httpx.Response) -> dict:
+        return {k: v for k, v in resp.headers.items() if k.lower() not in HOP_HEADERS}
+
+    async def get(self, url: str) -> Response:
+        """代理GET请求，优先使用缓存"""
+        path = self.cache_path(url)
+        for _ in range(3):
+            cached = await self._read_meta(path)
+            if cached is not None:
+                meta, stored_at, offset = cached
+                age = time.time() - stored_at
+                if age < self.fresh_ttl:
+                    self.stats["hit"] += 1
+                    return self._cached_response(path, meta, offset, "HIT")
+                if age < self.stale_ttl:
+                    self.stats["stale"] += 1
+                    if path not in self._inflight:
+                        self._inflight[path] = asyncio.get_running_loop().create_future()
+                        self._spawn(self._revalidate(url, path, meta))
+                    return self._cached_response(path, meta, offset, "STALE")
+            waiter = self._inflight.get(path)
+            if waiter is None:
+                return await self._fetch(url, path)
+            # 已有请求在拉取同一URL，等它写完缓存
+            self.stats["coalesced"] += 1
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter), self.timeout)
+            except Exception:
+                pass
+        return await self._fetch(url, path, lead=False)
+
+    async def _fetch(self, url: str, path: str, lead: bool = True) -> Response:
+        """向上游请求，边转发边写缓存"""
+        self.stats["miss"] += 1
+        waiter = None
+        if lead:
+            waiter = self._inflight[path] = asyncio.get_running_loop().create_future()
+        try:
+            resp = await self.client.send(self.client.build_request("GET", url), stream=True)
+        except Exception as e:
+            self.stats["error"] += 1
+            self._finish(path, waiter, e)
+            return Response(content=f"获取资源失败: {e}", status_code=502)
+        headers = self._headers(resp)
+        if resp.status_code != 200 or waiter is None:
+            # 只缓存成功的响应
+            body = await resp.aread()
+            await resp.aclose()
+            self._finish(path, waiter, None)
+            return Response(content=body, status_code=resp.status_code, headers=headers,
+                            media_type=resp.headers.get("content-type"))
+        meta = {"status": 200, "headers": headers}
+        # 写缓存放在独立任务中，客户端中途断开也会写完，等待同一URL的请求不会被挂起
+        queue = TeeQueue()
+        self._spawn(self._tee(resp, path, meta, waiter, queue))
+        return StreamingResponse(self._drain(queue), status_code=200, headers=dict(headers, **{"X-Cache": "MISS"}),
+                                 media_type=resp.headers.get("content-type"))
+
+    async def _drain(self, queue: TeeQueue):
+        try:
+            while True:
+                if queue.closed and queue.empty():
+                    raise ConnectionError("客户端读取过慢，已停止转发")
+                chunk = await queue.get()
+                if chunk is None:
+                    break
+                if isinstance(chunk, Exception):
+                    raise chunk
+                yield chunk
+        finally:
+            # 客户端断开时不再向队列写入
+            queue.closed = True
+
+    async def _forward(self, queue: TeeQueue, item) -> None:
+        """把数据块交给客户端，超过 timeout 秒仍没有空位时停止转发"""
+        if queue.closed:
+            return
+        try:
+            await asyncio.wait_for(queue.put(item), self.timeout)
+        except asyncio.TimeoutError:
+            queue.closed = True
+
+    async def _tee(self, resp: httpx.Response, path: str, meta: dict, waiter, queue: TeeQueue) -> None:
+        tmp = f"{path}.{id(resp)}.tmp"
+        error = None
+        try:
+            async with await anyio.open_file(tmp, "wb") as f:
+                await f.write(json.dumps(meta).encode("utf-8") + b"\n")
+                async for chunk in resp.aiter_bytes(CHUNK_SIZE):
+                    await f.write(chunk)
+                    await self._forward(queue, chunk)
+            await anyio.Path(tmp).replace(path)
+        except Exception as e:
+            error = e
+            self.stats["error"] += 1
+            try:
+                await anyio.Path(tmp).unlink()
+            except OSError:
+                pass
+        finally:
+            await resp.aclose()
+            self._finish(path, waiter, error)
+            await self._forward(queue, error)
+
+    async def _ensure(self, url: str, path: str):
+        """确保原图已缓存，返回 ((元数据, 缓存时间, 响应体偏移), None)；
+        上游失败时返回 (None, 上游的响应)，调用方直接返回该响应，不再重复请求"""
+        cached = await self._read_meta(path)
+        if cached is not None:
+            return cached, None
+        resp = await self.get(url)
+        if not isinstance(resp, StreamingResponse):
+            # 上游返回非200或请求失败的响应没有缓存
+            return None, resp
+        async for _ in resp.body_iterator:
+            pass
+        cached = await self._read_meta(path)
+        if cached is None:
+            # 写缓存失败，原图直接转发
+            return None, await self.get(url)
+        return cached, None
+
+    async def variant(self, url: str, spec: VariantSpec, source: str = None) -> Response:
+        """返回图片的缩放/转换变体
+
+        Args:
+            url: 原图地址，同时作为变体缓存的键
+            spec: 变体规格
+            source: 本地原图文件，为空时使用代理缓存中的原图
+        """
+        target = f"{self.cache_path(url)}.{spec.key}"
+        cached = await self._cached_variant(target)
+        if cached is not None:
+            return cached
+        if source:
+            offset = 0
+        else:
+            source = self.cache_path(url)
+            original, failed = await self._ensure(url, source)
+            if original is None:
+                return failed
+            offset = original[2]
+        # 下载原图期间可能已有其他请求开始生成同一变体
+        cached = await self._cached_variant(target)
+        if cached is not None:
+            return cached
+        if target in self._no_variant or target in self._inflight:
+            return await self._original(url, source, offset)
+
+        waiter = self._inflight[target] = asyncio.get_running_loop().create_future()
+        error = None
+        meta = None
+        try:
+            self.stats["variant_render"] += 1
+            meta = await asyncio.get_running_loop().run_in_executor(
+                self.pool, render, source, offset, target, spec.width, spec.height, spec.fmt, spec.quality)
+        except Exception as e:
+            error = e
+            self.stats["error"] += 1
+            print_warning(f"生成图片变体失败: {url} {e}")
+        finally:
+            self._finish(target, waiter, error)
+        if meta is None:
+            if error is None:
+                self._no_variant.add(target)
+            return await self._original(url, source, offset)
+        cached = await self._read_meta(target)
+        if cached is None:
+            return await self._original(url, source, offset)
+        return self._cached_response(target, cached[0], cached[2], "MISS")
+
+    async def _cached_variant(self, target: str):
+        """返回已缓存的变体，正在生成时等待其完成，没有时返回None"""
+        for _ in range(2):
+            cached = await self._read_meta(target)
+            # 公众号图片地址对应的内容不会变化，变体在 stale 期限内都有效
+            if cached is not None and time.time() - cached[1] < self.stale_ttl:
+                self.stats["variant_hit"] += 1
+                meta, _, offset = cached
+                return self._cached_response(target, meta, offset, "HIT")
+            waiter = self._inflight.get(target)
+            if waiter is None:
+                return None
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter), self.timeout)
+            except Exception:
+                pass
+        return None
+
+    async def _original(self, url: str, source: str, offset: int) -> Response:
+        if offset == 0:
+            return FileResponse(source, headers={"Cache-Control": "public, max-age=31536000, immutable"})
+        return await self.get(url)
+
+    async def _revalidate(self, url: str, path: str, meta: dict) -> None:
+        """后台重新验证过期缓存，未变化时只刷新缓存时间"""
+        waiter = self._inflight.get(path)
+        error = None
+        try:
+            headers = {}
+            cached = meta.get("headers", {})
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last-modified"):
+                headers["If-Modified-Since"] = cached["last-modified"]
+            async with self.client.stream("GET", url, headers=headers) as resp:
+                if resp.status_code == 304:
+                    await anyio.to_thread.run_sync(os.utime, path, None)
+                elif resp.status_code == 200:
+                    tmp = f"{path}.{id(resp)}.tmp"
+                    async with await anyio.open_file(tmp, "wb") as f:
+                        await f.write(json.dumps({"status": 200, "headers": self._headers(resp)}).encode("utf-8") + b"\n")
+                        async for chunk in resp.aiter_bytes(CHUNK_SIZE):
+                            await f.write(chunk)
+                    await anyio.Path(tmp).replace(path)
+            self.stats["revalidated"] += 1
+        except Exception as e:
+            error = e
+            self.stats["error"] += 1
+            print_warning(f"重新验证缓存失败: {url} {e}")
+        finally:
+            self._finish(path, waiter, error)
+
+    def _finish(self, path: str, waiter, error) -> None:
+        if waiter is None:
+            return
+        if self._inflight.get(path) is waiter:
+            del self._inflight[path]
+        if not waiter.done():
+            if error is None:
+                waiter.set_result(True)
+            else:
+                waiter.set_exception(error)
+                # 没有等待者时避免 "exception was never retrieved" 警告
+                waiter.exception()
+
+    async def passthrough(self, method: str, url: str, body: bytes = None) -> Response:
+        """非GET请求直接转发，不缓存"""
+        try:
+            resp = await self.client.request(method, url, content=body)
+        except Exception as e:
+            return Response(content=f"获取资源失败: {e}", status_code=502)
+        return Response(content=resp.content, status_code=resp.status_code, headers=self._headers(resp),
+                        media_type=resp.headers.get("content-type"))
+
+    def get_stats(self) -> dict:
+        return dict(self.stats, inflight=len(self._inflight))
@@ -0,0 +1,36 @@
+import unittest
+from urllib.parse import urlsplit, parse_qs
+from core.res.variants import VariantSpec, thumb_url
+
+def query(url):
+    return {key: values[0] for key, values in parse_qs(urlsplit(url).query).items()}
+
+class TestVariants(unittest.TestCase):
+    """Test cases for variant specs and thumbnail urls."""
+
+    def test_parse(self):
+        """Sizes are clamped, unknown formats and empty specs are rejected."""
+        spec = VariantSpec.parse({"w": "5000", "fmt": "WEBP"})
+        self.assertEqual((spec.width, spec.height, spec.fmt, spec.quality), (1920, 0, "webp", 80))
+        self.assertIsNone(VariantSpec.parse({"fmt": "gif"}))
+        self.assertIsNone(VariantSpec.parse({"w": "abc"}))
+
+    def test_thumb_url(self):
+        """The original url is proxied with the resize parameters."""
+        url = thumb_url("https://mmbiz.qpic.cn/a/0", "http://rss.local/", 320)
+        self.assertEqual(url, "http://rss.local/static/res/logo/https://mmbiz.qpic.cn/a/0?w=320&fmt=webp")
+
+    def test_thumb_url_with_query(self):
+        """Resize parameters are appended to an existing ?wx_fmt= query."""
+        url = thumb_url("https://mmbiz.qpic.cn/a/0?wx_fmt=jpeg", "http://rss.local", 320)
+        params = query(url)
+        self.assertEqual(params, {"wx_fmt": "jpeg", "w": "320", "fmt": "webp"})
+        self.assertEqual(VariantSpec.parse(params).width, 320)
+
+    def test_thumb_url_unchanged(self):
+        """Zero width and non http urls are returned unchanged."""
+        self.assertEqual(thumb_url("https://mmbiz.qpic.cn/a/0", "http://rss.local", 0), "https://mmbiz.qpic.cn/a/0")
+        self.assertEqual(thumb_url("/files/a.png", "http://rss.local", 320), "/files/a.png")
+
+if __name__ == '__main__':
+    unittest.main()
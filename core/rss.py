@@ -91,7 +91,7 @@ class RSS:
         """
         import re
         try:
-            pattern = re.compile(r'(<img[^>]*src=["\'])(?!\/static\/res\/logo\/)([^"\']*)', re.IGNORECASE)
+            pattern = re.compile(r'(<img[^>]*src=["\'])(?!\/static\/res\/logo\/|\/files\/)([^"\']*)', re.IGNORECASE)
             return pattern.sub(r'\1/static/res/logo/\2', text)
         except:
             return text
@@ -100,7 +100,10 @@ class RSS:
                     link: str = "https://github.com/rachelos/we-mp-rss",
                     description: str = "RSS频道", language: str = "zh-CN",image_url:str=""):
         from core.config import cfg
-        full_context=bool(cfg.get("rss.full_context",False))
+        # 循环外取出配置，避免每个条目重复读取
+        full_context=cfg.get_bool("rss.full_context",False)
+        add_cover=cfg.get_bool("rss.add_cover",False)
+        cdata=cfg.get_bool("rss.cdata",False)
         
         # 创建根元素(RSS标准)
         rss = ET.Element("rss", version="2.0")
@@ -117,7 +120,7 @@ class RSS:
         ET.SubElement(channel, "lastBuildDate").text = datetime.now(timezone(timedelta(hours=8))).strftime("%a, %d %b %Y %H:%M:%S %z")
     
         # 设置image子项
-        if cfg.get("rss.add_cover",False)==True and image_url != "":
+        if add_cover and image_url != "":
             image = ET.SubElement(channel, "image")
             ET.SubElement(image, "url").text = image_url
             ET.SubElement(image, "title").text = title
@@ -130,14 +133,14 @@ class RSS:
             ET.SubElement(item, "description").text = rss_item["description"] 
             ET.SubElement(item, "guid").text = rss_item["link"]
             # 添加图片封面
-            if cfg.get("rss.add_cover",False)==True:
+            if add_cover:
                 enclosure = ET.SubElement(item, "enclosure")
                 enclosure.set("url", rss_item["image"])
                 enclosure.set("length", "0")
-                enclosure.set("type", "image/jpeg")
+                enclosure.set("type", rss_item.get("image_type", "image/jpeg"))
             if full_context==True:
                 try:
-                    if cfg.get("rss.cdata",False)==True:
+                    if cdata:
                         content = f"<![CDATA[{str(rss_item['content'])}]]>"  # 使用CDATA包裹内容
                     else:
                         content = str(rss_item['content'])
@@ -175,7 +178,10 @@ class RSS:
             Atom格式的XML字符串
         """
         from core.config import cfg
-        full_context = bool(cfg.get("rss.full_context", False))
+        full_context = cfg.get_bool("rss.full_context", False)
+        add_cover = cfg.get_bool("rss.add_cover", False)
+        cdata = cfg.get_bool("rss.cdata", False)
+        content_type = self.get_content_type()
         
         # 创建根元素(Atom标准)
         feed = ET.Element("feed", xmlns="http://www.w3.org/2005/Atom")
@@ -191,7 +197,7 @@ class RSS:
         ET.SubElement(feed, "id").text = str(link)
         ET.SubElement(feed, "author").text = "Mp-We-Rss"
         # 设置image子项
-        if cfg.get("rss.add_cover",False)==True and image_url != "":
+        if add_cover and image_url != "":
             image = ET.SubElement(feed, "image")
             ET.SubElement(image, "url").text = str(image_url)
             ET.SubElement(image, "title").text = str(title)
@@ -205,19 +211,18 @@ class RSS:
             ET.SubElement(entry, "summary").text = str(rss_item["description"])
             ET.SubElement(entry, "author").text = str(rss_item["mp_name"])
              # 添加图片封面
-            if cfg.get("rss.add_cover",False)==True:
+            if add_cover:
                 enclosure = ET.SubElement(entry, "enclosure")
                 enclosure.set("url", str(rss_item["image"]))
                 enclosure.set("length", "0")
-                enclosure.set("type", "image/jpeg")
+                enclosure.set("type", rss_item.get("image_type", "image/jpeg"))
             
             if full_context:
-                type=self.get_content_type()
-                # content = ET.SubElement(entry, "content", type=f"{str(type)}") 
-                # content.text = format_content(rss_item["content"],type)
-                content=format_content(rss_item["content"],type)
+                # content = ET.SubElement(entry, "content", type=f"{str(content_type)}") 
+                # content.text = format_content(rss_item["content"],content_type)
+                content=format_content(rss_item["content"],content_type)
                 try:
-                    if cfg.get("rss.cdata",False)==True:
+                    if cdata:
                         content = f"<![CDATA[{content}]]>"  # 使用CDATA包裹内容
                     else:
                         ET.SubElement(entry, "content:encoded").text = content
@@ -1,7 +1,12 @@
 import threading
 import random
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.schedulers.base import STATE_PAUSED
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+from apscheduler.events import EVENT_JOB_ERROR, EVENT_JOB_MISSED
+from apscheduler.jobstores.base import JobLookupError
+from datetime import datetime
 from typing import Callable, Any, Optional
 from core.log import logger
 import uuid
@@ -42,13 +47,44 @@ class TaskScheduler:
         "30 * * * * *"  每分钟的第30秒执行 (6位)
         "0 0 0 * * *"   每天午夜执行 (6位)
         "0 0 9 * * MON" 每周一上午9点执行 (6位)
+
+    指定 store 时任务保存在数据库的 apscheduler_{store} 表中(scheduler.persistent 关闭时仍只在内存中)，
+    重启后保留每个任务的下次执行时间，停机期间错过的执行按任务的 coalesce/misfire_grace_time 补执行一次或跳过。
+    持久化的任务函数需要是模块级函数，参数需要可以被pickle。
     """
     
-    def __init__(self):
+    def __init__(self, store: Optional[str] = None):
         """初始化调度器和线程锁"""
-        self._scheduler = BackgroundScheduler()
+        from core.config import cfg
+        self._store = store if store and cfg.get_bool("scheduler.persistent", True) else None
+        jobstores = {}
+        if self._store:
+            from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+            from core.db import DB
+            jobstores["default"] = SQLAlchemyJobStore(engine=DB.get_engine(), tablename=f"apscheduler_{self._store}")
+        self._scheduler = BackgroundScheduler(jobstores=jobstores, job_defaults={
+            # 错过的多次执行合并为一次，超过宽限时间的执行跳过
+            "coalesce": True,
+            "misfire_grace_time": cfg.get_int("scheduler.misfire_grace_time", 300),
+        })
+        self._scheduler.add_listener(self._on_event, EVENT_JOB_ERROR | EVENT_JOB_MISSED)
         self._lock = threading.Lock()
-        self._jobs = {}
+
+    def _on_event(self, event) -> None:
+        if event.code == EVENT_JOB_MISSED:
+            logger.warning(f"Job {event.job_id} missed run at {event.scheduled_run_time}")
+        elif event.exception:
+            logger.error(f"Job {event.job_id} failed: {str(event.exception)}")
+
+    def _open(self) -> None:
+        """持久化的调度器先以暂停状态启动，才能读取数据库中已有的任务，调用 start 后开始执行"""
+        if self._store and not self._scheduler.running:
+            self._scheduler.start(paused=True)
+
+    @property
+    def running(self) -> bool:
+        """调度器是否已启动(包括暂停状态)"""
+        return self._scheduler.running
 
     def add_cron_job(self,
                      func: Callable,
@@ -56,7 +92,9 @@ class TaskScheduler:
                      args: Optional[tuple] = None,
                      kwargs: Optional[dict] = None,
                      job_id: Optional[str] = None,
-                     tag: str = ""
+                     tag: str = "",
+                     coalesce: Optional[bool] = None,
+                     misfire_grace_time: Optional[int] = None
                      ) -> str:
         """
         添加一个cron定时任务
@@ -66,6 +104,8 @@ class TaskScheduler:
         :param args: 函数的位置参数
         :param kwargs: 函数的关键字参数
         :param job_id: 任务ID，如果不指定则自动生成
+        :param coalesce: 错过多次执行时是否只补执行一次，默认True
+        :param misfire_grace_time: 错过执行后多少秒内仍补执行，默认读取 scheduler.misfire_grace_time
         :return: 任务ID
         """
         with self._lock:
@@ -141,30 +181,80 @@ class TaskScheduler:
                     month=month,
                     day_of_week=day_of_week
                 )
-                
-                # 包装任务函数以捕获异常
-                def wrapped_func(*args, **kwargs):
-                    try:
-                        # logger.info(f"Executing job {job_id or 'anonymous'}")
-                        return func(*args, **kwargs)
-                    except Exception as e:
-                        logger.error(f"Job {tag} {job_id or 'anonymous'} failed: {str(e)}")
-                        raise
-                
+                options = {}
+                if coalesce is not None:
+                    options["coalesce"] = bool(coalesce)
+                if misfire_grace_time is not None:
+                    options["misfire_grace_time"] = int(misfire_grace_time)
+
+                self._open()
+                existing = self._scheduler.get_job(str(job_id))
+                if (existing is not None and existing.func == func and str(existing.trigger) == str(trigger)
+                        and tuple(existing.args) == tuple(args or ()) and existing.kwargs == (kwargs or {})):
+                    # 触发规则不变时保留原有的下次执行时间，停机期间错过的执行按策略补执行
+                    changes = {k: v for k, v in options.items() if getattr(existing, k) != v}
+                    if changes:
+                        self._scheduler.modify_job(existing.id, **changes)
+                    logger.info(f"Job {tag} {existing.id} unchanged")
+                    return existing.id
+
+                # 任务执行失败和错过执行由 _on_event 记录日志
                 job = self._scheduler.add_job(
-                    wrapped_func,
+                    func,
                     trigger=trigger,
                     args=args,
                     kwargs=kwargs,
-                    id=str(job_id)
+                    id=str(job_id),
+                    name=tag or None,
+                    replace_existing=True,
+                    **options
                 )
-                self._jobs[job.id] = job
                 logger.info(f"Successfully added job {tag} {job.id}")
                 return job.id
             except Exception as e:
                 logger.error(f"Failed to add cron job: {str(e)}")
                 raise
     
+    def add_interval_job(self,
+                         func: Callable,
+                         seconds: int,
+                         args: Optional[tuple] = None,
+                         kwargs: Optional[dict] = None,
+                         job_id: Optional[str] = None,
+                         tag: str = ""
+                         ) -> str:
+        """
+        添加一个固定间隔执行的任务，间隔不受cron字段取值范围的限制
+
+        :param func: 要执行的函数
+        :param seconds: 执行间隔 单位秒
+        :param args: 函数的位置参数
+        :param kwargs: 函数的关键字参数
+        :param job_id: 任务ID，如果不指定则自动生成
+        :return: 任务ID
+        """
+        with self._lock:
+            job_id = job_id or str(uuid.uuid4())
+            trigger = IntervalTrigger(seconds=max(1, int(seconds)))
+            self._open()
+            existing = self._scheduler.get_job(str(job_id))
+            if (existing is not None and existing.func == func and str(existing.trigger) == str(trigger)
+                    and tuple(existing.args) == tuple(args or ()) and existing.kwargs == (kwargs or {})):
+                # 间隔不变时保留原有的下次执行时间
+                logger.info(f"Job {tag} {existing.id} unchanged")
+                return existing.id
+            job = self._scheduler.add_job(
+                func,
+                trigger=trigger,
+                args=args,
+                kwargs=kwargs,
+                id=str(job_id),
+                name=tag or None,
+                replace_existing=True
+            )
+            logger.info(f"Successfully added job {tag} {job.id}")
+            return job.id
+
     def remove_job(self, job_id: str) -> bool:
         """
         移除指定任务
@@ -173,11 +263,12 @@ class TaskScheduler:
         :return: 是否成功移除
         """
         with self._lock:
-            if job_id in self._jobs:
+            self._open()
+            try:
                 self._scheduler.remove_job(job_id)
-                del self._jobs[job_id]
                 return True
-            return False
+            except JobLookupError:
+                return False
     
     def clear_all_jobs(self) -> int:
         """
@@ -186,24 +277,22 @@ class TaskScheduler:
         :return: 被删除的任务数量
         """
         with self._lock:
-            job_count = len(self._jobs)
+            self._open()
+            job_count = len(self._scheduler.get_jobs())
             if job_count > 0:
-                # 先终止所有正在运行的任务
-                for job in self._scheduler.get_jobs():
-                    try:
-                        self._scheduler.remove_job(job.id)
-                    except Exception as e:
-                        logger.warning(f"Failed to remove job {job.id}: {str(e)}")
-                
                 # 清除所有计划任务
                 self._scheduler.remove_all_jobs()
-                self._jobs.clear()
                 logger.info(f"Removed all {job_count} jobs")
             return job_count
     
     def start(self) -> None:
         """启动调度器"""
         with self._lock:
+            if self._scheduler.state == STATE_PAUSED:
+                # 持久化调度器添加任务时以暂停状态启动
+                self._scheduler.resume()
+                logger.info("Scheduler resumed")
+                return
             if self._scheduler.running:
                 logger.warning("Scheduler is already running")
                 return
@@ -225,12 +314,21 @@ class TaskScheduler:
         with self._lock:
             if self._scheduler.running:
                 self._scheduler.shutdown(wait=wait)
-                self._jobs.clear()
     
+    def get_next_run_time(self, job_id: str):
+        """从现在起任务的下一次触发时间，任务不存在时返回 None"""
+        with self._lock:
+            job = self._scheduler.get_job(job_id)
+            if job is None:
+                return None
+            # 按触发规则计算，任务执行期间数据库中的下次执行时间可能还没有更新
+            return job.trigger.get_next_fire_time(None, datetime.now(job.trigger.timezone))
+
     def get_job_ids(self) -> list[str]:
         """获取所有任务ID"""
         with self._lock:
-            return list(self._jobs.keys())
+            self._open()
+            return [job.id for job in self._scheduler.get_jobs()]
     
     def __enter__(self):
         """支持上下文管理协议"""
@@ -248,12 +346,15 @@ class TaskScheduler:
         :return: 包含调度器状态的字典
         """
         with self._lock:
+            jobs = self._scheduler.get_jobs()
             return {
                 'running': self._scheduler.running,
-                'job_count': len(self._jobs),
+                'paused': self._scheduler.state == STATE_PAUSED,
+                'persistent': bool(self._store),
+                'job_count': len(jobs),
                 'next_run_times': [
-                    (job_id, job.next_run_time.isoformat() if job.next_run_time else None)
-                    for job_id, job in self._jobs.items()
+                    (job.id, job.next_run_time.isoformat() if getattr(job, 'next_run_time', None) else None)
+                    for job in jobs
                 ]
             }
 
@@ -265,10 +366,10 @@ class TaskScheduler:
         :return: 包含任务详情的字典
         """
         with self._lock:
-            if job_id not in self._jobs:
+            job = self._scheduler.get_job(job_id)
+            if job is None:
                 raise ValueError(f"Job {job_id} not found")
-            
-            job = self._jobs[job_id]
+
             return {
                 'id': job.id,
                 'name': job.name,
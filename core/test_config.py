@@ -0,0 +1,94 @@
+import os
+import shutil
+import tempfile
+import unittest
+from core.config import Config
+
+CONFIG = """
+debug: false
+interval: ${TEST_CFG_INTERVAL:-60}
+rss:
+  title: ${TEST_CFG_TITLE:-WeRSS}
+  add_cover: 'True'
+  page_size: "0"
+gather:
+  content_rate: 1.5
+  workers: ${TEST_CFG_WORKERS:-}
+  flag: 'yes'
+  adaptive:
+    tick: 5
+tags:
+  - a
+  - b
+"""
+
+class TestConfig(unittest.TestCase):
+    """Test cases for the Config snapshot and typed accessors."""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "config.yaml")
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(CONFIG)
+        os.environ["TEST_CFG_TITLE"] = "From Env"
+        self.cfg = Config(config_path=self.path)
+
+    def tearDown(self):
+        os.environ.pop("TEST_CFG_TITLE", None)
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def test_snapshot_flattens_nested_keys(self):
+        """Nested keys are available as dotted paths, parents return the whole section."""
+        self.assertEqual(self.cfg.get("gather.adaptive.tick"), 5)
+        self.assertEqual(self.cfg.get("gather.adaptive"), {"tick": 5})
+        self.assertEqual(self.cfg.get("tags"), ["a", "b"])
+
+    def test_env_vars_are_resolved(self):
+        """${VAR:-default} uses the environment first and the default otherwise."""
+        self.assertEqual(self.cfg.get("rss.title"), "From Env")
+        self.assertEqual(self.cfg.get("interval"), 60)
+
+    def test_missing_key_returns_default(self):
+        """Missing keys fall back to the default, typed accessors also for empty values."""
+        self.assertEqual(self.cfg.get("no.such.key", "x"), "x")
+        self.assertEqual(self.cfg.get_int("gather.workers", 4), 4)
+
+    def test_returned_sections_are_copies(self):
+        """Changing a returned dict or list does not change the snapshot."""
+        self.cfg.get("gather.adaptive")["tick"] = 99
+        self.cfg.get("tags").append("c")
+        self.assertEqual(self.cfg.get("gather.adaptive.tick"), 5)
+        self.assertEqual(self.cfg.get("tags"), ["a", "b"])
+
+    def test_get_bool(self):
+        """Strings like 'True', 'yes' and '1' are true, everything else by truthiness."""
+        self.assertIs(self.cfg.get_bool("rss.add_cover"), True)
+        self.assertIs(self.cfg.get_bool("gather.flag"), True)
+        self.assertIs(self.cfg.get_bool("debug", True), False)
+        self.assertIs(self.cfg.get_bool("no.such.key", True), True)
+        self.assertIs(self.cfg.get_bool("rss.title"), False)
+
+    def test_get_int_and_float(self):
+        """Numeric strings and floats are coerced, invalid values use the default."""
+        self.assertEqual(self.cfg.get_int("rss.page_size", 10), 0)
+        self.assertEqual(self.cfg.get_int("gather.content_rate"), 1)
+        self.assertEqual(self.cfg.get_float("gather.content_rate"), 1.5)
+        self.assertEqual(self.cfg.get_float("interval"), 60.0)
+        self.assertEqual(self.cfg.get_int("rss.title", 7), 7)
+        self.assertEqual(self.cfg.get_float("rss.title", 0.5), 0.5)
+
+    def test_get_str(self):
+        """Values are returned as strings, missing keys use the default."""
+        self.assertEqual(self.cfg.get_str("interval"), "60")
+        self.assertEqual(self.cfg.get_str("no.such.key", "d"), "d")
+
+    def test_reload_rebuilds_snapshot(self):
+        """The snapshot is rebuilt when the file is reloaded."""
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(CONFIG.replace("tick: 5", "tick: 15"))
+        self.assertEqual(self.cfg.get_int("gather.adaptive.tick"), 5)
+        self.cfg.reload()
+        self.assertEqual(self.cfg.get_int("gather.adaptive.tick"), 15)
+
+if __name__ == '__main__':
+    unittest.main()
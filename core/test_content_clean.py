@@ -0,0 +1,67 @@
+import unittest
+from core.content_clean import HtmlCleaner, clean_html
+
+class TestHtmlCleaner(unittest.TestCase):
+    """Test cases for HtmlCleaner rules and output."""
+
+    def test_remove_tags_and_comments(self):
+        """Scripts, styles and comments are removed, surrounding text is kept."""
+        html = "<p>a<script>alert(1)</script>b<!-- note -->c</p><style>p{}</style>"
+        self.assertEqual(clean_html(html), "<p>abc</p>")
+
+    def test_remove_hidden_elements(self):
+        """Elements hidden with display:none or aria-hidden are removed."""
+        html = ('<p>keep</p><p style="display: none">x</p><p style="color:red;display:none">y</p>'
+                '<span aria-hidden="true">z</span>')
+        self.assertEqual(clean_html(html), "<p>keep</p>")
+
+    def test_remove_ad_blocks_by_class_or_id(self):
+        """Ad divs are matched by whole class/id tokens only."""
+        html = '<div class="top-ad">x</div><div id="banner">y</div><div class="header">keep</div>'
+        self.assertEqual(clean_html(html), '<div class="header">keep</div>')
+
+    def test_rewrite_lazy_image(self):
+        """data-src is moved to src and fixed pixel widths are widened."""
+        html = '<p><img data-src="https://mmbiz.qpic.cn/a.png" style="width: 300px;"></p>'
+        self.assertEqual(clean_html(html),
+                         '<p><img style="width: 1080px;" src="https://mmbiz.qpic.cn/a.png"></p>')
+
+    def test_drop_empty_nodes(self):
+        """Empty containers are dropped bottom up, media elements are kept."""
+        html = "<div><p> </p><span><b></b></span></div><p><br></p><p>text</p>"
+        self.assertEqual(clean_html(html), "<p><br></p><p>text</p>")
+
+    def test_keep_empty_table_cells(self):
+        """Empty table cells are kept so later columns do not shift."""
+        html = "<table><tr><td>a</td><td></td><td>c</td></tr><tr><th></th></tr></table>"
+        self.assertEqual(clean_html(html), html)
+
+    def test_escape_leading_text(self):
+        """Text before the first element is escaped again when serialized."""
+        html = "1 &lt;script&gt;alert(1)&lt;/script&gt; &amp; <p>x</p>"
+        self.assertEqual(clean_html(html), html)
+
+    def test_root_id(self):
+        """With root_id only the content root is returned, without its style."""
+        page = ('<html><head><title>t</title></head><body><div id="other">x</div>'
+                '<div id="js_content" style="visibility: hidden;"><p>body</p></div></body></html>')
+        self.assertEqual(clean_html(page, root_id="js_content"), '<div id="js_content"><p>body</p></div>')
+        self.assertEqual(clean_html(page, root_id="missing"), "")
+
+    def test_empty_input(self):
+        """Blank input gives an empty string."""
+        self.assertEqual(clean_html(""), "")
+        self.assertEqual(clean_html("   "), "")
+
+    def test_custom_rules(self):
+        """Only the given rules are applied."""
+        cleaner = HtmlCleaner([{"action": "remove", "tags": ["em"]}])
+        self.assertEqual(cleaner.clean("<p>a<em>b</em><!-- c --></p>"), "<p>a<!-- c --></p>")
+
+    def test_unknown_rule(self):
+        """Unknown actions are rejected when the rules are compiled."""
+        with self.assertRaises(ValueError):
+            HtmlCleaner([{"action": "nope"}])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,11 +5,12 @@ from core.models import Feed
 from driver.wx import DoSuccess
 from core.db import DB
 from core.models.feed import Feed
-from .cfg import cfg,wx_cfg
-from core.print import print_error,print_info
+from .cfg import cfg,wx_cfg,Credentials,Accounts
+from core.print import print_error,print_info,print_warning
 from core.rss import RSS
 from driver.success import setStatus
 from driver.wxarticle import Web
+from core.content_clean import clean_html
 import random
 # 定义一些常见的 User-Agent
 USER_AGENTS = [
@@ -34,6 +35,9 @@ USER_AGENTS = [
     # iOS 移动端 Safari
     "Mozilla/5.0 (iPhone; CPU iPhone OS 16_5 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.5 Mobile/15E148 Safari/604.1"
 ]
+# 公众号平台接口 base_resp.ret 中表示登录失效和频率限制的错误码，其余错误不暂停账号
+SESSION_EXPIRED_CODES = {200003, 200040}
+FREQ_CONTROL_CODES = {200013}
 # 定义基类
 class WxGather:
     articles=[]
@@ -72,12 +76,19 @@ class WxGather:
         session.timeout = timeout
         self.session=session
         self.get_token()
-    def get_token(self):
-        cfg.reload()
-        wx_cfg.reload()
+    def get_token(self,acquire:bool=False):
+        # 凭据来自内存，由 set_token 和文件监视线程保持最新
+        # 有多个账号时从账号池中选择剩余额度最多的健康账号，acquire为True时计入该账号的采集额度
         self.Gather_Content=cfg.get('gather.content',False)
-        self.cookies = wx_cfg.get('cookie', '')
-        self.token=wx_cfg.get('token','')
+        account=Accounts.acquire() if acquire else Accounts.peek()
+        self.account=account.name if account is not None else None
+        if account is not None:
+            self.cookies = account.cookie
+            self.token = account.token
+        else:
+            # 账号池已包含 wx.lic 中的登录凭据，没有健康账号时不回退到已暂停账号的凭据
+            self.cookies = ""
+            self.token = ""
         # 随机选择一个 User-Agent
         self.user_agent = cfg.get('user_agent', '')
         user_agent = random.choice(USER_AGENTS)
@@ -86,6 +97,17 @@ class WxGather:
             "Cookie":self.cookies,
             "User-Agent": user_agent
         }
+    def error_code(self,ret)->str:
+        """把接口返回的 ret 转为 Error 的 code：登录失效暂停账号，频率限制退避，其余错误只结束本次采集"""
+        if ret in SESSION_EXPIRED_CODES:
+            return "Invalid Session"
+        if ret in FREQ_CONTROL_CODES:
+            return "Frequency Control"
+        return None
+    def mp_url(self,path:str)->str:
+        """公众号平台接口地址，gather.mp_host 可指向本地模拟服务用于测试"""
+        host=cfg.get("gather.mp_host","https://mp.weixin.qq.com") or "https://mp.weixin.qq.com"
+        return str(host).rstrip("/")+path
     def fix_header(self,url):
          user_agent = random.choice(USER_AGENTS)
           # 更新请求头
@@ -108,10 +130,11 @@ class WxGather:
             r = session.get(url, headers=headers)
             if r.status_code == 200:
                 text = r.text
-                text=self.remove_common_html_elements(text)
                 if "当前环境异常，完成验证后即可继续访问" in text:
                     print_error("当前环境异常，完成验证后即可继续访问")
-                    text=""
+                    return ""
+                # 一次解析，取出#js_content并完成清理
+                text=clean_html(text,root_id="js_content")
         except:
             pass
         return text
@@ -142,7 +165,7 @@ class WxGather:
     def search_Biz(self,kw:str="",limit=10,offset=0):
 
         self.get_token()
-        url = "https://mp.weixin.qq.com/cgi-bin/searchbiz"
+        url = self.mp_url("/cgi-bin/searchbiz")
         params = {
             "action": "search_biz",
             "begin":offset,
@@ -168,10 +191,10 @@ class WxGather:
             data = response.text  # 解析JSON数据
             msg = json.loads(data)  # 手动解析
             if msg['base_resp']['ret'] == 200013:
-                self.Error("frequencey control, stop at {}".format(str(kw)))
+                self.Error("frequencey control, stop at {}".format(str(kw)),code="Frequency Control")
                 return
             if msg['base_resp']['ret'] != 0:
-                self.Error("错误原因:{}:代码:{}".format(msg['base_resp']['err_msg'],msg['base_resp']['ret']),code="Invalid Session")
+                self.Error("错误原因:{}:代码:{}".format(msg['base_resp']['err_msg'],msg['base_resp']['ret']),code=self.error_code(msg['base_resp']['ret']))
                 return 
             if 'publish_page' in msg:
                 msg['publish_page']=json.loads(msg['publish_page'])
@@ -184,15 +207,22 @@ class WxGather:
     
     def Start(self,mp_id=None):
         self.articles=[]
-        self.get_token()
+        self.quarantined=False
+        self.get_token(acquire=True)
         if self.token=="" or self.token is None:
-             self.Error("请先扫码登录公众号平台")
-             return
+             if Accounts.get_status():
+                 # 所有账号都已暂停，跳过本次采集，由调用方稍后重试
+                 self.quarantined=True
+                 self.Error("没有可用的公众号平台账号，跳过本次采集")
+             else:
+                 self.Error("请先扫码登录公众号平台")
+             return False
         import time
         self.update_mps(mp_id,Feed(
           sync_time=int(time.time()),
           update_time=int(time.time()),
         ))
+        return True
 
     def Item_Over(self,item=None,CallBack=None):
         print(f"item end")
@@ -206,12 +236,27 @@ class WxGather:
         pass
     def Error(self,error:str,code=None):
         self.Over()
+        account=getattr(self,'account',None)
+        if code in ("Invalid Session","Frequency Control"):
+            self.quarantined=True
+        if code=="Frequency Control":
+            from core.queue.metrics import Metrics
+            Metrics.stall()
+        if account and code in ("Invalid Session","Frequency Control"):
+            # 暂停当前账号，其余健康账号继续采集
+            Accounts.report(account,"session" if code=="Invalid Session" else "freq")
+            print_warning(f"账号[{account}]{'登录失效' if code=='Invalid Session' else '触发频率限制'}，已暂停使用")
         if code=="Invalid Session":
             from jobs.failauth import send_wx_code
             import threading
+            if Accounts.healthy_count()>0:
+                # 还有可用账号时不清空队列，只提醒重新登录失效的账号
+                threading.Thread(target=send_wx_code,args=(f"公众号平台账号[{account}]登录失效,请重新登录",)).start()
+                raise Exception(error)
             setStatus(False)
             from core.queue import TaskQueue
-            TaskQueue.clear_queue()
+            # 暂停而不是清空，重新登录后继续执行积压的任务
+            TaskQueue.pause("公众号平台登录失效")
             threading.Thread(target=send_wx_code,args=(f"公众号平台登录失效,请重新登录",)).start()
             # send_wx_code(f"公众号平台登录失效,请重新登录")
             raise Exception(error)
@@ -282,32 +327,8 @@ class WxGather:
         """
         if not html_content:
             return html_content
-        
-        # 常见的需要移除的HTML元素模式
-        common_patterns = [
-            # 移除script标签及其内容
-            r'<script[^>]*>.*?</script>',
-            # 移除style标签及其内容
-            r'<style[^>]*>.*?</style>',
-            # 移除注释
-            r'<!--.*?-->',
-            # 移除iframe标签
-            r'<iframe[^>]*>.*?</iframe>',
-            # 移除noscript标签
-            r'<noscript[^>]*>.*?</noscript>',
-            # 移除广告相关的div（包含特定class或id）
-            r'<div[^>]*(?:class|id)=["\'][^"\']*(?:ad|advertisement|banner)[^"\']*["\'][^>]*>.*?</div>',
-            # 移除header区域
-            r'<header[^>]*>.*?</header>',
-            # 移除footer区域
-            r'<footer[^>]*>.*?</footer>',
-            # 移除nav区域
-            r'<nav[^>]*>.*?</nav>',
-            # 移除aside区域
-            r'<aside[^>]*>.*?</aside>'
-        ]
-        html_content=Web.clean_article_content(html_content)
-        return self.remove_html_region(html_content, common_patterns)
+        # 移除规则见 core.content_clean.CLEAN_RULES
+        return clean_html(html_content)
 
     # 更新公众号更新状态
     def update_mps(self,mp_id:str, mp:Feed):
@@ -1,3 +1,3 @@
-from driver.token import wx_cfg,cfg
+from driver.token import wx_cfg,cfg,Credentials,Accounts
 import urllib3
 urllib3.disable_warnings()
\ No newline at end of file
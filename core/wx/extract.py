@@ -0,0 +1,130 @@
+import time
+import random
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from core.print import print_warning,print_error
+from driver.wxarticle import Web,VERIFY_MARK,DELETED_MARKS,check_deleted
+from core.content_clean import cleaner
+from .base import USER_AGENTS
+
+class TieredExtractor:
+    """分层文章内容提取器
+
+    先用连接池复用的HTTP客户端直接抓取文章页，用lxml提取服务端渲染的#js_content；
+    只有页面出现验证墙或缺少正文时，才回退到浏览器(Playwright)抓取。
+    每一层的成功次数和耗时都会被统计，用于观察节省了多少浏览器工作量。
+    """
+    TIERS = ("http", "web")
+
+    def __init__(self, timeout=(5, 15), pool_size: int = 8):
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size, max_retries=1)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._stats = {
+                tier: {"attempts": 0, "success": 0, "fallback": {}, "latency": 0.0}
+                for tier in self.TIERS
+            }
+
+    def _record(self, tier: str, start: float, ok: bool, reason: str = "") -> None:
+        with self._lock:
+            stat = self._stats[tier]
+            stat["attempts"] += 1
+            stat["latency"] += time.time() - start
+            if ok:
+                stat["success"] += 1
+            elif reason:
+                stat["fallback"][reason] = stat["fallback"].get(reason, 0) + 1
+
+    def get_stats(self) -> dict:
+        """获取各层的调用次数、成功次数、回退原因和平均耗时(毫秒)"""
+        with self._lock:
+            stats = {}
+            for tier, stat in self._stats.items():
+                attempts = stat["attempts"]
+                stats[tier] = {
+                    "attempts": attempts,
+                    "success": stat["success"],
+                    "fallback": dict(stat["fallback"]),
+                    "avg_ms": round(stat["latency"] * 1000 / attempts, 2) if attempts else 0,
+                }
+            total = stats["http"]["attempts"]
+            # HTTP层直接成功的比例，即避免启动浏览器的比例
+            stats["browser_avoided"] = round(stats["http"]["success"] / total, 4) if total else 0
+            return stats
+
+    def extract(self, url: str) -> str:
+        """提取文章正文HTML
+
+        Returns:
+            正文HTML；文章已删除/不可见时返回 "DELETED"；失败返回空字符串
+        """
+        content = self.extract_http(url)
+        if content is None:
+            content = self.extract_web(url)
+        return content
+
+    def extract_http(self, url: str):
+        """HTTP层，需要回退到浏览器时返回None"""
+        start = time.time()
+        try:
+            headers = {
+                "User-Agent": random.choice(USER_AGENTS),
+                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+                "Accept-Language": "zh-CN,zh;q=0.9,en-US;q=0.8,en;q=0.7",
+            }
+            r = self.session.get(url, headers=headers, timeout=self.timeout)
+            if r.status_code != 200:
+                self._record("http", start, False, f"status_{r.status_code}")
+                return None
+            text = r.text
+            if VERIFY_MARK in text:
+                self._record("http", start, False, "verify")
+                return None
+            from lxml import html as lxml_html
+            tree = lxml_html.fromstring(text)
+            js_content = tree.get_element_by_id("js_content", None)
+            if js_content is None:
+                if check_deleted(tree.text_content()):
+                    self._record("http", start, True)
+                    return "DELETED"
+                self._record("http", start, False, "missing")
+                return None
+            if len(js_content) == 0 and not (js_content.text or "").strip():
+                # 图集等正文由脚本渲染的页面
+                self._record("http", start, False, "empty")
+                return None
+            cleaner.clean_element(js_content)
+            content = cleaner.to_html(js_content)
+            self._record("http", start, True)
+            return content
+        except Exception as e:
+            print_warning(f"HTTP提取文章内容失败，回退到浏览器: {e}")
+            self._record("http", start, False, "error")
+            return None
+
+    def extract_web(self, url: str) -> str:
+        """浏览器层"""
+        start = time.time()
+        try:
+            content = Web.get_article_content(url).get("content") or ""
+            if content and content != "DELETED":
+                content = cleaner.clean(content)
+            self._record("web", start, content != "", "empty")
+            return content
+        except Exception as e:
+            if str(e) in {reason for _, reason in DELETED_MARKS}:
+                self._record("web", start, True)
+                return "DELETED"
+            print_error(f"浏览器提取文章内容失败: {e}")
+            self._record("web", start, False, "error")
+            return ""
+
+Extractor = TieredExtractor()
@@ -4,7 +4,6 @@ import time
 import random
 import yaml
 import re
-from bs4 import BeautifulSoup
 from core.wx.base import WxGather
 from core.print import print_error
 from core.log import logger
@@ -18,43 +17,24 @@ class MpsWeb(WxGather):
             r = App.get_article_content(url)
             if r!=None:
                 text = r.get("content","")
-                text=self.remove_common_html_elements(text)
                 if text is None:
                     return
                 if "当前环境异常，完成验证后即可继续访问" in text:
                     print_error("当前环境异常，完成验证后即可继续访问")
                     return ""
-                soup = BeautifulSoup(text, 'html.parser')
-                # 找到内容
-                js_content_div = soup
-                # 移除style属性中的visibility: hidden;
-                if js_content_div is None:
-                    return ""
-                js_content_div.attrs.pop('style', None)
-                # 找到所有的img标签
-                img_tags = js_content_div.find_all('img')
-                # 遍历每个img标签并修改属性，设置宽度为1080p
-                for img_tag in img_tags:
-                    if 'data-src' in img_tag.attrs:
-                        img_tag['src'] = img_tag['data-src']
-                        del img_tag['data-src']
-                    if 'style' in img_tag.attrs:
-                        style = img_tag['style']
-                        # 使用正则表达式替换width属性
-                        style = re.sub(r'width\s*:\s*\d+\s*px', 'width: 1080px', style)
-                        img_tag['style'] = style
-                return  js_content_div.prettify()
+                return self.remove_common_html_elements(text)
         except Exception as e:
                 logger.error(e)
         return ""
     # 重写 get_Articles 方法
     def get_Articles(self, faker_id:str=None,Mps_id:str=None,Mps_title="",CallBack=None,start_page:int=0,MaxPage:int=1,interval=10,Gather_Content=False,Item_Over_CallBack=None,Over_CallBack=None):
-        super().Start(mp_id=Mps_id)
+        if not super().Start(mp_id=Mps_id):
+            return
         if self.Gather_Content:
             Gather_Content=True
         print(f"Web浏览器模式,是否采集[{Mps_title}]内容：{Gather_Content}\n")
         # 请求参数
-        url = "https://mp.weixin.qq.com/cgi-bin/appmsgpublish"
+        url = self.mp_url("/cgi-bin/appmsgpublish")
         count=5
         params = {
         "sub": "list",
@@ -87,21 +67,21 @@ class MpsWeb(WxGather):
                 self._cookies =resp.cookies
                 # 流量控制了, 退出
                 if msg['base_resp']['ret'] == 200013:
-                    super().Error("frequencey control, stop at {}".format(str(begin)))
+                    self.Error("frequencey control, stop at {}".format(str(begin)),code="Frequency Control")
                     break
                 
                 if msg['base_resp']['ret'] == 200003:
-                    super().Error("Invalid Session, stop at {}".format(str(begin)),code="Invalid Session")
+                    self.Error("Invalid Session, stop at {}".format(str(begin)),code="Invalid Session")
                     break
                 if msg['base_resp']['ret'] != 0:
-                    super().Error("错误原因:{}:代码:{}".format(msg['base_resp']['err_msg'],msg['base_resp']['ret']),code="Invalid Session")
+                    self.Error("错误原因:{}:代码:{}".format(msg['base_resp']['err_msg'],msg['base_resp']['ret']),code=self.error_code(msg['base_resp']['ret']))
                     break    
                 # 如果返回的内容中为空则结束
                 if 'publish_page' not in msg:
-                    super().Error("all ariticle parsed")
+                    self.Error("all ariticle parsed")
                     break
                 if msg['base_resp']['ret'] != 0:
-                    super().Error("错误原因:{}:代码:{}".format(msg['base_resp']['err_msg'],msg['base_resp']['ret']))
+                    self.Error("错误原因:{}:代码:{}".format(msg['base_resp']['err_msg'],msg['base_resp']['ret']))
                     break  
                 if "publish_page" in msg:
                     msg["publish_page"]=json.loads(msg['publish_page'])
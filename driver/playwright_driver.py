@@ -18,6 +18,61 @@ from playwright.sync_api import sync_playwright
 from playwright.async_api import async_playwright
 import threading
 
+# 隐藏自动化特征的初始化脚本，同步与异步控制器共用
+ANTI_CRAWLER_SCRIPT = """
+        // 隐藏webdriver属性
+        Object.defineProperty(navigator, 'webdriver', {
+            get: () => false,
+        });
+        
+        // 隐藏chrome属性
+        Object.defineProperty(window, 'chrome', {
+            get: () => false,
+        });
+        
+        // 修改plugins长度
+        Object.defineProperty(navigator, 'plugins', {
+            get: () => [1, 2, 3, 4, 5],
+        });
+        
+        // 修改languages
+        Object.defineProperty(navigator, 'languages', {
+            get: () => ['zh-CN', 'zh', 'en'],
+        });
+        
+        // 隐藏自动化痕迹
+        Object.defineProperty(navigator, 'webdriver', {
+            get: () => false,
+        });
+        
+        // 修改permissions
+        const originalQuery = window.navigator.permissions.query;
+        window.navigator.permissions.query = (parameters) => (
+            parameters.name === 'notifications' ?
+                Promise.resolve({ state: Notification.permission }) :
+                originalQuery(parameters)
+        );
+"""
+
+# 抓取正文时不需要下载的资源类型
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font", "stylesheet"}
+# 统计、上报类请求的URL特征
+BLOCKED_URL_KEYWORDS = ("jsmonitor", "badjs", "/mp/report", "webcompt", "beacon", "analytics", "pingfore")
+# 正文就绪：#js_content 之后已解析出兄弟节点(说明正文已闭合)，或整个文档已解析完成
+CONTENT_READY_SCRIPT = """() => {
+    const el = document.querySelector("#js_content") || document.querySelector("#js_article");
+    return (el !== null && el.nextElementSibling !== null) || document.readyState !== "loading";
+}"""
+
+def is_blocked_request(request) -> bool:
+    """抓取模式下是否拦截该请求"""
+    if request.resource_type in BLOCKED_RESOURCE_TYPES:
+        return True
+    if request.resource_type == "document":
+        return False
+    url = request.url
+    return any(keyword in url for keyword in BLOCKED_URL_KEYWORDS)
+
 class PlaywrightController:
     def __init__(self):
         self.system = platform.system().lower()
@@ -26,6 +81,7 @@ class PlaywrightController:
         self.context = None
         self.page = None
         self.isClose = True
+        self.scraping = False
         self._lock = threading.Lock()  # 添加线程锁
     def _is_browser_installed(self, browser_name):
         """检查指定浏览器是否已安装"""
@@ -48,7 +104,7 @@ class PlaywrightController:
         except RuntimeError:
             # 如果没有正在运行的事件循环，则说明不是异步环境
             return False
-    def start_browser(self, headless=True, mobile_mode=False, dis_image=False, browser_name=browsers_name, language="zh-CN", anti_crawler=True):
+    def start_browser(self, headless=True, mobile_mode=False, dis_image=False, browser_name=browsers_name, language="zh-CN", anti_crawler=True, scraping=False):
         try:
             # 使用线程锁确保线程安全
             with self._lock:
@@ -86,6 +142,9 @@ class PlaywrightController:
 
                 if dis_image:
                     self.context.route("**/*.{png,jpg,jpeg}", lambda route: route.abort())
+                self.scraping = scraping
+                if scraping:
+                    self.apply_scraping_profile()
 
                 # 应用反爬虫脚本
                 if anti_crawler:
@@ -205,40 +264,7 @@ class PlaywrightController:
             stealth.apply_stealth_sync(self.page)
         """应用反爬虫脚本"""
         # 隐藏自动化特征
-        self.page.add_init_script("""
-        // 隐藏webdriver属性
-        Object.defineProperty(navigator, 'webdriver', {
-            get: () => false,
-        });
-        
-        // 隐藏chrome属性
-        Object.defineProperty(window, 'chrome', {
-            get: () => false,
-        });
-        
-        // 修改plugins长度
-        Object.defineProperty(navigator, 'plugins', {
-            get: () => [1, 2, 3, 4, 5],
-        });
-        
-        // 修改languages
-        Object.defineProperty(navigator, 'languages', {
-            get: () => ['zh-CN', 'zh', 'en'],
-        });
-        
-        // 隐藏自动化痕迹
-        Object.defineProperty(navigator, 'webdriver', {
-            get: () => false,
-        });
-        
-        // 修改permissions
-        const originalQuery = window.navigator.permissions.query;
-        window.navigator.permissions.query = (parameters) => (
-            parameters.name === 'notifications' ?
-                Promise.resolve({ state: Notification.permission }) :
-                originalQuery(parameters)
-        );
-        """)
+        self.page.add_init_script(ANTI_CRAWLER_SCRIPT)
         
         # 设置更真实的浏览器行为
         self.page.evaluate("""
@@ -277,12 +303,27 @@ class PlaywrightController:
             # 如果发生任何异常，直接跳过清理
             pass
 
+    def apply_scraping_profile(self):
+        """抓取配置：只保留文档和脚本，拦截图片、媒体、字体、样式和统计上报请求"""
+        def handle(route):
+            if is_blocked_request(route.request):
+                return route.abort()
+            return route.continue_()
+        self.context.route("**/*", handle)
+
     def open_url(self, url,wait_until="domcontentloaded"):
         try:
             self.page.goto(url,wait_until=wait_until)
         except Exception as e:
             raise Exception(f"打开URL失败: {str(e)}")
 
+    def wait_for_content(self, timeout=10000):
+        """等待文章正文就绪，而不是等待整个页面加载完成"""
+        try:
+            self.page.wait_for_function(CONTENT_READY_SCRIPT, timeout=timeout)
+        except Exception as e:
+            print(f"等待正文超时: {str(e)}")
+
     def Close(self):
         self.cleanup()
 
@@ -310,6 +351,106 @@ class PlaywrightController:
             print(f"字典转JSON失败: {e}")
             return ""
 
+class AsyncPlaywrightController(PlaywrightController):
+    """异步浏览器控制器
+
+    基于playwright.async_api，在同一个浏览器上下文中并发打开多个页面，
+    供批量抓取文章内容的异步流水线使用
+    """
+    def __init__(self):
+        super().__init__()
+        self._lock = asyncio.Lock()
+
+    async def start_browser(self, headless=True, mobile_mode=False, dis_image=False, browser_name=browsers_name, language="zh-CN", anti_crawler=True, scraping=False):
+        try:
+            async with self._lock:
+                if  bool(os.getenv("NOT_HEADLESS",False)):
+                    headless = False
+                if self.driver is None:
+                    self.driver = await async_playwright().start()
+
+                if browser_name.lower() == "firefox":
+                    browser_type = self.driver.firefox
+                elif browser_name.lower() == "webkit":
+                    browser_type = self.driver.webkit
+                else:
+                    browser_type = self.driver.chromium
+                self.browser = await browser_type.launch(headless=headless)
+
+                context_options = {
+                    "locale": language
+                }
+                if anti_crawler:
+                    context_options.update(self._get_anti_crawler_config(mobile_mode))
+                self.context = await self.browser.new_context(**context_options)
+
+                if dis_image:
+                    await self.context.route("**/*.{png,jpg,jpeg}", lambda route: route.abort())
+                self.scraping = scraping
+                if scraping:
+                    await self.apply_scraping_profile()
+                if anti_crawler:
+                    # 注入到上下文，之后新开的每个页面都会生效
+                    await self.context.add_init_script(ANTI_CRAWLER_SCRIPT)
+
+                self.isClose = False
+                return self.context
+        except Exception as e:
+            await self.cleanup()
+            raise Exception(f"浏览器启动失败: {str(e)}")
+
+    async def new_page(self):
+        """在当前上下文中新开一个页面"""
+        if self.context is None:
+            raise Exception("浏览器未启动，请先调用 start_browser()")
+        return await self.context.new_page()
+
+    async def apply_scraping_profile(self):
+        """抓取配置：只保留文档和脚本，拦截图片、媒体、字体、样式和统计上报请求"""
+        async def handle(route):
+            if is_blocked_request(route.request):
+                await route.abort()
+            else:
+                await route.continue_()
+        await self.context.route("**/*", handle)
+
+    async def open_url(self, page, url, wait_until="domcontentloaded"):
+        try:
+            await page.goto(url, wait_until=wait_until)
+        except Exception as e:
+            raise Exception(f"打开URL失败: {str(e)}")
+
+    async def wait_for_content(self, page, timeout=10000):
+        """等待文章正文就绪，而不是等待整个页面加载完成"""
+        try:
+            await page.wait_for_function(CONTENT_READY_SCRIPT, timeout=timeout)
+        except Exception as e:
+            print(f"等待正文超时: {str(e)}")
+
+    async def Close(self):
+        await self.cleanup()
+
+    async def cleanup(self):
+        """清理所有资源"""
+        try:
+            async with self._lock:
+                if self.context:
+                    await self.context.close()
+                if self.browser:
+                    await self.browser.close()
+                if self.driver:
+                    await self.driver.stop()
+                self.context = None
+                self.browser = None
+                self.driver = None
+                self.isClose = True
+        except Exception as e:
+            print(f"资源清理失败: {str(e)}")
+
+    def __del__(self):
+        # 异步资源只能在事件循环中释放，由调用方显式 await Close()
+        pass
+
 ControlDriver=PlaywrightController()
 # 示例用法
 if __name__ == "__main__":
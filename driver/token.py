@@ -9,6 +9,229 @@ if not os.path.exists(lic_path):
         f.write("{}")
 wx_cfg = Config(lic_path)
 
+import time
+import threading
+# 检查授权文件和配置文件是否被外部修改的间隔 单位秒
+WATCH_INTERVAL = 3
+
+class CredentialStore:
+    """进程内的Token/Cookie存储
+
+    采集时直接读取内存中的凭据，不再每次重新读取和解析 wx.lic/config.yaml；
+    登录成功时由 set_token 更新，外部修改文件时由后台线程按修改时间(mtime)重新加载
+    """
+
+    def __init__(self, lic: Config, config: Config):
+        self._lock = threading.Lock()
+        self._files = {lic.config_path: lic, config.config_path: config}
+        self._mtimes = {}
+        self._thread = None
+        self.version = 0
+        self._data = {}
+        self.load()
+
+    def _mtime(self, path: str) -> float:
+        try:
+            return os.path.getmtime(path)
+        except OSError:
+            return 0
+
+    def _read(self) -> dict:
+        return {
+            "token": str(wx_cfg.get("token", "") or ""),
+            "cookie": str(wx_cfg.get("cookie", "") or ""),
+            "expiry": wx_cfg.get("expiry", {}) or {},
+            "ext_data": wx_cfg.get("ext_data", None),
+            "accounts": list(wx_cfg.get("accounts", []) or []),
+        }
+
+    def load(self) -> None:
+        """从文件加载凭据"""
+        with self._lock:
+            self._data = self._read()
+            self._mtimes = {path: self._mtime(path) for path in self._files}
+            self.version += 1
+
+    def update(self, token: str, cookie: str, expiry: dict = None, ext_data: any = None, accounts: list = None) -> None:
+        """更新内存中的凭据(写文件由调用方完成)"""
+        with self._lock:
+            self._data = {
+                "token": token or "",
+                "cookie": cookie or "",
+                "expiry": expiry or {},
+                "ext_data": ext_data if ext_data is not None else self._data.get("ext_data"),
+                "accounts": accounts if accounts is not None else self._data.get("accounts", []),
+            }
+            # 自己写入的文件不需要再重新加载
+            self._mtimes = {path: self._mtime(path) for path in self._files}
+            self.version += 1
+
+    def get(self, key: str, default: any = "") -> any:
+        with self._lock:
+            value = self._data.get(key)
+            return default if value in (None, "") else value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._data)
+
+    def check(self) -> bool:
+        """文件被外部修改时重新加载，返回是否重新加载"""
+        changed = [path for path, conf in self._files.items() if self._mtime(path) != self._mtimes.get(path)]
+        if not changed:
+            return False
+        for path in changed:
+            self._files[path].reload()
+        self.load()
+        return True
+
+    def watch(self, interval: int = WATCH_INTERVAL) -> None:
+        """启动后台线程监视文件修改"""
+        if self._thread is not None:
+            return
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.check()
+                except Exception as e:
+                    print(f"重新加载授权信息失败: {e}")
+        self._thread = threading.Thread(target=run, daemon=True, name="credential-watch")
+        self._thread.start()
+
+Credentials = CredentialStore(wx_cfg, cfg)
+Credentials.watch()
+
+def account_name(ext_data: any) -> str:
+    """登录账号的名称，作为账号池中的唯一标识"""
+    if isinstance(ext_data, dict) and ext_data.get("wx_app_name"):
+        return str(ext_data["wx_app_name"])
+    return "default"
+
+class Account:
+    __slots__ = ("name", "token", "cookie", "expiry", "uses", "quarantined_until", "reason")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.token = ""
+        self.cookie = ""
+        self.expiry = {}
+        # 最近一个统计周期内的采集时间
+        self.uses = []
+        self.quarantined_until = 0.0
+        self.reason = ""
+
+    def expired(self, now: float) -> bool:
+        timestamp = (self.expiry or {}).get("expiry_timestamp")
+        return bool(timestamp) and float(timestamp) <= now
+
+class AccountPool:
+    """多个公众号平台账号组成的凭据池
+
+    账号保存在 wx.lic 的 accounts 列表中，扫码登录时按账号名称新增或更新；
+    采集时选择剩余额度最多的健康账号，账号触发频率限制时暂停一段时间，登录失效时暂停到重新登录为止。
+    """
+    # 统计额度的周期 单位秒
+    WINDOW = 3600
+
+    def __init__(self, store: CredentialStore):
+        self._store = store
+        self._lock = threading.Lock()
+        self._accounts = {}
+        self._version = -1
+
+    @property
+    def budget(self) -> int:
+        """每个账号每小时的采集次数，超出后仍可使用，但优先使用其他账号"""
+        return max(1, cfg.get_int("gather.account_budget", 60))
+
+    def _sync(self) -> None:
+        """凭据文件变化后重建账号列表，保留运行中的额度和暂停状态"""
+        if self._version == self._store.version:
+            return
+        data = self._store.snapshot()
+        entries = [e for e in data.get("accounts", []) if isinstance(e, dict) and e.get("token")]
+        if data.get("token") and not any(e.get("token") == data["token"] for e in entries):
+            # 只有单个账号(旧版本授权文件)时使用 wx.lic 中的登录凭据
+            entries.append({"name": account_name(data.get("ext_data")), "token": data["token"],
+                            "cookie": data.get("cookie", ""), "expiry": data.get("expiry", {})})
+        accounts = {}
+        for entry in entries:
+            name = str(entry.get("name") or "default")
+            account = self._accounts.get(name) or Account(name)
+            if account.token != entry.get("token"):
+                # 重新登录后解除暂停
+                account.quarantined_until = 0.0
+                account.reason = ""
+            account.token = str(entry.get("token", ""))
+            account.cookie = str(entry.get("cookie", ""))
+            account.expiry = entry.get("expiry") or {}
+            accounts[name] = account
+        self._accounts = accounts
+        self._version = self._store.version
+
+    def _remaining(self, account: Account, now: float) -> int:
+        account.uses = [t for t in account.uses if now - t < self.WINDOW]
+        return self.budget - len(account.uses)
+
+    def _healthy(self, account: Account, now: float) -> bool:
+        return bool(account.token) and account.quarantined_until <= now and not account.expired(now)
+
+    def _best(self, now: float):
+        healthy = [a for a in self._accounts.values() if self._healthy(a, now)]
+        if not healthy:
+            return None
+        return max(healthy, key=lambda a: self._remaining(a, now))
+
+    def acquire(self):
+        """选择剩余额度最多的健康账号并记一次采集，没有可用账号返回None"""
+        with self._lock:
+            self._sync()
+            now = time.time()
+            account = self._best(now)
+            if account is not None:
+                account.uses.append(now)
+            return account
+
+    def peek(self):
+        """选择账号但不计入额度，用于搜索等非采集请求"""
+        with self._lock:
+            self._sync()
+            return self._best(time.time())
+
+    def report(self, name: str, reason: str) -> None:
+        """报告账号异常: freq 频率限制，暂停 gather.freq_quarantine 分钟；session 登录失效，暂停到重新登录"""
+        with self._lock:
+            account = self._accounts.get(name)
+            if account is None:
+                return
+            if reason == "session":
+                account.quarantined_until = float("inf")
+            else:
+                account.quarantined_until = time.time() + cfg.get_int("gather.freq_quarantine", 30) * 60
+            account.reason = reason
+
+    def healthy_count(self) -> int:
+        with self._lock:
+            self._sync()
+            now = time.time()
+            return sum(1 for a in self._accounts.values() if self._healthy(a, now))
+
+    def get_status(self) -> list:
+        with self._lock:
+            self._sync()
+            now = time.time()
+            return [{
+                "name": a.name,
+                "healthy": self._healthy(a, now),
+                "remaining": self._remaining(a, now),
+                "reason": a.reason,
+                "quarantined_until": a.quarantined_until if a.quarantined_until != float("inf") else -1,
+                "expiry_time": (a.expiry or {}).get("expiry_time", ""),
+            } for a in self._accounts.values()]
+
+Accounts = AccountPool(Credentials)
+
 def set_token(data:any,ext_data:any=None):
 
     """
@@ -23,8 +246,19 @@ def set_token(data:any,ext_data:any=None):
     if ext_data is not None:
         wx_cfg.set("ext_data", ext_data)
         print(ext_data)
+    # 按账号名称加入账号池，扫码登录不同账号即可多账号采集
+    name = account_name(ext_data if ext_data is not None else wx_cfg.get("ext_data", None))
+    accounts = [a for a in (wx_cfg.get("accounts", []) or []) if isinstance(a, dict) and a.get("name") != name]
+    accounts.append({
+        "name": name,
+        "token": data.get("token", ""),
+        "cookie": data.get("cookies_str", ""),
+        "expiry": data.get("expiry", {}),
+    })
+    wx_cfg.set("accounts", accounts)
+    Credentials.update(data.get("token", ""), data.get("cookies_str", ""), data.get("expiry", {}), ext_data, accounts)
     wx_cfg.save_config()
-    wx_cfg.reload()
+    Credentials.load()
     from jobs.notice import sys_notice
     sys_notice(f"""WeRss授权成功
 - Token: {data.get("token")}
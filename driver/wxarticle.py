@@ -1,4 +1,5 @@
 import random
+import asyncio
 from socket import timeout
 from .playwright_driver import PlaywrightController
 from typing import Dict
@@ -7,9 +8,162 @@ import time
 import base64
 import re
 import os
+import signal
 from datetime import datetime
 from core.config import cfg
 
+# 触发微信验证墙时页面展示的提示
+VERIFY_MARK = "当前环境异常，完成验证后即可继续访问"
+# 文章不可用时页面展示的提示 -> 对应的失败原因
+DELETED_MARKS = [
+    ("该内容已被发布者删除", "该内容已被发布者删除"),
+    ("The content has been deleted by the author.", "该内容已被发布者删除"),
+    ("内容审核中", "内容审核中"),
+    ("该内容暂时无法查看", "该内容暂时无法查看"),
+    ("违规无法查看", "违规无法查看"),
+    ("发送失败无法查看", "发送失败无法查看"),
+    ("Unable to view this content because it violates regulation", "违规无法查看"),
+]
+
+def check_deleted(body: str) -> str:
+    """检查页面文本是否为文章不可用提示，返回失败原因，正常文章返回空字符串"""
+    for mark, reason in DELETED_MARKS:
+        if mark in body:
+            return reason
+    return ""
+
+# 在页面中一次性提取文章信息，避免多次locator往返
+ARTICLE_EXTRACT_SCRIPT = """() => {
+    const meta = (p) => {
+        const el = document.querySelector(`meta[property="${p}"]`);
+        return el ? el.getAttribute("content") : "";
+    };
+    let content = document.querySelector("#js_content");
+    let is_album = false;
+    if (!content || content.innerHTML === "") {
+        content = document.querySelector("#js_article");
+        is_album = true;
+    }
+    const images = content ? Array.from(content.querySelectorAll("img"))
+        .map((img) => img.getAttribute("data-src") || img.getAttribute("src"))
+        .filter((src) => !!src) : [];
+    const publish = document.querySelector("#publish_time");
+    const logo = document.querySelector("#js_like_profile_bar .wx_follow_avatar img");
+    const nickname = document.querySelector("#js_wx_follow_nickname");
+    return {
+        title: meta("og:title") || document.title,
+        author: meta("og:article:author"),
+        description: meta("og:description"),
+        topic_image: meta("twitter:image"),
+        content: content ? content.innerHTML : "",
+        is_album: is_album,
+        images: images,
+        publish_time: publish ? publish.textContent.trim() : "",
+        mp_name: nickname ? nickname.textContent.trim() : "",
+        logo: logo ? logo.getAttribute("src") : "",
+        biz: window.biz || "",
+    };
+}"""
+
+class DomainRateLimiter:
+    """按域名限速，保证同一域名两次请求之间至少间隔interval秒"""
+
+    def __init__(self, interval: float = 3):
+        self.interval = max(float(interval), 0)
+        self._next = {}
+        self._lock = asyncio.Lock()
+
+    async def wait(self, url: str) -> None:
+        from urllib.parse import urlparse
+        host = urlparse(url).netloc
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            now = loop.time()
+            start = max(now, self._next.get(host, 0))
+            # 加入少量抖动，避免请求节奏过于规律
+            self._next[host] = start + self.interval + random.uniform(0, self.interval / 2)
+        if start > now:
+            await asyncio.sleep(start - now)
+
+class SharedAsyncBrowser:
+    """单篇文章抓取共用的异步浏览器
+
+    同一事件循环中的调用复用同一个浏览器上下文，每次只新开页面；
+    没有调用时空闲 IDLE 秒后关闭浏览器
+    """
+    IDLE = 300
+
+    def __init__(self):
+        self._controller = None
+        self._loop = None
+        self._lock = None
+        self._users = 0
+        self._idle = None
+
+    async def acquire(self):
+        from .playwright_driver import AsyncPlaywrightController
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # 浏览器对象绑定创建它的事件循环，换了事件循环时关闭旧浏览器后重新启动
+            old_loop, old = self._loop, self._controller
+            if self._idle is not None:
+                self._idle.cancel()
+            self._loop, self._lock, self._controller, self._users, self._idle = loop, asyncio.Lock(), None, 0, None
+            self._discard(old, old_loop)
+        async with self._lock:
+            if self._idle is not None:
+                self._idle.cancel()
+                self._idle = None
+            controller = self._controller
+            if controller is None or controller.browser is None or not controller.browser.is_connected():
+                controller = AsyncPlaywrightController()
+                await controller.start_browser(mobile_mode=False, dis_image=False,
+                                               scraping=bool(cfg.get("gather.block_resources", True)))
+                self._controller = controller
+            self._users += 1
+            return controller
+
+    @staticmethod
+    def _discard(controller, loop) -> None:
+        """关闭绑定在旧事件循环上的浏览器(尽力而为)，避免浏览器进程残留"""
+        if controller is None or controller.browser is None:
+            return
+        if loop is not None and loop.is_running():
+            # 旧事件循环仍在其他线程中运行，在它上面关闭
+            asyncio.run_coroutine_threadsafe(controller.Close(), loop)
+            return
+        # 旧事件循环已结束，Playwright 对象无法再使用；结束驱动进程，浏览器随调试管道关闭退出
+        try:
+            proc = controller.driver._impl_obj._connection._transport._proc
+            os.kill(proc.pid, signal.SIGTERM)
+        except Exception as e:
+            print_warning(f"关闭旧浏览器失败: {e}")
+
+    async def release(self) -> None:
+        async with self._lock:
+            self._users -= 1
+            if self._users <= 0:
+                self._idle = self._loop.call_later(self.IDLE, lambda: asyncio.ensure_future(self._close_idle()))
+
+    async def _close_idle(self) -> None:
+        async with self._lock:
+            if self._users > 0 or self._controller is None:
+                return
+            controller, self._controller, self._idle = self._controller, None, None
+        await controller.Close()
+
+SharedBrowser = SharedAsyncBrowser()
+
+def run_coroutine(coro):
+    """在同步代码中执行协程，当前线程已有运行中的事件循环(如 FastAPI 的处理函数)时在独立线程中执行"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="article-fetch") as executor:
+        return executor.submit(asyncio.run, coro).result()
+
 class WXArticleFetcher:
     """微信公众号文章获取器
     
@@ -161,6 +315,11 @@ class WXArticleFetcher:
             # 设置默认URL列表
             if urls is []:
                 urls = ["https://mp.weixin.qq.com/s/YTHUfxzWCjSRnfElEkL2Xg"]
+
+            concurrency = int(cfg.get("gather.content_concurrency", 3))
+            if concurrency > 1:
+                success_count = run_coroutine(self.async_fix_articles(urls, mp_id=mp_id, concurrency=concurrency))
+                return success_count > 0
                 
             success_count = 0
             total_count = len(urls)
@@ -174,15 +333,7 @@ class WXArticleFetcher:
                     article_data = self.get_article_content(url)
                     
                     # 构建文章数据
-                    article = {
-                        "id": article_data.get('id'), 
-                        "title": article_data.get('title'),
-                        "mp_id": article_data.get('mp_id') if mp_id is None else mp_id, 
-                        "publish_time": article_data.get('publish_time'),
-                        "pic_url": article_data.get('pic_url'),
-                        "content": article_data.get('content'),
-                        "url": url,
-                    }
+                    article = self.build_article(article_data, url, mp_id)
                     
                     # 删除content字段避免重复存储
                     content_backup = article_data.get('content', '')
@@ -217,13 +368,189 @@ class WXArticleFetcher:
             return False
         finally:
             self.Close() 
-    async def async_get_article_content(self,url:str)->Dict:
-        import asyncio
-        from concurrent.futures import ThreadPoolExecutor
+    def build_article(self, article_data: Dict, url: str, mp_id: str = "") -> Dict:
+        """将抓取结果转换为入库的文章数据"""
+        return {
+            "id": article_data.get('id'),
+            "title": article_data.get('title'),
+            "mp_id": mp_id or article_data.get('mp_id'),
+            "publish_time": article_data.get('publish_time'),
+            "pic_url": article_data.get('pic_url'),
+            "content": article_data.get('content'),
+            "url": url,
+        }
+
+    async def async_fix_articles(self, urls: list, mp_id: str = "", concurrency: int = None) -> int:
+        """异步批量修复文章内容，抓取结果逐篇写入数据库
+
+        Returns:
+            成功更新的文章数量
+        """
+        from jobs.article import UpdateArticle
         loop = asyncio.get_running_loop()
-        with ThreadPoolExecutor() as pool:
-            future = loop.run_in_executor(pool, self.get_article_content, url)
-        return await future
+        success_count = 0
+
+        async def save(url: str, article_data: Dict):
+            nonlocal success_count
+            if not article_data:
+                return
+            article = self.build_article(article_data, url, mp_id)
+            # 数据库写入为同步调用，放到线程池中执行，不阻塞页面抓取
+            ok = await loop.run_in_executor(None, lambda: UpdateArticle(article, check_exist=True))
+            if ok:
+                success_count += 1
+                print_info(f"已更新文章: {article.get('title') or '未知标题'}")
+            else:
+                print_warning(f"更新失败: {article.get('title') or '未知标题'}")
+
+        total = await self.async_fetch_articles(urls, CallBack=save, concurrency=concurrency)
+        print_success(f"批量处理完成: 成功 {success_count}/{total}")
+        return success_count
+
+    async def async_fetch_articles(self, urls: list, CallBack=None, concurrency: int = None, rate: float = None,
+                                   controller=None) -> int:
+        """在同一个浏览器中并发抓取多篇文章
+
+        Args:
+            urls: 文章URL列表
+            CallBack: 异步回调 CallBack(url, info)，抓取失败时info为None，结果按完成顺序逐条推送
+            concurrency: 同时打开的页面数，默认 gather.content_concurrency
+            rate: 同一域名两次请求的最小间隔(秒)，默认 gather.content_rate
+            controller: 已启动的 AsyncPlaywrightController，为空时启动新浏览器并在结束后关闭
+
+        Returns:
+            处理的URL数量
+        """
+        from .playwright_driver import AsyncPlaywrightController
+        concurrency = max(int(concurrency or cfg.get("gather.content_concurrency", 3)), 1)
+        rate = float(rate if rate is not None else cfg.get("gather.content_rate", 3))
+        urls = [url for url in urls if url]
+        if not urls:
+            return 0
+
+        pending = asyncio.Queue()
+        for url in urls:
+            pending.put_nowait(url)
+        # 结果队列有界，写库跟不上时反压抓取
+        results = asyncio.Queue(maxsize=concurrency * 2)
+        limiter = DomainRateLimiter(rate)
+        own = controller is None
+        if own:
+            controller = AsyncPlaywrightController()
+            scraping = bool(cfg.get("gather.block_resources", True))
+            await controller.start_browser(mobile_mode=False, dis_image=False, scraping=scraping)
+
+        async def fetch_worker():
+            while True:
+                try:
+                    url = pending.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                await limiter.wait(url)
+                info = None
+                try:
+                    info = await self._async_fetch_page(controller, url)
+                except Exception as e:
+                    print_error(f"处理文章失败 {url}: {e}")
+                await results.put((url, info))
+
+        async def writer():
+            done = 0
+            while done < len(urls):
+                url, info = await results.get()
+                done += 1
+                print_info(f"已完成 {done}/{len(urls)}: {url}")
+                if CallBack is not None:
+                    try:
+                        await CallBack(url, info)
+                    except Exception as e:
+                        print_error(f"保存文章失败 {url}: {e}")
+
+        try:
+            workers = [asyncio.create_task(fetch_worker()) for _ in range(min(concurrency, len(urls)))]
+            await asyncio.gather(writer(), *workers)
+        finally:
+            if own:
+                await controller.Close()
+        return len(urls)
+
+    async def _async_fetch_page(self, controller, url: str) -> Dict:
+        """在新页面中打开并解析单篇文章"""
+        page = await controller.new_page()
+        try:
+            print_warning(f"Get:{url} Wait:{self.wait_timeout}")
+            page.set_default_timeout(self.wait_timeout)
+            if controller.scraping:
+                await controller.open_url(page, url, wait_until="commit")
+                await controller.wait_for_content(page, timeout=self.wait_timeout)
+            else:
+                await controller.open_url(page, url)
+            body = (await page.locator("body").text_content() or "").strip()
+            if VERIFY_MARK in body:
+                raise Exception(VERIFY_MARK)
+            deleted_reason = check_deleted(body)
+            if deleted_reason:
+                # 与同步抓取一致，文章不可用时不返回结果，不覆盖已有的文章内容
+                raise Exception(deleted_reason)
+            info = {
+                "id": self.extract_id_from_url(url),
+                "title": "",
+                "publish_time": "",
+                "content": "",
+                "images": [],
+                "mp_info": {
+                    "mp_name": "",
+                    "logo": "",
+                    "biz": "",
+                }
+            }
+
+            data = await page.evaluate(ARTICLE_EXTRACT_SCRIPT)
+            content = data.get("content", "")
+            if data.get("is_album"):
+                content = self.clean_article_content(str(content))
+            publish_time = ""
+            if data.get("publish_time"):
+                publish_time = self.convert_publish_time_to_timestamp(data["publish_time"])
+            info.update({
+                "title": data.get("title", ""),
+                "publish_time": publish_time,
+                "content": content,
+                "images": data.get("images", []),
+                "author": data.get("author", ""),
+                "description": data.get("description", ""),
+                "topic_image": data.get("topic_image", ""),
+            })
+            match = re.search(r'[?&]__biz=([^&]+)', url)
+            biz = data.get("biz") or (match.group(1) if match else "")
+            info["mp_info"] = {
+                "mp_name": data.get("mp_name", ""),
+                "logo": data.get("logo", ""),
+                "biz": biz,
+            }
+            try:
+                info["mp_id"] = "MP_WXS_" + base64.b64decode(biz).decode("utf-8")
+            except Exception as e:
+                print_error(f"获取公众号信息失败: {str(e)}")
+            return info
+        finally:
+            await page.close()
+
+    async def async_get_article_content(self,url:str)->Dict:
+        """异步获取单篇文章详细内容，返回格式同 get_article_content"""
+        result = {}
+
+        async def keep(url: str, info: Dict):
+            if info is not None:
+                result.update(info)
+
+        # 复用共用的浏览器，不为每次请求启动新浏览器
+        controller = await SharedBrowser.acquire()
+        try:
+            await self.async_fetch_articles([url], CallBack=keep, concurrency=1, rate=0, controller=controller)
+        finally:
+            await SharedBrowser.release()
+        return result
     def get_article_content(self, url: str) -> Dict:
         """获取单篇文章详细内容
         
@@ -253,11 +580,16 @@ class WXArticleFetcher:
                 "biz": "",
                 }
             }
-        self.controller.start_browser(mobile_mode=False,dis_image=False)
+        scraping = bool(cfg.get("gather.block_resources", True))
+        self.controller.start_browser(mobile_mode=False,dis_image=False,scraping=scraping)
        
         self.page = self.controller.page
         print_warning(f"Get:{url} Wait:{self.wait_timeout}")
-        self.controller.open_url(url)
+        if scraping:
+            self.controller.open_url(url,wait_until="commit")
+            self.controller.wait_for_content(timeout=self.wait_timeout)
+        else:
+            self.controller.open_url(url)
         page = self.page
         content=""
         
@@ -268,32 +600,18 @@ class WXArticleFetcher:
             body= page.locator("body").text_content().strip()
             
             info["content"]=body
-            if "当前环境异常，完成验证后即可继续访问" in body:
+            if VERIFY_MARK in body:
                 info["content"]=""
                 # try:
                 #     page.locator("#js_verify").click()
                 # except:
                 self.controller.cleanup()
                 time.sleep(5)
-                raise Exception("当前环境异常，完成验证后即可继续访问")
-            if "该内容已被发布者删除" in body or "The content has been deleted by the author." in body:
-                info["content"]="DELETED"
-                raise Exception("该内容已被发布者删除")
-            if  "内容审核中" in body:
-                info['content']="DELETED"
-                raise Exception("内容审核中")
-            if "该内容暂时无法查看" in body:
-                info["content"]="DELETED"
-                raise Exception("该内容暂时无法查看")
-            if "违规无法查看" in body:
-                info["content"]="DELETED"
-                raise Exception("违规无法查看")
-            if "发送失败无法查看" in body:
-                info["content"]="DELETED"
-                raise Exception("发送失败无法查看")
-            if "Unable to view this content because it violates regulation" in body:     
+                raise Exception(VERIFY_MARK)
+            deleted_reason = check_deleted(body)
+            if deleted_reason:
                 info["content"]="DELETED"
-                raise Exception("违规无法查看")
+                raise Exception(deleted_reason)
             
 
             # 获取标题
@@ -411,19 +729,8 @@ class WXArticleFetcher:
 
    
     def clean_article_content(self,html_content: str):
-        from tools.html import htmltools
-        return htmltools.clean_html(str(html_content),
-                                 remove_selectors=[
-                                     "link",
-                                     "head",
-                                     "script"
-                                 ],
-                                 remove_attributes=[
-                                     {"name":"style","value":"display: none;"},
-                                     {"name":"style","value":"display:none;"},
-                                     {"name":"aria-hidden","value":"true"},
-                                 ]
-                                 )
+        from core.content_clean import clean_html
+        return clean_html(str(html_content))
    
 
 
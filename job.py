@@ -1,8 +1,19 @@
 from jobs import start_job
 if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--worker', action='store_true', help='作为采集工作进程运行，从feed_jobs表领取公众号刷新任务')
+    parser.add_argument('--threads', type=int, default=1, help='工作进程内的工作线程数')
+    args, _ = parser.parse_known_args()
     import init_sys as init
     init.init()
-    # 启动定时任务
+    if args.worker:
+        from jobs.worker import GatherWorker
+        GatherWorker(threads=args.threads).run_forever()
+        raise SystemExit(0)
+    # 启动队列和定时任务
+    from core.queue import TaskQueue
+    TaskQueue.run_task_background()
     start_job()
     input("按Enter键退出...\n")
     # def sample_task():
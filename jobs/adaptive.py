@@ -0,0 +1,183 @@
+"""自适应采集调度
+
+根据每个公众号的历史发文时间(articles.publish_time)估计发文间隔和常用发文时段，
+发文频繁或临近预计发文时间的公众号轮询得更勤，长期不更新的公众号逐步降低频率，
+所有公众号共享一个全局请求预算(每小时最多请求次数)。
+"""
+import time
+import threading
+import statistics
+from datetime import datetime
+from collections import Counter
+from typing import Callable
+from core.config import cfg
+from core.models.article import Article
+from core.models.feed import Feed
+from core.print import print_info,print_warning
+
+HOUR = 3600
+
+class FeedPlan:
+    """单个公众号的轮询计划"""
+    __slots__ = ("feed_id", "last_publish", "gap", "hot_hours", "last_poll", "interval", "next_poll", "samples")
+
+    def __init__(self, feed_id: str, last_poll: int = 0):
+        self.feed_id = feed_id
+        self.last_publish = 0
+        self.gap = 0
+        self.hot_hours = set()
+        self.last_poll = last_poll or 0
+        self.interval = 0
+        self.next_poll = 0
+        self.samples = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "feed_id": self.feed_id,
+            "samples": self.samples,
+            "gap_hours": round(self.gap / HOUR, 2),
+            "interval_minutes": round(self.interval / 60, 1),
+            "hot_hours": sorted(self.hot_hours),
+            "last_publish": self.last_publish,
+            "last_poll": self.last_poll,
+            "next_poll": self.next_poll,
+        }
+
+class AdaptivePlanner:
+    """按发文频率为每个公众号计算轮询间隔，并在全局预算内挑选到期的公众号
+
+    轮询间隔规则:
+        - 基础间隔为历史发文间隔中位数的 1/4
+        - 处于预计发文窗口内(上次发文+间隔中位数附近)时缩短到 1/8
+        - 当前小时属于常用发文时段时再减半
+        - 超过3倍间隔仍未发文的视为休眠，间隔随沉寂时长放大
+        - 最终限制在 [min_interval, max_interval] 之间
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.plans = {}
+        self.tokens = 0.0
+        self.last_refill = time.time()
+        self.load_config()
+
+    def load_config(self) -> None:
+        self.budget = max(1, int(cfg.get("gather.adaptive.budget", 60)))            # 每小时最多请求次数
+        self.min_interval = int(cfg.get("gather.adaptive.min_interval", 30)) * 60   # 分钟
+        self.max_interval = int(cfg.get("gather.adaptive.max_interval", 1440)) * 60
+        self.history_days = int(cfg.get("gather.adaptive.history_days", 60))
+        self.tick = max(1, int(cfg.get("gather.adaptive.tick", 5)))                 # 分钟
+
+    def _clamp(self, value: float) -> int:
+        return int(min(self.max_interval, max(self.min_interval, value)))
+
+    def load_history(self, session, feed_ids: list) -> dict:
+        """一次查询取出所有公众号在统计周期内的发文时间"""
+        since = int(time.time()) - self.history_days * 86400
+        rows = session.query(Article.mp_id, Article.publish_time) \
+            .filter(Article.mp_id.in_(feed_ids), Article.publish_time >= since) \
+            .all()
+        history = {}
+        for mp_id, publish_time in rows:
+            if publish_time:
+                history.setdefault(mp_id, []).append(int(publish_time))
+        return history
+
+    def estimate(self, plan: FeedPlan, publish_times: list, now: float) -> int:
+        """根据发文历史计算轮询间隔(秒)"""
+        # 同一次推送的多篇文章时间相同，按推送去重
+        times = sorted(set(publish_times))
+        plan.samples = len(times)
+        if not times:
+            # 统计周期内没有发文，按休眠处理
+            plan.gap = 0
+            plan.hot_hours = set()
+            return self.max_interval
+        plan.last_publish = times[-1]
+        hours = Counter(datetime.fromtimestamp(t).hour for t in times)
+        top = max(hours.values())
+        plan.hot_hours = {h for h, c in hours.items() if c >= max(2, top / 2)}
+        if len(times) < 2:
+            plan.gap = self.history_days * 86400
+            return self.max_interval
+        gaps = [b - a for a, b in zip(times, times[1:])]
+        gap = max(HOUR, statistics.median(gaps))
+        plan.gap = int(gap)
+
+        interval = gap / 4
+        since_last = now - plan.last_publish
+        if gap * 0.75 <= since_last <= gap * 1.5:
+            # 预计发文窗口
+            interval = gap / 8
+        elif since_last > gap * 3:
+            # 长期未发文，沉寂越久轮询越稀
+            interval = interval * since_last / (gap * 3)
+        if datetime.fromtimestamp(now).hour in plan.hot_hours:
+            interval = interval / 2
+        return self._clamp(interval)
+
+    def refresh(self, session, feeds: list[Feed]) -> None:
+        """刷新所有公众号的轮询计划"""
+        now = time.time()
+        history = self.load_history(session, [feed.id for feed in feeds]) if feeds else {}
+        with self._lock:
+            plans = {}
+            for feed in feeds:
+                plan = self.plans.get(feed.id) or FeedPlan(feed.id, last_poll=feed.sync_time)
+                plan.interval = self.estimate(plan, history.get(feed.id, []), now)
+                plan.next_poll = plan.last_poll + plan.interval
+                plans[feed.id] = plan
+            self.plans = plans
+
+    def _refill(self, now: float) -> None:
+        # 令牌桶，最多积攒一个调度周期的两倍，避免长时间空闲后集中请求
+        rate = self.budget / HOUR
+        cap = max(1.0, self.budget * self.tick / 60 * 2)
+        self.tokens = min(cap, self.tokens + (now - self.last_refill) * rate)
+        self.last_refill = now
+
+    def due(self) -> list[str]:
+        """按紧迫程度挑选到期的公众号，受全局预算限制"""
+        now = time.time()
+        with self._lock:
+            self._refill(now)
+            ready = [p for p in self.plans.values() if p.next_poll <= now]
+            # 逾期时长占间隔的比例越大越优先，处于常用发文时段的优先
+            hour = datetime.fromtimestamp(now).hour
+            ready.sort(key=lambda p: ((now - p.next_poll) / max(p.interval, 1)
+                                      + (1 if hour in p.hot_hours else 0)), reverse=True)
+            selected = []
+            for plan in ready:
+                if self.tokens < 1:
+                    break
+                self.tokens -= 1
+                plan.last_poll = int(now)
+                plan.next_poll = plan.last_poll + plan.interval
+                selected.append(plan.feed_id)
+            skipped = len(ready) - len(selected)
+        if skipped:
+            print_warning(f"自适应调度: 请求预算不足，{skipped}个公众号顺延到下个周期")
+        return selected
+
+    def run_tick(self, session, feeds: list[Feed], poll: Callable[[Feed], None]) -> list[str]:
+        """执行一个调度周期：刷新计划，对到期的公众号调用poll"""
+        self.refresh(session, feeds)
+        feed_map = {feed.id: feed for feed in feeds}
+        selected = self.due()
+        for feed_id in selected:
+            poll(feed_map[feed_id])
+        if selected:
+            print_info(f"自适应调度: 本周期轮询{len(selected)}个公众号")
+        return selected
+
+    def get_status(self) -> dict:
+        with self._lock:
+            plans = sorted(self.plans.values(), key=lambda p: p.next_poll)
+            return {
+                "budget": self.budget,
+                "tokens": round(self.tokens, 2),
+                "tick_minutes": self.tick,
+                "feeds": [p.to_dict() for p in plans],
+            }
+
+Planner = AdaptivePlanner()
@@ -6,6 +6,24 @@ from core.models.article import Article
 
 DB=db.Db(tag="文章采集API")
 
+def LocalizeImages(art:dict)->dict:
+    """开启 gather.localize_images 时把新文章的正文图片下载到本地，并改写已保存文章中的图片地址"""
+    from core.res.images import Images,localize_enabled
+    content=art.get("content")
+    if not localize_enabled() or not content or content=="DELETED":
+        return art
+    # 与 Db.add_article 中的文章ID规则一致
+    article_id=f"{art.get('mp_id')}-{art.get('id')}".replace("MP_WXS_","")
+    try:
+        localized,_=Images.localize(content,article_id,cover=art.get("pic_url"))
+        if localized!=content:
+            art["content"]=localized
+            session=DB.get_session()
+            session.query(Article).filter(Article.id==article_id).update({Article.content:localized},synchronize_session=False)
+            session.commit()
+    except Exception as e:
+        print(f"图片本地化失败: {e}")
+    return art
 def UpdateArticle(art:dict,check_exist=False):
     mps_count=0
     if DEBUG:
@@ -13,6 +31,8 @@ def UpdateArticle(art:dict,check_exist=False):
         pass
     if  DB.add_article(art,check_exist=check_exist):
         mps_count=mps_count+1
+        # 只处理新保存的文章，每次刷新都会返回的已有文章不再重复解析和下载图片
+        LocalizeImages(art)
         return True
     return False
 def Update_Over(data=None):
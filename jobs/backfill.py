@@ -0,0 +1,157 @@
+"""公众号历史文章回填
+
+新添加的公众号(或手动发起回填时)按页采集历史文章，每采集完一页把进度(页码、最后一篇文章ID)写入
+backfill_jobs 表，进程重启后从断点继续。回填使用独立的请求额度 gather.backfill.rate(每小时页数)，
+多个公众号轮流进行；触发频率限制或登录失效时冷却 gather.backfill.cooldown 分钟后再继续。
+"""
+import time
+import threading
+from datetime import datetime
+from core.config import cfg
+from core.models.base import DATA_STATUS
+from core.models.backfill_job import BackfillJob
+from core.print import print_info, print_warning, print_error, print_success
+
+class BackfillRunner:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._last_page_at = 0.0
+        self.stats = {"pages": 0, "articles": 0, "cooldowns": 0}
+
+    @property
+    def interval(self) -> float:
+        """两页之间的最小间隔 单位秒"""
+        return 3600 / max(1, cfg.get_int("gather.backfill.rate", 30))
+
+    @property
+    def cooldown(self) -> int:
+        return max(1, cfg.get_int("gather.backfill.cooldown", 60)) * 60
+
+    def _session(self):
+        from core.db import DB
+        return DB.get_session()
+
+    def add(self, feed, pages: int = None) -> BackfillJob:
+        """为公众号创建或延长回填任务
+
+        Args:
+            feed: 公众号
+            pages: 回填页数，默认 max_page
+        """
+        pages = int(pages or cfg.get("max_page", 5) or 5)
+        session = self._session()
+        job = session.query(BackfillJob).filter(BackfillJob.feed_id == feed.id).first()
+        now = datetime.now()
+        if job is None:
+            job = BackfillJob(feed_id=feed.id, faker_id=feed.faker_id, mp_name=feed.mp_name, max_page=pages,
+                              page=0, fetched=0, empty_pages=0, status=DATA_STATUS.PENDING, resume_at=0,
+                              created_at=now, updated_at=now)
+            session.add(job)
+        elif pages > job.max_page or job.status != DATA_STATUS.COMPLETED:
+            # 已完成的任务只有在请求更多页时才重新打开
+            job.max_page = max(job.max_page, pages)
+            job.empty_pages = 0
+            job.status = DATA_STATUS.PENDING
+            job.updated_at = now
+        session.commit()
+        print_info(f"[{feed.mp_name}]回填任务: 第{job.page}/{job.max_page}页")
+        self.start()
+        self._wake.set()
+        return job
+
+    def _next(self, session):
+        """轮流选择可以执行的任务，返回 (任务, 最早的冷却结束时间)"""
+        jobs = session.query(BackfillJob).filter(
+            BackfillJob.status.in_([DATA_STATUS.PENDING, DATA_STATUS.ACTIVE])
+        ).order_by(BackfillJob.updated_at).all()
+        now = int(time.time())
+        ready = [job for job in jobs if (job.resume_at or 0) <= now]
+        if ready:
+            return ready[0], None
+        return None, min((job.resume_at for job in jobs), default=None)
+
+    def run_page(self, session, job: BackfillJob) -> None:
+        """采集一页并保存进度"""
+        from core.wx import WxGather
+        from jobs.article import UpdateArticle
+        seen = []
+
+        def collect(art: dict) -> bool:
+            seen.append(str(art["id"]))
+            return UpdateArticle(art)
+
+        wx = WxGather().Model()
+        error = None
+        try:
+            wx.get_Articles(job.faker_id, Mps_id=job.feed_id, Mps_title=job.mp_name, CallBack=collect,
+                            start_page=job.page, MaxPage=job.page + 1, interval=0)
+        except Exception as e:
+            error = str(e)
+        now = int(time.time())
+        self.stats["pages"] += 1
+        if getattr(wx, "quarantined", False) or error or not wx.token:
+            # 频率限制、登录失效或未登录，冷却后从同一页重新采集(已保存的文章会去重)
+            job.resume_at = now + self.cooldown
+            job.last_error = error or ("账号触发频率限制" if wx.token else "未登录公众号平台")
+            self.stats["cooldowns"] += 1
+            print_warning(f"[{job.mp_name}]回填暂停于第{job.page + 1}页，{self.cooldown // 60}分钟后继续: {job.last_error}")
+        elif not seen:
+            job.empty_pages = (job.empty_pages or 0) + 1
+            if job.empty_pages >= 2:
+                job.status = DATA_STATUS.COMPLETED
+                print_success(f"[{job.mp_name}]回填完成，已到最早的文章，共{job.fetched}篇")
+        else:
+            job.page += 1
+            job.last_aid = seen[-1]
+            job.fetched = (job.fetched or 0) + len(seen)
+            job.empty_pages = 0
+            job.last_error = None
+            self.stats["articles"] += len(seen)
+            if job.page >= job.max_page:
+                job.status = DATA_STATUS.COMPLETED
+                print_success(f"[{job.mp_name}]回填完成，共{job.page}页{job.fetched}篇")
+            else:
+                job.status = DATA_STATUS.ACTIVE
+        job.updated_at = datetime.now()
+        session.commit()
+
+    def _loop(self) -> None:
+        while True:
+            try:
+                session = self._session()
+                job, resume_at = self._next(session)
+                if job is None:
+                    # 没有可执行的任务时等到最早的冷却结束或有新任务
+                    timeout = max(1, resume_at - time.time()) if resume_at else None
+                    self._wake.wait(min(timeout or 300, 300))
+                    self._wake.clear()
+                    continue
+                wait = self._last_page_at + self.interval - time.time()
+                if wait > 0:
+                    self._wake.wait(wait)
+                    self._wake.clear()
+                    continue
+                self._last_page_at = time.time()
+                self.run_page(session, job)
+            except Exception as e:
+                print_error(f"回填任务出错: {e}")
+                time.sleep(10)
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, daemon=True, name="backfill")
+                self._thread.start()
+
+    def get_stats(self) -> dict:
+        try:
+            session = self._session()
+            pending = session.query(BackfillJob).filter(
+                BackfillJob.status.in_([DATA_STATUS.PENDING, DATA_STATUS.ACTIVE])).count()
+        except Exception:
+            pending = None
+        return {"running": self._thread is not None, "pending": pending, "interval": self.interval, **self.stats}
+
+Backfill = BackfillRunner()
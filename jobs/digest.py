@@ -0,0 +1,186 @@
+"""消息任务的汇总发送
+
+消息任务的 digest_window 大于0时，各公众号刷新得到的新文章不再逐个公众号通知，而是写入 message_digests 表，
+在最早一篇文章等待满 digest_window 分钟、或文章数达到 digest_size 时合并渲染为一条消息发送。
+缓冲保存在数据库中，进程重启后继续；发送前按批次号认领，多个进程(lease 模式的工作进程)同时检查时同一批文章只发送一次。
+"""
+import json
+import time
+import uuid
+import threading
+from concurrent.futures import TimeoutError as FutureTimeout
+from datetime import datetime
+from sqlalchemy import func
+from core.models.article import Article
+from core.models.feed import Feed
+from core.models.message_task import MessageTask
+from core.models.message_digest import MessageDigest
+from core.print import print_info, print_error, print_success
+
+# 检查到期汇总的间隔 单位秒
+CHECK_INTERVAL = 30
+# 认领后超过该时间仍未删除的批次(发送时进程退出)重新等待发送 单位秒，实际取值见 claim_timeout
+CLAIM_TIMEOUT = 600
+# 认领时间比通知最长发送时间多出的余量 单位秒
+CLAIM_MARGIN = 120
+
+COLUMNS = [field.name for field in Article.__table__.columns]
+
+def claim_timeout() -> float:
+    """认领超时必须大于通知一次发送(含全部重试)的最长耗时，发送中的批次不会被其他进程重新认领发送"""
+    from core.notice import Dispatcher
+    return max(CLAIM_TIMEOUT, Dispatcher.max_delivery_time() + CLAIM_MARGIN)
+
+def digest_enabled(task: MessageTask) -> bool:
+    return (getattr(task, "digest_window", 0) or 0) > 0
+
+def dump_article(article) -> str:
+    """只保存文章表中的字段，与 web_hook 读取的字段一致"""
+    if isinstance(article, dict):
+        data = {name: article[name] for name in COLUMNS if name in article}
+    else:
+        data = {name: getattr(article, name, None) for name in COLUMNS}
+    return json.dumps(data, ensure_ascii=False, default=str)
+
+class DigestRunner:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.stats = {"buffered": 0, "messages": 0, "articles": 0, "failed": 0}
+
+    def _session(self):
+        from core.db import DB
+        return DB.get_session()
+
+    def add(self, task: MessageTask, feed: Feed, articles: list) -> int:
+        """把公众号的新文章加入任务的汇总，返回任务当前等待发送的文章数"""
+        session = self._session()
+        if articles:
+            ids = {f"{task.id}:{feed.id}:{article['id'] if isinstance(article, dict) else article.id}": article
+                   for article in articles}
+            exists = {row.id for row in session.query(MessageDigest.id).filter(MessageDigest.id.in_(list(ids)))}
+            now = datetime.now()
+            for key, article in ids.items():
+                if key not in exists:
+                    session.add(MessageDigest(id=key, task_id=task.id, mps_id=feed.id, mp_name=feed.mp_name,
+                                              article=dump_article(article), claimed_at=0, created_at=now))
+            session.commit()
+            with self._lock:
+                self.stats["buffered"] += len(ids) - len(exists)
+        pending = session.query(MessageDigest).filter(MessageDigest.task_id == task.id,
+                                                     MessageDigest.batch_id.is_(None)).count()
+        self.start()
+        if task.digest_size and pending >= task.digest_size:
+            # 由汇总线程发送，调用方(队列工作线程)不等待通知结果
+            self._wake.set()
+        return pending
+
+    def flush(self, task: MessageTask) -> int:
+        """认领任务等待中的文章，合并为一条消息发送，返回文章数"""
+        from jobs.webhook import MessageWebHook, web_hook
+        session = self._session()
+        batch_id = str(uuid.uuid4())
+        claimed = session.query(MessageDigest).filter(
+            MessageDigest.task_id == task.id, MessageDigest.batch_id.is_(None)
+        ).update({MessageDigest.batch_id: batch_id, MessageDigest.claimed_at: int(time.time())},
+                 synchronize_session=False)
+        session.commit()
+        if not claimed:
+            return 0
+        rows = session.query(MessageDigest).filter(MessageDigest.batch_id == batch_id) \
+            .order_by(MessageDigest.created_at).all()
+        feeds, articles = {}, []
+        for row in rows:
+            if row.mps_id not in feeds:
+                feeds[row.mps_id] = Feed(id=row.mps_id, mp_name=row.mp_name)
+            articles.append(json.loads(row.article))
+        feed = Feed(id=",".join(feeds), mp_name="、".join(f.mp_name or "" for f in feeds.values()))
+        try:
+            future = web_hook(MessageWebHook(task=task, feed=feed, articles=articles, feeds=list(feeds.values())))
+            # 等待发送结果，重试后仍失败或地址熔断时保留文章
+            result = future.result(timeout=claim_timeout() - CLAIM_MARGIN / 2) if future is not None else None
+        except FutureTimeout:
+            # 仍在排队或发送中，保留认领，超过认领时间后由 check 重新发送
+            print_error(f"任务({task.id})汇总发送超时，稍后重试")
+            return 0
+        except Exception:
+            self.release(batch_id)
+            raise
+        if result is not None and not result.get("ok"):
+            self.release(batch_id)
+            print_error(f"任务({task.id})汇总发送失败，稍后重试: {result.get('error')}")
+            return 0
+        print_success(f"任务({task.id})汇总发送{len(articles)}篇文章，来自{len(feeds)}个公众号")
+        session.query(MessageDigest).filter(MessageDigest.batch_id == batch_id).delete(synchronize_session=False)
+        session.commit()
+        with self._lock:
+            self.stats["messages"] += 1
+            self.stats["articles"] += len(articles)
+        return len(articles)
+
+    def release(self, batch_id: str) -> None:
+        """发送失败时放回等待，下次检查时重试"""
+        with self._lock:
+            self.stats["failed"] += 1
+        session = self._session()
+        session.query(MessageDigest).filter(MessageDigest.batch_id == batch_id).update(
+            {MessageDigest.batch_id: None, MessageDigest.claimed_at: 0}, synchronize_session=False)
+        session.commit()
+
+    def check(self) -> None:
+        """发送到期的汇总，清理已删除任务的缓冲"""
+        session = self._session()
+        now = time.time()
+        # 发送时进程退出的批次重新等待发送
+        session.query(MessageDigest).filter(
+            MessageDigest.batch_id.isnot(None), MessageDigest.claimed_at < int(now - claim_timeout())
+        ).update({MessageDigest.batch_id: None, MessageDigest.claimed_at: 0}, synchronize_session=False)
+        session.commit()
+        waiting = {task_id: (created_at, count) for task_id, created_at, count in
+                   session.query(MessageDigest.task_id, func.min(MessageDigest.created_at), func.count())
+                   .filter(MessageDigest.batch_id.is_(None)).group_by(MessageDigest.task_id).all()}
+        if not waiting:
+            return
+        session.expire_all()
+        tasks = {task.id: task for task in session.query(MessageTask).filter(MessageTask.id.in_(list(waiting)))}
+        for task_id, (created_at, count) in waiting.items():
+            task = tasks.get(task_id)
+            if task is None or task.status != 1:
+                session.query(MessageDigest).filter(MessageDigest.task_id == task_id).delete(synchronize_session=False)
+                session.commit()
+                print_info(f"任务({task_id})已删除或停用，丢弃未发送的汇总")
+                continue
+            # 关闭汇总后立即发出已缓冲的文章，达到 digest_size 时不等待窗口
+            window = (task.digest_window or 0) * 60
+            if (created_at is None or now - created_at.timestamp() >= window
+                    or (task.digest_size and count >= task.digest_size)):
+                try:
+                    self.flush(task)
+                except Exception as e:
+                    print_error(f"任务({task_id})汇总发送失败: {e}")
+
+    def _loop(self) -> None:
+        while True:
+            try:
+                self.check()
+            except Exception as e:
+                print_error(f"检查消息汇总出错: {e}")
+            self._wake.wait(CHECK_INTERVAL)
+            self._wake.clear()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, daemon=True, name="digest")
+                self._thread.start()
+
+    def get_stats(self) -> dict:
+        try:
+            session = self._session()
+            pending = session.query(MessageDigest).filter(MessageDigest.batch_id.is_(None)).count()
+        except Exception:
+            pending = None
+        return {"running": self._thread is not None, "pending": pending, **self.stats}
+
+Digests = DigestRunner()
@@ -5,6 +5,7 @@ from time import sleep
 from core.print import print_success,print_error
 import random
 from driver.wxarticle import Web
+from core.wx.extract import Extractor
 DB=db.Db(tag="内容修正")
 def fetch_articles_without_content():
     """
@@ -31,13 +32,20 @@ def fetch_articles_without_content():
             print(f"正在处理文章: {article.title}, URL: {url}")
             
             # 获取内容
-            if cfg.get("gather.content_mode","web"):
+            content_mode=cfg.get("gather.content_mode","auto")
+            if content_mode=="web":
                 content=Web.get_article_content(url).get("content")
-            else:
+            elif content_mode=="api":
                 content = ga.content_extract(url)
+            else:
+                content = Extractor.extract(url)
             sleep(random.randint(3,10))
             if content:
                 # 更新内容
+                if content!="DELETED":
+                    from core.res.images import Images,localize_enabled
+                    if localize_enabled():
+                        content,_=Images.localize(content,article.id,cover=article.pic_url)
                 article.content = content
                 if  content=="DELETED":
                     print_error(f"获取文章 {article.title} 内容已被发布者删除")
@@ -54,20 +62,21 @@ def fetch_articles_without_content():
 from core.task import TaskScheduler
 from core.queue import TaskQueueManager
 scheduler=TaskScheduler()
-task_queue=TaskQueueManager()
-task_queue.run_task_background()
+# 每次只处理10篇，单线程执行避免重复处理同一批文章
+task_queue=TaskQueueManager(tag="内容修正",workers=1,durable="content")
 from core.config import cfg
 from core.print import print_success,print_warning
+def do_sync():
+    # 上一次还没有执行时不重复加入
+    task_queue.add_task(fetch_articles_without_content,dedupe_key="fetch_articles_without_content",priority="backfill")
 def start_sync_content():
     if not cfg.get("gather.content_auto_check",False):
         print_warning("自动检查并同步文章内容功能未启用")
         return
+    task_queue.run_task_background()
     interval=int(cfg.get("gather.content_auto_interval",1)) # 每隔多少分钟
     cron_exp=f"*/{interval} * * * *"
-    task_queue.clear_queue()
     scheduler.clear_all_jobs()
-    def do_sync():
-        task_queue.add_task(fetch_articles_without_content)
     job_id=scheduler.add_cron_job(do_sync,cron_expr=cron_exp)
     print_success(f"已添自动同步文章内容任务: {job_id}")
     scheduler.start()
@@ -1,3 +1,4 @@
+import time
 from datetime import datetime
 from core.models.article import Article
 from .article import UpdateArticle,Update_Over
@@ -7,7 +8,7 @@ from core.log import logger
 from core.task import TaskScheduler
 from core.models.feed import Feed
 from core.config import cfg,DEBUG
-from core.print import print_info,print_success,print_error
+from core.print import print_info,print_success,print_error,print_warning
 from driver.wx import WX_API
 from driver.success import Success
 wx_db=db.Db(tag="任务调度")
@@ -40,32 +41,111 @@ def do_job(mp=None,task:MessageTask=None):
         # TaskQueue.add_task(test,info=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
         # print("执行任务", task.mps_id)
         print("执行任务")
-        all_count=0
+        poll_feed(mp,[task])
+
+def fetch_feed(mp=None,retry:bool=True):
+        """向微信请求一次公众号最新文章，返回 (新文章列表, 是否成功)"""
+        from driver.token import Accounts
         wx=WxGather().Model()
+        ok=True
         try:
             wx.get_Articles(mp.faker_id,CallBack=UpdateArticle,Mps_id=mp.id,Mps_title=mp.mp_name, MaxPage=1,Over_CallBack=Update_Over,interval=interval)
         except Exception as e:
+            ok=False
             print_error(e)
             # raise
-        finally:
-            count=wx.all_count()
-            all_count+=count
-            from jobs.webhook import MessageWebHook 
-            tms=MessageWebHook(task=task,feed=mp,articles=wx.articles)
+        if getattr(wx,'quarantined',False):
+            # 当前账号被暂停，换一个健康账号重试一次
+            if retry and Accounts.healthy_count()>0:
+                articles,ok=fetch_feed(mp,retry=False)
+                return wx.articles+articles,ok
+            ok=False
+        return wx.articles,ok
+
+def poll_feed(mp=None,tasks:list[MessageTask]=None):
+        """刷新公众号(新鲜期内复用上次结果)，再把各任务尚未通知的文章发出去"""
+        from jobs.refresh import Refresher
+        from jobs.webhook import MessageWebHook 
+        started=time.time()
+        Refresher.refresh(mp.id,lambda:fetch_feed(mp))
+        from jobs.digest import Digests,digest_enabled
+        for task in tasks or []:
+            articles=Refresher.collect(task.id,mp.id,started)
+            if digest_enabled(task):
+                # 汇总模式：先缓冲，到期或达到数量后合并发送
+                pending=Digests.add(task,mp,articles)
+                print_success(f"任务({task.id})[{mp.mp_name}]{len(articles)}篇文章加入汇总,等待发送{pending}篇")
+                continue
+            tms=MessageWebHook(task=task,feed=mp,articles=articles)
             web_hook(tms)
-            print_success(f"任务({task.id})[{mp.mp_name}]执行成功,{count}成功条数")
+            print_success(f"任务({task.id})[{mp.mp_name}]执行成功,{len(articles)}成功条数")
+
+def poll_feed_by_id(mp_id:str,task_ids:list[str]=None):
+    """队列中只保存公众号和任务的ID，执行时重新读取(停用的任务不再通知)后刷新"""
+    from .taskmsg import get_message_task
+    mp=wx_db.get_mps(mp_id)
+    if mp is None or isinstance(mp,Exception):
+        print_warning(f"公众号[{mp_id}]不存在，跳过")
+        return
+    tasks=(get_message_task(list(task_ids)) or []) if task_ids else []
+    poll_feed(mp,tasks)
+
+def merge_feed_tasks(args,kwargs,new_args,new_kwargs):
+    """合并同一公众号等待中的刷新：通知任务ID取并集"""
+    feed_id,task_ids=new_args[0],list(args[1] or [])
+    for task_id in new_args[1] or []:
+        if task_id not in task_ids:
+            task_ids.append(task_id)
+    return (feed_id,task_ids),kwargs
+
+def queue_feed(feed:Feed,tasks:list[MessageTask],priority:str="scheduled",delay:float=0):
+    """把公众号刷新加入队列，每个公众号最多一个等待中的刷新，需要通知的任务合并"""
+    # 同一公众号的任务串行，不同公众号并行
+    return TaskQueue.add_task(poll_feed_by_id,feed.id,[task.id for task in tasks],serial_key=feed.id,
+                              dedupe_key=f"feed:{feed.id}",merge=merge_feed_tasks,priority=priority,delay=delay)
+
+def spread_offsets(task:MessageTask,feeds:list[Feed])->dict:
+    """定时任务触发时把公众号均匀分散到 gather.spread_window 分钟内(不超过到下一次触发的时间)执行，
+    返回 公众号ID->延迟秒数。按 crc32(任务ID:公众号ID) 排序，同一组公众号每次的先后顺序和间隔不变"""
+    import time,zlib
+    window=cfg.get_int("gather.spread_window",0)*60
+    if window<=0 or len(feeds)<2:
+        return {}
+    next_run=scheduler.get_next_run_time(str(task.id))
+    if next_run is not None:
+        # 留出余量，保证本轮在下一次触发前分发完
+        window=min(window,max(0,(next_run.timestamp()-time.time())*0.9))
+    ordered=sorted(feeds,key=lambda feed:zlib.crc32(f"{task.id}:{feed.id}".encode()))
+    step=window/len(ordered)
+    return {feed.id:round(i*step) for i,feed in enumerate(ordered)}
+
+def update_feed(mp_id:str,start_page:int=0,end_page:int=1):
+    """手动更新公众号文章"""
+    mp=wx_db.get_mps(mp_id)
+    if mp is None or isinstance(mp,Exception):
+        print_warning(f"公众号[{mp_id}]不存在，跳过")
+        return []
+    wx=WxGather().Model()
+    wx.get_Articles(mp.faker_id,Mps_id=mp.id,Mps_title=mp.mp_name,CallBack=UpdateArticle,start_page=start_page,MaxPage=end_page)
+    return wx.articles
 
 from core.queue import TaskQueue
-def add_job(feeds:list[Feed]=None,task:MessageTask=None,isTest=False):
-    if isTest:
-        TaskQueue.clear_queue()
+def add_job(feeds:list[Feed]=None,task:MessageTask=None,isTest=False,priority:str="scheduled"):
+    from .worker import lease_enabled,Leases
+    # 定时触发时分散执行，手动执行和测试立即执行
+    offsets=spread_offsets(task,feeds) if not isTest and priority=="scheduled" else {}
     for feed in feeds:
-        TaskQueue.add_task(do_job,feed,task)
+        delay=offsets.get(feed.id,0)
+        if lease_enabled() and not isTest:
+            # 分发到 feed_jobs 表，由工作进程领取
+            Leases.enqueue(feed.id,[task.id],delay=delay)
+            print(f"{feed.mp_name}，分发成功{f'，{delay}秒后执行' if delay else ''}")
+            continue
+        queue_feed(feed,[task],priority,delay)
         if isTest:
             print(f"测试任务，{feed.mp_name}，加入队列成功")
-            reload_job()
             break
-        print(f"{feed.mp_name}，加入队列成功")
+        print(f"{feed.mp_name}，加入队列成功{f'，{delay}秒后执行' if delay else ''}")
     print_success(TaskQueue.get_queue_info())
     pass
 import json
@@ -76,14 +156,51 @@ def get_feeds(task:MessageTask=None):
      if len(mps)==0:
         mps=wx_db.get_all_mps()
      return mps
-scheduler=TaskScheduler()
+# 定时任务保存在数据库中，重启后按各任务的补执行策略处理停机期间错过的执行
+scheduler=TaskScheduler(store="message_tasks")
 def reload_job():
+    # 队列中是持久化的待执行任务，重载调度时保留
     print_success("重载任务")
-    scheduler.clear_all_jobs()
-    TaskQueue.clear_queue()
     start_job()
 
-def run(job_id:str=None,isTest=False):
+def run_task_job(task_id:str):
+    """定时触发的消息任务，每次执行时重新读取任务和订阅的公众号"""
+    from .taskmsg import get_message_task
+    tasks=get_message_task(task_id)
+    if not tasks:
+        print_error(f"任务[{task_id}]不存在或未启用")
+        return
+    add_job(get_feeds(tasks[0]),tasks[0])
+
+def schedule_task(task:MessageTask):
+    """添加或更新一个消息任务的定时调度，触发规则和补执行策略不变时保留原有的下次执行时间"""
+    if not task.cron_exp:
+        print_error(f"任务[{task.id}]没有设置cron表达式")
+        scheduler.remove_job(str(task.id))
+        return None
+    return scheduler.add_cron_job(run_task_job,cron_expr=task.cron_exp,args=[str(task.id)],job_id=str(task.id),tag="定时采集",
+                                  coalesce=bool(task.coalesce) if task.coalesce is not None else None,
+                                  misfire_grace_time=task.misfire_grace_time)
+
+def sync_job(task_id:str):
+    """消息任务新增、修改或删除后只更新该任务的调度，本进程没有运行定时任务时不处理"""
+    from .taskmsg import get_message_task
+    from .refresh import Refresher
+    tasks=get_message_task(task_id)
+    if not tasks:
+        # 已删除或停用的任务不再通知，丢弃它在各公众号上的通知位置
+        Refresher.forget_task(str(task_id))
+    if not scheduler.running or cfg.get("gather.schedule_mode","cron")=="adaptive":
+        return
+    try:
+        if tasks:
+            schedule_task(tasks[0])
+        elif scheduler.remove_job(str(task_id)):
+            print_success(f"已移除任务: {task_id}")
+    except Exception as e:
+        print_error(f"更新任务[{task_id}]调度失败: {e}")
+
+def run(job_id:str=None,isTest=False,priority:str="scheduled"):
     from .taskmsg import get_message_task
     tasks=get_message_task(job_id)
     if not tasks:
@@ -93,31 +210,80 @@ def run(job_id:str=None,isTest=False):
             #添加测试任务
             from core.print import print_warning
             print_warning(f"{task.name} 添加到队列运行")
-            add_job(get_feeds(task),task,isTest=isTest)
+            add_job(get_feeds(task),task,isTest=isTest,priority=priority)
             pass
     return tasks
-def start_job(job_id:str=None):
+def get_feed_tasks(tasks:list[MessageTask]):
+    """汇总所有任务订阅的公众号，返回 公众号列表 和 公众号ID->任务列表"""
+    feeds={}
+    feed_tasks={}
+    for task in tasks:
+        for feed in get_feeds(task):
+            feeds[feed.id]=feed
+            feed_tasks.setdefault(feed.id,[]).append(task)
+    return list(feeds.values()),feed_tasks
+
+def adaptive_tick():
+    """自适应模式的调度周期：按发文频率挑出到期的公众号加入队列"""
     from .taskmsg import get_message_task
-    tasks=get_message_task(job_id)
+    from .adaptive import Planner
+    tasks=get_message_task()
     if not tasks:
-        print("没有任务")
         return
-    tag="定时采集"
-    for task in tasks:
-        cron_exp=task.cron_exp
-        if not cron_exp:
-            print_error(f"任务[{task.id}]没有设置cron表达式")
-            continue
-      
-        job_id=scheduler.add_cron_job(add_job,cron_expr=cron_exp,args=[get_feeds(task),task],job_id=str(task.id),tag="定时采集")
-        print(f"已添加任务: {job_id}")
+    feeds,feed_tasks=get_feed_tasks(tasks)
+    from .worker import lease_enabled,Leases
+    def poll(feed:Feed):
+        if lease_enabled():
+            Leases.enqueue(feed.id,[task.id for task in feed_tasks[feed.id]])
+            return
+        queue_feed(feed,feed_tasks[feed.id])
+    Planner.run_tick(wx_db.get_session(),feeds,poll)
+
+def start_adaptive_job():
+    from .adaptive import Planner
+    Planner.load_config()
+    # 使用固定间隔，周期为60分钟及以上或不能整除60时cron表达式无效或间隔不均匀
+    job_id=scheduler.add_interval_job(adaptive_tick,seconds=Planner.tick*60,job_id="adaptive",tag="自适应采集")
+    print(f"已添加自适应采集任务: {job_id}")
+    return job_id
+
+def start_job(job_id:str=None):
+    # 调度模式 cron: 按任务的cron表达式采集 adaptive: 按公众号发文频率自适应采集
+    if cfg.get("gather.schedule_mode","cron")=="adaptive" and job_id is None:
+        keep={start_adaptive_job()}
+    else:
+        from .taskmsg import get_message_task
+        tasks=get_message_task(job_id) or []
+        if not tasks:
+            print("没有任务")
+        keep=set()
+        for task in tasks:
+            added=schedule_task(task)
+            if added:
+                keep.add(added)
+                print(f"已添加任务: {added}")
+    if job_id is None:
+        # 移除数据库中已删除、已停用的任务和切换调度模式后不再使用的任务
+        for stale in set(scheduler.get_job_ids())-keep:
+            scheduler.remove_job(stale)
+            print(f"已移除任务: {stale}")
     scheduler.start()
     print("启动任务")
 def start_all_task():
+    TaskQueue.run_task_background()
       #开启自动同步未同步 文章任务
     from jobs.fetch_no_article import start_sync_content
     start_sync_content()
     start_job()
+    # 继续上次未完成的历史文章回填
+    from jobs.backfill import Backfill
+    Backfill.start()
+    # 发送重启前未发出的消息汇总
+    from jobs.digest import Digests
+    Digests.start()
+    from jobs.worker import lease_enabled,start_local_worker
+    if lease_enabled():
+        start_local_worker()
 if __name__ == '__main__':
     # do_job()
     # start_all_task()
@@ -0,0 +1,111 @@
+"""公众号刷新层
+
+把"刷新公众号X"和"通知任务Y"分开：
+同一公众号在新鲜期内只向微信请求一次，并发的刷新合并为一次(single-flight)；
+每次刷新得到的新文章按批次保存，每个任务记录自己已通知到的位置，只取之后的批次通知。
+这样请求量只和不同公众号的数量有关，与订阅它们的任务数量无关。
+"""
+import time
+import threading
+from collections import deque
+from typing import Callable
+from core.config import cfg
+
+class FeedState:
+    __slots__ = ("lock", "refreshed_at", "batches")
+
+    def __init__(self, keep: int):
+        self.lock = threading.Lock()
+        self.refreshed_at = 0.0
+        # (刷新时间, 新文章列表)
+        self.batches = deque(maxlen=keep)
+
+class FeedRefresher:
+    def __init__(self, keep: int = 20):
+        self._lock = threading.Lock()
+        self._feeds = {}
+        self._cursors = {}
+        self.keep = keep
+        self.stats = {"fetched": 0, "served": 0, "failed": 0}
+
+    @property
+    def fresh_window(self) -> int:
+        """新鲜期 单位秒，为0时每次都重新请求"""
+        return int(cfg.get("gather.fresh_window", 10)) * 60
+
+    def _state(self, feed_id: str) -> FeedState:
+        with self._lock:
+            state = self._feeds.get(feed_id)
+            if state is None:
+                state = self._feeds[feed_id] = FeedState(self.keep)
+            return state
+
+    def refresh(self, feed_id: str, fetch: Callable[[], tuple], force: bool = False) -> bool:
+        """刷新公众号，新鲜期内直接复用上次结果
+
+        Args:
+            feed_id: 公众号ID
+            fetch: 实际请求函数，返回 (新文章列表, 是否成功)
+            force: 忽略新鲜期强制请求
+
+        Returns:
+            是否真正向微信发起了请求
+        """
+        state = self._state(feed_id)
+        # 同一公众号的刷新串行执行，等待中的调用拿到锁后会发现结果已经是新鲜的
+        with state.lock:
+            now = time.time()
+            if not force and now - state.refreshed_at < self.fresh_window:
+                with self._lock:
+                    self.stats["served"] += 1
+                return False
+            articles, ok = fetch()
+            now = time.time()
+            with self._lock:
+                if articles:
+                    state.batches.append((now, list(articles)))
+                if ok:
+                    state.refreshed_at = now
+                    self.stats["fetched"] += 1
+                else:
+                    self.stats["failed"] += 1
+            return True
+
+    def collect(self, task_id: str, feed_id: str, started: float = None) -> list:
+        """取出任务上次通知之后该公众号新增的文章，并前移任务的位置
+
+        Args:
+            task_id: 任务ID
+            feed_id: 公众号ID
+            started: 本次刷新开始前的时间，首次通知的任务从它往前一个新鲜期开始算，默认为当前时间
+        """
+        state = self._state(feed_id)
+        key = (task_id, feed_id)
+        with self._lock:
+            # 首次通知的任务从新鲜期开始算，以便拿到刚被其他任务刷新出来的文章；
+            # 新鲜期为0时也能拿到本次刷新的文章
+            since = self._cursors.get(key, (started or time.time()) - self.fresh_window)
+            articles = []
+            latest = since
+            for refreshed_at, batch in state.batches:
+                if refreshed_at > since:
+                    articles.extend(batch)
+                    latest = max(latest, refreshed_at)
+            self._cursors[key] = max(latest, state.refreshed_at)
+            return articles
+
+    def forget_task(self, task_id: str) -> None:
+        """任务删除或停用后清理它的通知位置，重新启用时从新鲜期开始通知"""
+        with self._lock:
+            for key in [k for k in self._cursors if k[0] == task_id]:
+                del self._cursors[key]
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "feeds": len(self._feeds),
+                "fresh_window": self.fresh_window,
+                **self.stats,
+            }
+
+Refresher = FeedRefresher()
@@ -0,0 +1,177 @@
+import os
+import time
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from unittest import mock
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from core.models.base import Base
+from core.models.feed import Feed
+from core.models.message_task import MessageTask
+from core.models.message_digest import MessageDigest
+from jobs import digest
+from jobs.digest import DigestRunner
+
+class LocalDigestRunner(DigestRunner):
+    """Uses a temporary database and does not start the check thread."""
+
+    def __init__(self, session_factory):
+        super().__init__()
+        self.session_factory = session_factory
+
+    def _session(self):
+        return self.session_factory()
+
+    def start(self):
+        pass
+
+def reply(result):
+    future = Future()
+    if isinstance(result, Exception):
+        future.set_exception(result)
+    else:
+        future.set_result(result)
+    return future
+
+class TestDigestRunner(unittest.TestCase):
+    """Test cases for buffering, claiming and flushing message digests."""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.dir, 'digest.db')}",
+                                    isolation_level="AUTOCOMMIT")
+        Base.metadata.create_all(self.engine, tables=[MessageTask.__table__, MessageDigest.__table__])
+        self.session = sessionmaker(bind=self.engine)()
+        self.runner = LocalDigestRunner(sessionmaker(bind=self.engine))
+        self.task = MessageTask(id="T1", message_type=1, name="digest", message_template="",
+                                web_hook_url="http://127.0.0.1/hook", mps_id="[]", status=1,
+                                digest_window=10, digest_size=0)
+        self.session.add(self.task)
+        self.session.commit()
+        self.feed = Feed(id="MP1", mp_name="公众号")
+        self.sent = []
+        self.result = {"ok": True}
+        patcher = mock.patch("jobs.webhook.web_hook", side_effect=self.fake_hook)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.session.close()
+        self.engine.dispose()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def fake_hook(self, hook):
+        self.sent.append(hook)
+        return reply(self.result)
+
+    def articles(self, *ids):
+        return [{"id": i, "title": f"title {i}", "publish_time": 0} for i in ids]
+
+    def rows(self):
+        self.session.expire_all()
+        return self.session.query(MessageDigest).order_by(MessageDigest.id).all()
+
+    def test_add_buffers_each_article_once(self):
+        """The same article of a task is buffered only once."""
+        self.assertEqual(self.runner.add(self.task, self.feed, self.articles("a1", "a2")), 2)
+        self.assertEqual(self.runner.add(self.task, self.feed, self.articles("a2", "a3")), 3)
+        self.assertEqual(self.runner.stats["buffered"], 3)
+        self.assertEqual(self.sent, [])
+
+    def test_flush_sends_one_message_and_deletes_rows(self):
+        """Buffered articles of several feeds are sent together, then removed."""
+        self.runner.add(self.task, self.feed, self.articles("a1"))
+        self.runner.add(self.task, Feed(id="MP2", mp_name="其他"), self.articles("b1"))
+        self.assertEqual(self.runner.flush(self.task), 2)
+        self.assertEqual(len(self.sent), 1)
+        hook = self.sent[0]
+        self.assertEqual([a["id"] for a in hook.articles], ["a1", "b1"])
+        self.assertEqual(hook.feed.mp_name, "公众号、其他")
+        self.assertEqual(self.rows(), [])
+        self.assertEqual(self.runner.stats["messages"], 1)
+        self.assertEqual(self.runner.flush(self.task), 0)
+
+    def test_failed_delivery_releases_claim(self):
+        """When the dispatcher reports failure the rows wait for the next check."""
+        self.result = {"ok": False, "error": "HTTP 503"}
+        self.runner.add(self.task, self.feed, self.articles("a1", "a2"))
+        self.assertEqual(self.runner.flush(self.task), 0)
+        rows = self.rows()
+        self.assertEqual(len(rows), 2)
+        self.assertTrue(all(row.batch_id is None and row.claimed_at == 0 for row in rows))
+        self.assertEqual(self.runner.stats["failed"], 1)
+
+    def test_send_error_releases_claim(self):
+        """Exceptions while sending also put the rows back."""
+        self.result = RuntimeError("boom")
+        self.runner.add(self.task, self.feed, self.articles("a1"))
+        with self.assertRaises(RuntimeError):
+            self.runner.flush(self.task)
+        self.assertIsNone(self.rows()[0].batch_id)
+
+    def test_digest_size_wakes_digest_thread(self):
+        """Reaching digest_size wakes the digest thread, which sends without waiting for the window."""
+        self.task.digest_size = 3
+        self.session.commit()
+        self.assertEqual(self.runner.add(self.task, self.feed, self.articles("a1", "a2")), 2)
+        self.assertFalse(self.runner._wake.is_set())
+        self.assertEqual(self.runner.add(self.task, self.feed, self.articles("a3")), 3)
+        self.assertTrue(self.runner._wake.is_set())
+        self.assertEqual(self.sent, [])
+        self.runner.check()
+        self.assertEqual(len(self.sent[0].articles), 3)
+        self.assertEqual(self.rows(), [])
+
+    def test_wait_timeout_keeps_claim(self):
+        """A send still in progress keeps its claim instead of being released for a resend."""
+        self.runner.add(self.task, self.feed, self.articles("a1"))
+        with mock.patch("jobs.webhook.web_hook", side_effect=lambda hook: Future()), \
+                mock.patch.object(digest, "claim_timeout", return_value=digest.CLAIM_MARGIN / 2 + 0.1):
+            self.assertEqual(self.runner.flush(self.task), 0)
+        self.assertIsNotNone(self.rows()[0].batch_id)
+        self.assertEqual(self.runner.stats["failed"], 0)
+
+    def test_claim_timeout_covers_retries(self):
+        """The claim outlives the longest delivery including retries."""
+        from core.notice import Dispatcher
+        self.assertGreater(digest.claim_timeout(), Dispatcher.max_delivery_time())
+
+    def test_check_waits_for_window(self):
+        """check sends only digests whose oldest article waited digest_window minutes."""
+        self.runner.add(self.task, self.feed, self.articles("a1"))
+        self.runner.check()
+        self.assertEqual(self.sent, [])
+        self.session.query(MessageDigest).update({MessageDigest.created_at: datetime.now() - timedelta(minutes=11)})
+        self.session.commit()
+        self.runner.check()
+        self.assertEqual(len(self.sent), 1)
+
+    def test_check_releases_stale_claims(self):
+        """Batches claimed longer than the claim timeout ago are claimable again."""
+        self.task.digest_window = 0
+        self.session.commit()
+        self.runner.add(self.task, self.feed, self.articles("a1", "a2"))
+        self.session.query(MessageDigest).filter(MessageDigest.id == "T1:MP1:a1").update(
+            {MessageDigest.batch_id: "old", MessageDigest.claimed_at: int(time.time() - digest.claim_timeout()) - 1})
+        self.session.query(MessageDigest).filter(MessageDigest.id == "T1:MP1:a2").update(
+            {MessageDigest.batch_id: "running", MessageDigest.claimed_at: int(time.time())})
+        self.session.commit()
+        self.runner.check()
+        self.assertEqual([a["id"] for a in self.sent[0].articles], ["a1"])
+        self.assertEqual([row.batch_id for row in self.rows()], ["running"])
+
+    def test_check_drops_disabled_tasks(self):
+        """Buffers of disabled or deleted tasks are discarded without sending."""
+        self.runner.add(self.task, self.feed, self.articles("a1"))
+        self.runner.add(MessageTask(id="T2"), self.feed, self.articles("a1"))
+        self.task.status = 0
+        self.session.commit()
+        self.runner.check()
+        self.assertEqual(self.sent, [])
+        self.assertEqual(self.rows(), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import time
+import unittest
+from core.config import cfg
+from jobs.refresh import FeedRefresher
+
+class TestFeedRefresher(unittest.TestCase):
+    """Test cases for shared refreshes and per-task cursors."""
+
+    def setUp(self):
+        self.saved = cfg._snapshot.get("gather.fresh_window")
+        cfg._snapshot["gather.fresh_window"] = 10
+        self.refresher = FeedRefresher()
+        self.calls = 0
+
+    def tearDown(self):
+        if self.saved is None:
+            cfg._snapshot.pop("gather.fresh_window", None)
+        else:
+            cfg._snapshot["gather.fresh_window"] = self.saved
+
+    def fetch(self, *articles):
+        def run():
+            self.calls += 1
+            return list(articles), True
+        return run
+
+    def test_fresh_results_are_shared(self):
+        """Within the fresh window a second task reuses the first refresh."""
+        started = time.time()
+        self.assertTrue(self.refresher.refresh("MP1", self.fetch("a1")))
+        self.assertEqual(self.refresher.collect("T1", "MP1", started), ["a1"])
+        self.assertFalse(self.refresher.refresh("MP1", self.fetch("a2")))
+        self.assertEqual(self.refresher.collect("T2", "MP1", started), ["a1"])
+        self.assertEqual(self.calls, 1)
+
+    def test_each_batch_is_collected_once(self):
+        """A task only gets the batches refreshed after its last collect."""
+        self.refresher.refresh("MP1", self.fetch("a1"))
+        self.assertEqual(self.refresher.collect("T1", "MP1"), ["a1"])
+        self.assertEqual(self.refresher.collect("T1", "MP1"), [])
+        self.refresher.refresh("MP1", self.fetch("a2"), force=True)
+        self.assertEqual(self.refresher.collect("T1", "MP1"), ["a2"])
+
+    def test_zero_fresh_window(self):
+        """With fresh_window 0 every refresh fetches and the first collect gets its articles."""
+        cfg._snapshot["gather.fresh_window"] = 0
+        started = time.time()
+        self.refresher.refresh("MP1", self.fetch("a1"))
+        self.assertEqual(self.refresher.collect("T1", "MP1", started), ["a1"])
+        started = time.time()
+        self.assertTrue(self.refresher.refresh("MP1", self.fetch("a2")))
+        self.assertEqual(self.refresher.collect("T1", "MP1", started), ["a2"])
+        self.assertEqual(self.refresher.collect("T2", "MP1", started), ["a2"])
+        self.assertEqual(self.calls, 2)
+
+    def test_forget_task(self):
+        """A forgotten task starts again from the fresh window."""
+        self.refresher.refresh("MP1", self.fetch("a1"))
+        self.refresher.collect("T1", "MP1")
+        self.refresher.forget_task("T1")
+        self.assertEqual(self.refresher.collect("T1", "MP1"), ["a1"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from sqlalchemy import create_engine, select, update
+from core.config import cfg
+from jobs.worker import LeaseQueue, jobs_table, PENDING, LEASED, DONE, FAILED
+
+class TestLeaseQueue(unittest.TestCase):
+    """Test cases for lease claim, renewal and expiry on the feed_jobs table."""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.dir, 'jobs.db')}")
+        jobs_table.create(self.engine)
+        self.queue = LeaseQueue(self.engine)
+        self.saved = {key: cfg._snapshot.get(key) for key in ("gather.lease.ttl", "gather.lease.max_attempts")}
+        cfg._snapshot["gather.lease.ttl"] = 60
+        cfg._snapshot["gather.lease.max_attempts"] = 2
+
+    def tearDown(self):
+        for key, value in self.saved.items():
+            if value is None:
+                cfg._snapshot.pop(key, None)
+            else:
+                cfg._snapshot[key] = value
+        self.engine.dispose()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def row(self, feed_id):
+        with self.engine.connect() as conn:
+            return conn.execute(select(jobs_table).where(jobs_table.c.feed_id == feed_id)).first()
+
+    def expire(self, feed_id):
+        with self.engine.connect() as conn:
+            conn.execute(update(jobs_table).where(jobs_table.c.feed_id == feed_id).values(lease_until=1))
+            conn.commit()
+
+    def test_claim_is_exclusive(self):
+        """A leased feed cannot be claimed by another worker."""
+        self.queue.enqueue("MP1", ["t1"])
+        self.assertEqual(self.queue.claim("w1"), [("MP1", ["t1"])])
+        self.assertEqual(self.queue.claim("w2"), [])
+        row = self.row("MP1")
+        self.assertEqual((row.status, row.lease_owner, row.attempts), (LEASED, "w1", 1))
+
+    def test_enqueue_merges_task_ids(self):
+        """Enqueuing a waiting feed again merges the task ids into one job."""
+        self.queue.enqueue("MP1", ["t2"])
+        self.queue.enqueue("MP1", ["t1", "t2"])
+        self.assertEqual(json.loads(self.row("MP1").task_ids), ["t1", "t2"])
+        self.assertEqual(len(self.queue.claim("w1", limit=5)), 1)
+
+    def test_enqueue_after_done_replaces_task_ids(self):
+        """Task ids of a finished run are not notified again by a later dispatch."""
+        self.queue.enqueue("MP1", ["daily"])
+        self.queue.claim("w1")
+        self.queue.complete("MP1", "w1", ok=True)
+        self.queue.enqueue("MP1", ["hourly"])
+        self.assertEqual(self.queue.claim("w1"), [("MP1", ["hourly"])])
+
+    def test_delayed_job_is_not_claimed_early(self):
+        """A delayed job becomes claimable only after its delay."""
+        self.queue.enqueue("MP1", ["t1"], delay=300)
+        self.assertEqual(self.queue.claim("w1"), [])
+
+    def test_expired_lease_is_reclaimed(self):
+        """When a lease expires another worker takes it over and the old owner loses it."""
+        self.queue.enqueue("MP1", ["t1"])
+        self.queue.claim("w1")
+        self.expire("MP1")
+        self.assertEqual(self.queue.claim("w2"), [("MP1", ["t1"])])
+        self.assertEqual(self.queue.heartbeat("w1", ["MP1"]), 0)
+        self.assertFalse(self.queue.complete("MP1", "w1", ok=True))
+        self.assertEqual(self.row("MP1").attempts, 2)
+        self.assertTrue(self.queue.complete("MP1", "w2", ok=True))
+        self.assertEqual(self.row("MP1").status, DONE)
+
+    def test_heartbeat_extends_lease(self):
+        """A heartbeat from the owner keeps the lease from expiring."""
+        self.queue.enqueue("MP1", ["t1"])
+        self.queue.claim("w1")
+        self.expire("MP1")
+        self.assertEqual(self.queue.heartbeat("w1", ["MP1"]), 1)
+        self.assertGreater(self.row("MP1").lease_until, 1)
+        self.assertEqual(self.queue.claim("w2"), [])
+
+    def test_enqueue_while_leased_reruns(self):
+        """A feed enqueued while running is run again after it completes."""
+        self.queue.enqueue("MP1", ["t1"])
+        self.queue.claim("w1")
+        self.queue.enqueue("MP1", ["t2"])
+        self.assertTrue(self.queue.complete("MP1", "w1", ok=True))
+        self.assertEqual(self.row("MP1").status, PENDING)
+        self.assertEqual(self.queue.claim("w2"), [("MP1", ["t1", "t2"])])
+
+    def test_failures_back_off_then_fail(self):
+        """Failed runs are retried later and marked failed after max_attempts."""
+        self.queue.enqueue("MP1", ["t1"])
+        self.queue.claim("w1")
+        self.queue.complete("MP1", "w1", ok=False, error="boom")
+        row = self.row("MP1")
+        self.assertEqual((row.status, row.last_error), (PENDING, "boom"))
+        self.assertEqual(self.queue.claim("w1"), [])
+        with self.engine.connect() as conn:
+            conn.execute(update(jobs_table).values(available_at=0))
+            conn.commit()
+        self.queue.claim("w1")
+        self.queue.complete("MP1", "w1", ok=False, error="boom")
+        self.assertEqual(self.row("MP1").status, FAILED)
+
+if __name__ == '__main__':
+    unittest.main()
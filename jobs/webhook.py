@@ -2,8 +2,10 @@ from core.models.message_task import MessageTask
 from core.models.feed import Feed
 from core.models.article import Article
 from core.print import print_success
-from core.notice import notice
+from core.notice import notice,Dispatcher
 from dataclasses import dataclass
+from typing import Optional
+from concurrent.futures import Future
 from core.lax import TemplateParser
 from datetime import datetime
 from core.log import logger
@@ -16,9 +18,38 @@ class MessageWebHook:
     task: MessageTask
     feed:Feed
     articles: list[Article]
+    # 汇总发送时文章所属的公众号，为空时只有 feed
+    feeds: list[Feed] = None
     pass
 
-def send_message(hook: MessageWebHook) -> str:
+@dataclass
+class FeedArticles:
+    """模板中 feeds 的元素：一个公众号和它的文章"""
+    id: str
+    mp_name: str
+    articles: list
+
+def group_articles(hook: MessageWebHook, articles: list) -> list[FeedArticles]:
+    """按公众号分组文章，顺序与 hook.feeds 一致"""
+    if not hook.feeds:
+        return [FeedArticles(getattr(hook.feed, "id", None), getattr(hook.feed, "mp_name", ""), articles)]
+    groups = {feed.id: FeedArticles(feed.id, feed.mp_name, []) for feed in hook.feeds}
+    for article in articles:
+        mp_id = article.get("mp_id") if isinstance(article, dict) else getattr(article, "mp_id", None)
+        if mp_id not in groups:
+            groups[mp_id] = FeedArticles(mp_id, "", [])
+        groups[mp_id].articles.append(article)
+    return [group for group in groups.values() if group.articles]
+
+def delivery_log(hook: MessageWebHook) -> dict:
+    """发送结果日志的参数，见 Dispatcher.submit"""
+    return {
+        "task_id": hook.task.id,
+        "mps_id": getattr(hook.feed, "id", None),
+        "update_count": len(hook.articles),
+    }
+
+def send_message(hook: MessageWebHook) -> Optional[Future]:
     """
     发送格式化消息
     
@@ -26,9 +57,17 @@ def send_message(hook: MessageWebHook) -> str:
         hook: MessageWebHook对象，包含任务、订阅源和文章信息
         
     返回:
-        str: 格式化后的消息内容
+        Future: 发送结果，见 Dispatcher.submit，未提交时为 None
     """
-    template = hook.task.message_template if hook.task.message_template else """
+    # 汇总发送时默认按公众号分组列出文章
+    digest_template = """
+### {{task.name}} 订阅汇总：
+{% for group in feeds %}
+#### {{group.mp_name}}
+{% for article in group.articles %}- [**{{ article.title }}**]({{article.url}}) ({{ article.publish_time }})\n{% endfor %}
+{% endfor %}
+    """
+    template = hook.task.message_template if hook.task.message_template else digest_template if hook.feeds else """
 ### {{feed.mp_name}} 订阅消息：
 {% if articles %}
 {% for article in articles %}
@@ -41,6 +80,7 @@ def send_message(hook: MessageWebHook) -> str:
     parser = TemplateParser(template)
     data = {
         "feed": hook.feed,
+        "feeds": group_articles(hook, hook.articles),
         "articles": hook.articles,
         "task": hook.task,
         'now': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -48,10 +88,9 @@ def send_message(hook: MessageWebHook) -> str:
     message = parser.render(data)
     # 这里可以添加发送消息的具体实现
     print("发送消息:", message)
-    notice(hook.task.web_hook_url, hook.task.name, message)
-    return message
+    return notice(hook.task.web_hook_url, hook.task.name, message, **delivery_log(hook))
 
-def call_webhook(hook: MessageWebHook) -> str:
+def call_webhook(hook: MessageWebHook) -> Optional[Future]:
     """
     调用webhook接口发送数据
     
@@ -59,10 +98,7 @@ def call_webhook(hook: MessageWebHook) -> str:
         hook: MessageWebHook对象，包含任务、订阅源和文章信息
         
     返回:
-        str: 调用结果信息
-        
-    异常:
-        ValueError: 当webhook调用失败时抛出
+        Future: 发送结果，请求在后台异步发送，结果写入消息任务日志，未提交时为 None
     """
     template = hook.task.message_template if hook.task.message_template else """{
   "feed": {
@@ -111,6 +147,7 @@ def call_webhook(hook: MessageWebHook) -> str:
     
     data = {
         "feed": hook.feed,
+        "feeds": group_articles(hook, processed_articles),
         "articles": processed_articles,
         "task": hook.task,
         "now": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -145,18 +182,8 @@ def call_webhook(hook: MessageWebHook) -> str:
         logger.error("web_hook_url为空")
         return 
     # 发送webhook请求
-    import requests
     # print_success(f"发送webhook请求{payload}")
-    try:
-        response = requests.post(
-            hook.task.web_hook_url,
-            data=payload,
-            headers={"Content-Type": "application/json"}
-        )
-        response.raise_for_status()
-        return "Webhook调用成功"
-    except Exception as e:
-        raise ValueError(f"Webhook调用失败: {str(e)}")
+    return Dispatcher.submit(hook.task.web_hook_url, content=payload, **delivery_log(hook))
 
 def web_hook(hook:MessageWebHook):
     """
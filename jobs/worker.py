@@ -0,0 +1,272 @@
+"""分布式采集工作进程
+
+gather.dispatch 为 lease 时，调度端不再把公众号刷新放进本进程的 TaskQueue，而是写入 feed_jobs 表；
+任意数量的工作进程(可以在不同主机上)从表中领取公众号执行刷新和通知:
+- MySQL/PostgreSQL 使用 SELECT ... FOR UPDATE SKIP LOCKED 领取，多个进程互不阻塞
+- SQLite 使用带条件的 UPDATE 原子地抢占租约
+- 执行期间定时心跳续约；进程退出或卡死时租约到期，任务会被其他工作进程重新领取
+同一公众号同一时间只会被一个工作进程刷新。
+
+    python job.py --worker                 # 启动一个工作进程
+    python job.py --worker --threads 4     # 一个进程内4个工作线程
+"""
+import os
+import json
+import time
+import socket
+import threading
+from datetime import datetime
+from sqlalchemy import select, update, insert, or_, and_
+from sqlalchemy.exc import IntegrityError
+from core.config import cfg
+from core.models.base import DATA_STATUS
+from core.models.feed_job import FeedJob
+from core.print import print_info, print_warning, print_error, print_success
+
+jobs_table = FeedJob.__table__
+PENDING = DATA_STATUS.PENDING
+LEASED = DATA_STATUS.ACTIVE
+DONE = DATA_STATUS.COMPLETED
+FAILED = DATA_STATUS.FAILED
+
+def lease_enabled() -> bool:
+    return cfg.get("gather.dispatch", "queue") == "lease"
+
+class LeaseQueue:
+    """feed_jobs 表上的租约队列"""
+
+    def __init__(self, engine=None):
+        self._engine = engine
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            from core.db import DB
+            self._engine = DB.get_engine()
+        return self._engine
+
+    @property
+    def ttl(self) -> int:
+        return max(10, cfg.get_int("gather.lease.ttl", 120))
+
+    @property
+    def max_attempts(self) -> int:
+        return max(1, cfg.get_int("gather.lease.max_attempts", 3))
+
+    def _claimable(self, now: int):
+        c = jobs_table.c
+        return or_(and_(c.status == PENDING, c.available_at <= now),
+                   and_(c.status == LEASED, c.lease_until < now))
+
+    def enqueue(self, feed_id: str, task_ids: list, delay: int = 0) -> None:
+        """分发公众号刷新，等待领取或正在刷新的公众号合并需要通知的任务，delay 秒后才能被领取"""
+        c = jobs_table.c
+        available_at = int(time.time()) + max(0, int(delay))
+        task_ids = [str(t) for t in task_ids if t]
+        with self.engine.connect() as conn:
+            for _ in range(3):
+                row = conn.execute(select(c.task_ids, c.status, c.available_at).where(c.feed_id == feed_id)).first()
+                if row is None:
+                    try:
+                        conn.execute(insert(jobs_table).values(
+                            feed_id=feed_id, task_ids=json.dumps(sorted(set(task_ids))), status=PENDING,
+                            available_at=available_at, attempts=0, rerun=0, lease_until=0, heartbeat_at=0,
+                            created_at=datetime.now(), updated_at=datetime.now()))
+                        conn.commit()
+                        return
+                    except IntegrityError:
+                        # 其他调度端同时插入了同一公众号
+                        conn.rollback()
+                        continue
+                values = {"task_ids": json.dumps(sorted(set(task_ids))), "updated_at": datetime.now()}
+                if row.status in (PENDING, LEASED):
+                    values["task_ids"] = json.dumps(sorted(set(json.loads(row.task_ids or "[]")) | set(task_ids)))
+                if row.status == LEASED:
+                    # 正在刷新，完成后再执行一次
+                    values["rerun"] = 1
+                elif row.status == PENDING:
+                    # 已在等待领取，取较早的时间
+                    values.update(available_at=min(row.available_at or 0, available_at), attempts=0)
+                else:
+                    # 已完成或失败的记录是上一次刷新的，只通知这次分发的任务
+                    values.update(status=PENDING, available_at=available_at, attempts=0)
+                result = conn.execute(update(jobs_table).where(c.feed_id == feed_id, c.status == row.status).values(**values))
+                conn.commit()
+                if result.rowcount:
+                    return
+                # 读取后状态已变化(例如刚刚刷新完成)，重新读取
+
+    def claim(self, owner: str, limit: int = 1) -> list:
+        """领取待刷新的公众号，返回 [(公众号ID, 任务ID列表)]"""
+        c = jobs_table.c
+        now = int(time.time())
+        claimable = self._claimable(now)
+        values = {
+            "status": LEASED,
+            "lease_owner": owner,
+            "lease_until": now + self.ttl,
+            "heartbeat_at": now,
+            "attempts": c.attempts + 1,
+            "rerun": 0,
+            "updated_at": datetime.now(),
+        }
+        query = select(c.feed_id, c.task_ids).where(claimable).order_by(c.available_at)
+        if self.engine.dialect.name in ("mysql", "postgresql"):
+            with self.engine.connect() as conn:
+                conn = conn.execution_options(isolation_level="READ COMMITTED")
+                with conn.begin():
+                    rows = conn.execute(query.limit(limit).with_for_update(skip_locked=True)).all()
+                    if rows:
+                        conn.execute(update(jobs_table).where(c.feed_id.in_([r.feed_id for r in rows])).values(**values))
+            return [(r.feed_id, json.loads(r.task_ids or "[]")) for r in rows]
+
+        # SQLite 没有行锁，逐行带条件更新，只有一个进程能更新成功
+        claimed = []
+        with self.engine.connect() as conn:
+            for row in conn.execute(query.limit(limit * 4)).all():
+                if len(claimed) >= limit:
+                    break
+                result = conn.execute(update(jobs_table).where(c.feed_id == row.feed_id, claimable).values(**values))
+                conn.commit()
+                if result.rowcount == 1:
+                    task_ids = conn.execute(select(c.task_ids).where(c.feed_id == row.feed_id)).scalar()
+                    claimed.append((row.feed_id, json.loads(task_ids or "[]")))
+        return claimed
+
+    def heartbeat(self, owner: str, feed_ids: list) -> int:
+        """续约，返回仍持有的任务数"""
+        if not feed_ids:
+            return 0
+        c = jobs_table.c
+        now = int(time.time())
+        with self.engine.connect() as conn:
+            result = conn.execute(update(jobs_table).where(
+                c.feed_id.in_(feed_ids), c.lease_owner == owner, c.status == LEASED,
+            ).values(lease_until=now + self.ttl, heartbeat_at=now))
+            conn.commit()
+            return result.rowcount
+
+    def complete(self, feed_id: str, owner: str, ok: bool, error: str = None) -> bool:
+        """结束租约，失败时按次数退避重试，超过 gather.lease.max_attempts 次标记为失败"""
+        c = jobs_table.c
+        now = int(time.time())
+        held = and_(c.feed_id == feed_id, c.lease_owner == owner, c.status == LEASED)
+        with self.engine.connect() as conn:
+            row = conn.execute(select(c.attempts, c.rerun).where(held)).first()
+            if row is None:
+                print_warning(f"公众号[{feed_id}]的租约已失效，结果未记录")
+                return False
+            values = {"lease_owner": None, "lease_until": 0, "rerun": 0, "updated_at": datetime.now()}
+            if ok or row.rerun:
+                values.update(status=PENDING if row.rerun else DONE, available_at=now, attempts=0,
+                              last_error=None if ok else error)
+            elif row.attempts >= self.max_attempts:
+                values.update(status=FAILED, last_error=error)
+            else:
+                values.update(status=PENDING, available_at=now + min(600, 30 * 2 ** (row.attempts - 1)), last_error=error)
+            result = conn.execute(update(jobs_table).where(held).values(**values))
+            conn.commit()
+            return result.rowcount == 1
+
+    def get_stats(self) -> dict:
+        from sqlalchemy import func
+        c = jobs_table.c
+        names = {PENDING: "pending", LEASED: "leased", DONE: "done", FAILED: "failed"}
+        with self.engine.connect() as conn:
+            rows = conn.execute(select(c.status, func.count()).group_by(c.status)).all()
+        return {names.get(status, str(status)): count for status, count in rows}
+
+Leases = LeaseQueue()
+
+class GatherWorker:
+    """从 feed_jobs 领取公众号并执行刷新和通知"""
+
+    def __init__(self, threads: int = 1, queue: LeaseQueue = None):
+        self.threads = max(1, threads)
+        self.queue = queue or Leases
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self._lock = threading.Lock()
+        # 公众号ID -> 领取者，心跳线程据此续约
+        self._held = {}
+        self._stop = threading.Event()
+        self._threads = []
+
+    @property
+    def poll_interval(self) -> int:
+        return max(1, cfg.get_int("gather.lease.poll", 5))
+
+    def run_job(self, feed_id: str, task_ids: list) -> None:
+        from jobs.mps import poll_feed_by_id
+        poll_feed_by_id(feed_id, task_ids)
+
+    def _loop(self, owner: str) -> None:
+        while not self._stop.is_set():
+            try:
+                claimed = self.queue.claim(owner)
+            except Exception as e:
+                print_error(f"[{owner}]领取任务失败: {e}")
+                self._stop.wait(self.poll_interval)
+                continue
+            if not claimed:
+                self._stop.wait(self.poll_interval)
+                continue
+            for feed_id, task_ids in claimed:
+                with self._lock:
+                    self._held[feed_id] = owner
+                ok, error = True, None
+                try:
+                    self.run_job(feed_id, task_ids)
+                except Exception as e:
+                    ok, error = False, str(e)
+                    print_error(f"[{owner}]刷新公众号[{feed_id}]失败: {e}")
+                finally:
+                    with self._lock:
+                        self._held.pop(feed_id, None)
+                try:
+                    self.queue.complete(feed_id, owner, ok, error)
+                except Exception as e:
+                    print_error(f"[{owner}]记录任务结果失败: {e}")
+
+    def _heartbeat(self) -> None:
+        while not self._stop.wait(self.queue.ttl / 3):
+            with self._lock:
+                held = dict(self._held)
+            owners = {}
+            for feed_id, owner in held.items():
+                owners.setdefault(owner, []).append(feed_id)
+            for owner, feed_ids in owners.items():
+                try:
+                    if self.queue.heartbeat(owner, feed_ids) < len(feed_ids):
+                        print_warning(f"[{owner}]部分租约已被其他工作进程接管: {feed_ids}")
+                except Exception as e:
+                    print_error(f"[{owner}]续约失败: {e}")
+
+    def start(self) -> "GatherWorker":
+        self._stop.clear()
+        for i in range(self.threads):
+            thread = threading.Thread(target=self._loop, args=(f"{self.name}:{i}",), daemon=True, name=f"gather-worker-{i}")
+            thread.start()
+            self._threads.append(thread)
+        threading.Thread(target=self._heartbeat, daemon=True, name="gather-worker-heartbeat").start()
+        print_success(f"采集工作进程[{self.name}]已启动，线程数:{self.threads}")
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def run_forever(self) -> None:
+        self.start()
+        try:
+            while not self._stop.wait(1):
+                pass
+        except KeyboardInterrupt:
+            print_info("采集工作进程退出")
+            self.stop()
+
+_local_worker = None
+def start_local_worker() -> None:
+    """主进程内启动的工作线程，gather.lease.local_workers 为0时主进程只负责分发"""
+    global _local_worker
+    threads = cfg.get_int("gather.lease.local_workers", 1)
+    if _local_worker is None and threads > 0:
+        _local_worker = GatherWorker(threads=threads).start()
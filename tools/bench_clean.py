@@ -0,0 +1,107 @@
+"""文章HTML清理基准测试
+
+对比旧的清理链路(HtmlTools多次BeautifulSoup解析 + 10次正则 + BeautifulSoup改写图片并prettify)
+与 core.content_clean 单次lxml遍历的吞吐和输出体积。
+
+语料为保存下来的文章页面(完整HTML)，每篇一个 .html 文件:
+    python -m tools.bench_clean data/bench/articles
+    python -m tools.bench_clean data/bench/articles -n 5
+"""
+import os
+import re
+import sys
+import time
+import argparse
+
+LEGACY_PATTERNS = [
+    r'<script[^>]*>.*?</script>',
+    r'<style[^>]*>.*?</style>',
+    r'<!--.*?-->',
+    r'<iframe[^>]*>.*?</iframe>',
+    r'<noscript[^>]*>.*?</noscript>',
+    r'<div[^>]*(?:class|id)=["\'][^"\']*(?:ad|advertisement|banner)[^"\']*["\'][^>]*>.*?</div>',
+    r'<header[^>]*>.*?</header>',
+    r'<footer[^>]*>.*?</footer>',
+    r'<nav[^>]*>.*?</nav>',
+    r'<aside[^>]*>.*?</aside>',
+]
+
+def legacy_clean(html_content: str) -> str:
+    """旧链路：HtmlTools.clean_html -> remove_html_region -> BeautifulSoup改写图片 -> prettify"""
+    from bs4 import BeautifulSoup
+    from tools.html import htmltools
+    text = htmltools.clean_html(html_content,
+                                remove_selectors=["link", "head", "script"],
+                                remove_attributes=[
+                                    {"name": "style", "value": "display: none;"},
+                                    {"name": "style", "value": "display:none;"},
+                                    {"name": "aria-hidden", "value": "true"},
+                                ])
+    for pattern in LEGACY_PATTERNS:
+        text = re.sub(pattern, '', text, flags=re.DOTALL | re.IGNORECASE)
+    soup = BeautifulSoup(text, 'html.parser')
+    js_content = soup.find('div', {'id': 'js_content'})
+    if js_content is None:
+        return ""
+    js_content.attrs.pop('style', None)
+    for img_tag in js_content.find_all('img'):
+        if 'data-src' in img_tag.attrs:
+            img_tag['src'] = img_tag['data-src']
+            del img_tag['data-src']
+        if 'style' in img_tag.attrs:
+            img_tag['style'] = re.sub(r'width\s*:\s*\d+\s*px', 'width: 1080px', img_tag['style'])
+    return js_content.prettify()
+
+def pipeline_clean(html_content: str) -> str:
+    from core.content_clean import clean_html
+    return clean_html(html_content, root_id="js_content")
+
+def load_corpus(corpus_dir: str) -> list:
+    docs = []
+    for name in sorted(os.listdir(corpus_dir)):
+        if name.endswith((".html", ".htm")):
+            with open(os.path.join(corpus_dir, name), "r", encoding="utf-8", errors="ignore") as f:
+                docs.append(f.read())
+    return docs
+
+def run(name: str, func, docs: list, rounds: int) -> dict:
+    out_bytes = 0
+    start = time.perf_counter()
+    for _ in range(rounds):
+        out_bytes = 0
+        for doc in docs:
+            out_bytes += len(func(doc).encode("utf-8"))
+    elapsed = time.perf_counter() - start
+    count = len(docs) * rounds
+    return {
+        "name": name,
+        "docs_per_sec": count / elapsed if elapsed else 0,
+        "ms_per_doc": elapsed * 1000 / count if count else 0,
+        "output_kb": out_bytes / 1024,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="文章HTML清理基准测试")
+    parser.add_argument("corpus", nargs="?", default="data/bench/articles", help="保存的文章页面目录")
+    parser.add_argument("-n", "--rounds", type=int, default=3, help="重复轮数")
+    parser.add_argument("--no-legacy", action="store_true", help="只测试新清理链路")
+    args = parser.parse_args()
+
+    docs = load_corpus(args.corpus)
+    if not docs:
+        print(f"语料目录为空: {args.corpus}")
+        return 1
+    input_kb = sum(len(d.encode("utf-8")) for d in docs) / 1024
+    print(f"语料: {len(docs)} 篇, {input_kb:.1f} KB, {args.rounds} 轮")
+
+    results = [run("lxml pipeline", pipeline_clean, docs, args.rounds)]
+    if not args.no_legacy:
+        results.append(run("legacy bs4+regex", legacy_clean, docs, args.rounds))
+    for r in results:
+        print(f"{r['name']:<18} {r['docs_per_sec']:>9.1f} docs/s {r['ms_per_doc']:>9.2f} ms/doc  输出 {r['output_kb']:.1f} KB")
+    if len(results) == 2 and results[0]["ms_per_doc"]:
+        print(f"加速比: {results[1]['ms_per_doc'] / results[0]['ms_per_doc']:.1f}x")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
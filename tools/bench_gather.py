@@ -0,0 +1,179 @@
+"""采集基准测试
+
+在进程内启动 tools.wxmock 模拟服务，分别运行 MpsWeb/MpsApi/MpsAppMsg 采集器和正文提取器，
+输出 每秒文章数、每篇文章请求数 和 内存峰值。不需要真实登录会话，不写数据库。
+
+    python -m tools.bench_gather
+    python -m tools.bench_gather --models app,web --pages 3 --latency 80 --content
+    python -m tools.bench_gather --extractors http,api,web --articles 20
+    python -m tools.bench_gather --mode freq          # 频率限制时的表现
+
+注意: MpsApi 每篇文章之间固定随机等待1~3秒，耗时主要来自等待；
+web 提取器和 web 模式采集正文需要安装 Playwright 浏览器。
+"""
+import time
+import json
+import argparse
+import tracemalloc
+from tools.wxmock import WxMockServer, MockData
+
+MODELS = {
+    "web": ("core.wx.model.web", "MpsWeb"),
+    "api": ("core.wx.model.api", "MpsApi"),
+    "app": ("core.wx.model.app", "MpsAppMsg"),
+}
+
+def bench_class(base_cls, host: str, content: bool):
+    """在采集器外层包一层：令牌、接口地址指向模拟服务，不更新公众号状态、不发送授权通知"""
+
+    class BenchGather(base_cls):
+        aids = []
+        errors = []
+
+        def get_token(self, acquire: bool = False):
+            self.account = None
+            self.Gather_Content = content
+            self.cookies = "bench=1"
+            self.token = "bench"
+            self.headers = {"Cookie": self.cookies, "User-Agent": "WeRss-Bench"}
+
+        def mp_url(self, path: str) -> str:
+            return host + path
+
+        def update_mps(self, mp_id, mp):
+            pass
+
+        def Error(self, error: str, code=None):
+            self.errors.append(code or error)
+            self.quarantined = code in ("Invalid Session", "Frequency Control")
+            self.Over()
+            if code == "Invalid Session":
+                raise Exception(error)
+
+    return BenchGather
+
+def measure(func) -> dict:
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        count = func()
+    finally:
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {"count": count, "seconds": elapsed, "peak_kb": peak / 1024}
+
+def run_model(server: WxMockServer, name: str, pages: int, content: bool) -> dict:
+    import importlib
+    module, cls_name = MODELS[name]
+    cls = bench_class(getattr(importlib.import_module(module), cls_name), server.base_url, content)
+    collected = []
+
+    def collect(art: dict) -> bool:
+        collected.append(art["id"])
+        return True
+
+    def gather():
+        for fakeid, feed in server.data.feeds.items():
+            wx = cls()
+            try:
+                wx.get_Articles(fakeid, Mps_id=fakeid, Mps_title=feed["nickname"], CallBack=collect,
+                                MaxPage=pages, interval=0, Gather_Content=content)
+            except Exception as e:
+                cls.errors.append(str(e))
+        return len(collected)
+
+    server.reset_stats()
+    result = measure(gather)
+    result.update(requests=server.stats(), errors=len(cls.errors))
+    return result
+
+def run_extractor(server: WxMockServer, name: str, urls: list) -> dict:
+    if name == "http":
+        from core.wx.extract import TieredExtractor
+        extractor = TieredExtractor()
+        extract = lambda url: extractor.extract_http(url) or ""
+    elif name == "api":
+        from core.wx.base import WxGather
+        cls = bench_class(WxGather, server.base_url, True)
+        gather = cls()
+        extract = gather.content_extract
+    elif name == "web":
+        from driver.wxarticle import Web
+        extract = lambda url: Web.get_article_content(url).get("content") or ""
+    else:
+        raise ValueError(f"未知的提取器: {name}")
+
+    def run():
+        ok = 0
+        for url in urls:
+            if extract(url):
+                ok += 1
+        return ok
+
+    server.reset_stats()
+    try:
+        result = measure(run)
+    finally:
+        if name == "web":
+            from driver.wxarticle import Web
+            Web.Close()
+    result.update(requests=server.stats(), errors=len(urls) - result["count"])
+    return result
+
+def report(name: str, result: dict) -> dict:
+    count, seconds = result["count"], result["seconds"]
+    requests = result["requests"].get("total", 0)
+    row = {
+        "name": name,
+        "articles": count,
+        "articles_per_sec": round(count / seconds, 2) if seconds else 0,
+        "requests_per_article": round(requests / count, 2) if count else None,
+        "requests": requests,
+        "errors": result["errors"],
+        "peak_kb": round(result["peak_kb"], 1),
+        "seconds": round(seconds, 2),
+    }
+    rpa = row["requests_per_article"] if row["requests_per_article"] is not None else "-"
+    print(f"{name:<16} {count:>6} 篇 {row['articles_per_sec']:>9} 篇/秒 {rpa:>6} 请求/篇 "
+          f"峰值 {row['peak_kb']:>9} KB  错误 {row['errors']}  耗时 {row['seconds']}s")
+    return row
+
+def main():
+    parser = argparse.ArgumentParser(description="采集基准测试")
+    parser.add_argument("--models", default="app,web,api", help="采集器 app,web,api，为空不测试")
+    parser.add_argument("--extractors", default="http,api", help="正文提取器 http,api,web，为空不测试")
+    parser.add_argument("--pages", type=int, default=2, help="每个公众号采集页数")
+    parser.add_argument("--feeds", type=int, default=3, help="模拟公众号数量")
+    parser.add_argument("--articles", type=int, default=20, help="提取器测试的文章数")
+    parser.add_argument("--content", action="store_true", help="采集器同时采集正文")
+    parser.add_argument("--fixtures", default=None, help="录制的响应目录")
+    parser.add_argument("--latency", type=int, default=0, help="模拟服务响应延迟 单位毫秒")
+    parser.add_argument("--jitter", type=int, default=0, help="延迟抖动 单位毫秒")
+    parser.add_argument("--mode", default="ok", choices=["ok", "freq", "session"])
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--verify-rate", type=float, default=0.0)
+    parser.add_argument("--json", default=None, help="把结果写入JSON文件")
+    args = parser.parse_args()
+
+    server = WxMockServer(fixtures=args.fixtures, latency=args.latency, jitter=args.jitter,
+                          mode=args.mode, error_rate=args.error_rate, verify_rate=args.verify_rate,
+                          data=MockData(feeds=args.feeds)).start()
+    print(f"模拟服务: {server.base_url}")
+    rows = []
+    try:
+        for name in filter(None, args.models.split(",")):
+            rows.append(report(f"model:{name}", run_model(server, name, args.pages, args.content)))
+        aids = [item["aid"] for feed in server.data.feeds.values() for push in feed["pushes"] for item in push]
+        urls = [f"{server.base_url}/s/{aid}" for aid in aids[:args.articles]]
+        for name in filter(None, args.extractors.split(",")):
+            rows.append(report(f"extract:{name}", run_extractor(server, name, urls)))
+    finally:
+        server.stop()
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
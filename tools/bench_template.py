@@ -0,0 +1,116 @@
+"""消息模板渲染基准测试
+
+使用消息通知和 WebHook 的默认模板以及一个自定义 RSS 模板，渲染包含 N 篇文章的上下文，
+分别输出 预编译(模板缓存命中) 和 每次重新编译 的每秒渲染次数。
+
+    python -m tools.bench_template
+    python -m tools.bench_template --articles 100 --rounds 500
+"""
+import time
+import argparse
+from datetime import datetime
+from core.lax.template_parser import TemplateParser, compile_template
+
+MESSAGE_TEMPLATE = """
+### {{feed.mp_name}} 订阅消息：
+{% if articles %}
+{% for article in articles %}
+- [**{{ article.title }}**]({{article.url}}) ({{ article.publish_time }})\n
+{% endfor %}
+{% else %}
+- 暂无文章\n
+{% endif %}
+    """
+
+WEBHOOK_TEMPLATE = """{
+  "feed": {
+    "id": "{{ feed.id }}",
+    "name": "{{ feed.mp_name }}"
+  },
+  "articles": [
+    {% if articles %}
+     {% for article in articles %}
+        {
+          "id": "{{ article.id }}",
+          "mp_id": "{{ article.mp_id }}",
+          "title": "{{ article.title }}",
+          "pic_url": "{{ article.pic_url }}",
+          "url": "{{ article.url }}",
+          "description": "{{ article.description }}",
+          "publish_time": "{{ article.publish_time }}"
+        }{% if not loop.last %},{% endif %}
+      {% endfor %}
+    {% endif %}
+  ],
+  "task": {
+    "id": "{{ task.id }}",
+    "name": "{{ task.name }}"
+  },
+  "now": "{{ now }}"
+}
+"""
+
+RSS_TEMPLATE = """<rss version="2.0"><channel><title>{{ title }}</title><link>{{ link }}</link>
+{% for article in articles %}<item>
+<title>{{ article.title }}</title>
+<link>{{ article.link }}</link>
+<description>{{= article['description'][:120] }}</description>
+<pubDate>{{ article.updated }}</pubDate>{% if article.pic_url %}
+<enclosure url="{{ article.pic_url }}" type="image/jpeg"/>{% endif %}
+</item>{% endfor %}
+</channel></rss>"""
+
+TEMPLATES = {"message": MESSAGE_TEMPLATE, "webhook": WEBHOOK_TEMPLATE, "rss": RSS_TEMPLATE}
+
+def make_context(count: int) -> dict:
+    articles = []
+    for i in range(count):
+        articles.append({
+            "id": f"aid_{i}",
+            "mp_id": "MP_WXS_1",
+            "title": f"文章标题 {i}",
+            "pic_url": f"https://mmbiz.qpic.cn/{i}.jpg" if i % 3 else "",
+            "url": f"https://mp.weixin.qq.com/s/{i}",
+            "link": f"https://mp.weixin.qq.com/s/{i}",
+            "description": "文章摘要" * 40,
+            "publish_time": "2025-10-24 08:00:00",
+            "updated": "2025-10-24 08:00:00",
+        })
+    return {
+        "feed": {"id": "MP_WXS_1", "mp_name": "测试公众号"},
+        "task": {"id": "task_1", "name": "基准测试"},
+        "articles": articles,
+        "now": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "title": "测试公众号",
+        "link": "https://github.com/rachelos/we-mp-rss",
+    }
+
+def run(template: str, context: dict, rounds: int, cold: bool) -> dict:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        if cold:
+            compile_template.cache_clear()
+        TemplateParser(template).render(dict(context))
+    elapsed = time.perf_counter() - start
+    return {
+        "renders_per_sec": rounds / elapsed if elapsed else 0,
+        "ms_per_render": elapsed * 1000 / rounds,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="消息模板渲染基准测试")
+    parser.add_argument("--articles", type=int, default=100, help="每次渲染的文章数")
+    parser.add_argument("--rounds", type=int, default=200, help="每个模板的渲染次数")
+    parser.add_argument("--templates", default=",".join(TEMPLATES), help="逗号分隔: message,webhook,rss")
+    args = parser.parse_args()
+
+    context = make_context(args.articles)
+    print(f"{'模板':<10}{'模式':<8}{'次/秒':>12}{'毫秒/次':>12}")
+    for name in args.templates.split(","):
+        template = TEMPLATES[name.strip()]
+        for mode, cold in (("编译", True), ("缓存", False)):
+            result = run(template, context, args.rounds, cold)
+            print(f"{name:<10}{mode:<8}{result['renders_per_sec']:>12.1f}{result['ms_per_render']:>12.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -733,8 +733,18 @@ class MarkdownToWordConverter:
             str: 临时文件路径，下载失败返回None
         """
         try:
-          
-            
+            # 已保存到本地图片库的图片直接复制，不再重复下载
+            from core.res.images import Images
+            local_file = Images.resolve(url)
+            if local_file is None and url.startswith(("http://", "https://", "//")):
+                result = Images.fetch(url)
+                local_file = Images.path(result["path"]) if result else None
+            if local_file:
+                import shutil
+                temp_path = os.path.join(tempfile.gettempdir(), sha256(url.encode()).hexdigest() + os.path.splitext(local_file)[1])
+                shutil.copyfile(local_file, temp_path)
+                return temp_path
+
             # 验证URL
             parsed = urlparse(url)
             if not all([parsed.scheme, parsed.netloc]):
@@ -0,0 +1,276 @@
+"""公众号平台模拟服务
+
+在本地回放 cgi-bin/appmsgpublish、cgi-bin/appmsg、cgi-bin/searchbiz 接口和文章页面，
+用于在没有真实登录会话的情况下测试和评估采集性能。
+
+录制的响应放在 fixtures 目录中(没有时自动生成模拟数据):
+    appmsgpublish/<fakeid>_<begin>.json   或 appmsgpublish.json(所有请求共用)
+    appmsg/<fakeid>_<begin>.json          或 appmsg.json
+    searchbiz/<query>.json                或 searchbiz.json
+    s/<文章ID>.html
+响应中的 https://mp.weixin.qq.com 链接会被替换为模拟服务地址。
+
+错误模式:
+    mode=ok       正常返回
+    mode=freq     列表接口返回 200013(频率限制)
+    mode=session  列表接口返回 200003(会话失效)
+    error_rate    列表接口按比例随机返回 200013
+    verify_rate   文章页按比例返回环境异常验证页
+
+运行:
+    python -m tools.wxmock --port 8090 --latency 80 --jitter 40
+    python -m tools.wxmock --fixtures data/bench/wx --mode freq
+运行中可通过 /__stats 查看请求计数，/__mode?mode=freq 切换错误模式。
+"""
+import os
+import json
+import time
+import random
+import threading
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+WX_HOST = "https://mp.weixin.qq.com"
+VERIFY_PAGE = "<html><body><p>当前环境异常，完成验证后即可继续访问</p></body></html>"
+ERRORS = {
+    "freq": {"ret": 200013, "err_msg": "freq control"},
+    "session": {"ret": 200003, "err_msg": "invalid session"},
+}
+
+class MockData:
+    """模拟数据：每个公众号若干次推送，每次推送1~3篇文章"""
+
+    def __init__(self, feeds: int = 5, pushes: int = 20, paragraphs: int = 40, seed: int = 0):
+        self.rand = random.Random(seed)
+        self.paragraphs = paragraphs
+        self.now = int(time.time())
+        self.feeds = {}
+        for n in range(feeds):
+            fakeid = f"MzA{n:07d}"
+            items = []
+            for p in range(pushes):
+                ts = self.now - p * 86400 - self.rand.randint(0, 3600)
+                items.append([{
+                    "aid": f"{fakeid}_{p}_{i}",
+                    "appmsgid": 100000 + p,
+                    "itemidx": i + 1,
+                    "title": f"模拟文章 {n}-{p}-{i}",
+                    "digest": f"公众号{n}第{p}次推送的第{i + 1}篇文章摘要",
+                    "update_time": ts,
+                    "create_time": ts,
+                } for i in range(self.rand.randint(1, 3))])
+            self.feeds[fakeid] = {"nickname": f"模拟公众号{n}", "pushes": items}
+
+    def article(self, base: str, item: dict) -> dict:
+        return dict(item, link=f"{base}/s/{item['aid']}", cover=f"{base}/img/{item['aid']}.png")
+
+    def publish_page(self, base: str, fakeid: str, begin: int, count: int) -> dict:
+        pushes = self.feeds.get(fakeid, {}).get("pushes", [])
+        publish_list = [{
+            "publish_type": 101,
+            "publish_info": json.dumps({"appmsgex": [self.article(base, item) for item in push]}, ensure_ascii=False),
+        } for push in pushes[begin:begin + count]]
+        page = {"total_count": len(pushes), "publish_count": len(pushes), "publish_list": publish_list}
+        return {"base_resp": {"ret": 0, "err_msg": "ok"}, "publish_page": json.dumps(page, ensure_ascii=False)}
+
+    def appmsg(self, base: str, fakeid: str, begin: int, count: int) -> dict:
+        items = [item for push in self.feeds.get(fakeid, {}).get("pushes", []) for item in push]
+        return {
+            "base_resp": {"ret": 0, "err_msg": "ok"},
+            "app_msg_cnt": len(items),
+            "app_msg_list": [self.article(base, item) for item in items[begin:begin + count]],
+        }
+
+    def searchbiz(self, base: str, query: str, begin: int, count: int) -> dict:
+        hits = [(fakeid, feed) for fakeid, feed in self.feeds.items() if query in feed["nickname"]]
+        return {
+            "base_resp": {"ret": 0, "err_msg": "ok"},
+            "list": [{
+                "fakeid": fakeid,
+                "nickname": feed["nickname"],
+                "alias": fakeid.lower(),
+                "round_head_img": f"{base}/img/{fakeid}.png",
+                "service_type": 1,
+            } for fakeid, feed in hits[begin:begin + count]],
+            "total": len(hits),
+        }
+
+    def page(self, base: str, aid: str) -> str:
+        rand = random.Random(aid)
+        body = []
+        for i in range(self.paragraphs):
+            body.append(f'<section style="margin: 0 8px;"><p><span style="font-size: 15px;">第{i + 1}段 {"内容" * rand.randint(20, 60)}</span></p></section>')
+            if i % 8 == 0:
+                body.append(f'<p><img class="rich_pages" data-src="{base}/img/{aid}_{i}.png" style="width: 677px !important;"></p>')
+            if i % 15 == 0:
+                body.append('<p><span style="display:none">隐藏内容</span></p><p><br></p>')
+        return (
+            '<!DOCTYPE html><html><head><meta charset="utf-8"><title>模拟文章</title>'
+            '<script>var biz = "MzA0000000"; var ct = "1700000000";</script>'
+            '<link rel="stylesheet" href="/style.css"></head><body>'
+            f'<div id="js_article"><h1 id="activity-name" class="rich_media_title">模拟文章 {aid}</h1>'
+            '<a id="js_name">模拟公众号</a><em id="publish_time">2024-01-01 08:00</em>'
+            f'<div id="js_content" class="rich_media_content" style="visibility: hidden;">{"".join(body)}</div>'
+            '</div><script>window.__report && __report();</script></body></html>'
+        )
+
+class WxMockServer:
+    """模拟服务，可在进程内启动供基准测试使用"""
+
+    def __init__(self, fixtures: str = None, host: str = "127.0.0.1", port: int = 0,
+                 latency: int = 0, jitter: int = 0, mode: str = "ok",
+                 error_rate: float = 0.0, verify_rate: float = 0.0, data: MockData = None):
+        self.fixtures = fixtures
+        self.latency = latency
+        self.jitter = jitter
+        self.mode = mode
+        self.error_rate = error_rate
+        self.verify_rate = verify_rate
+        self.data = data or MockData()
+        self.rand = random.Random(1)
+        self._lock = threading.Lock()
+        self.reset_stats()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.counts = {}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counts, total=sum(self.counts.values()))
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def _fixture(self, endpoint: str, key: str, ext: str = "json"):
+        if not self.fixtures:
+            return None
+        for path in (os.path.join(self.fixtures, endpoint, f"{key}.{ext}"),
+                     os.path.join(self.fixtures, f"{endpoint}.{ext}")):
+            if os.path.isfile(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    return f.read().replace(WX_HOST, self.base_url)
+        return None
+
+    def _delay(self) -> None:
+        if self.latency or self.jitter:
+            time.sleep(max(0, self.latency + self.rand.uniform(-self.jitter, self.jitter)) / 1000)
+
+    def _list_error(self):
+        if self.mode in ERRORS:
+            return ERRORS[self.mode]
+        if self.error_rate and self.rand.random() < self.error_rate:
+            return ERRORS["freq"]
+        return None
+
+    def handle(self, path: str, query: dict):
+        """返回 (状态码, content-type, 响应内容)"""
+        base = self.base_url
+        endpoint = path.rsplit("/", 1)[-1]
+        begin = int(query.get("begin", 0) or 0)
+        count = int(query.get("count", 5) or 5)
+        if path in ("/cgi-bin/appmsgpublish", "/cgi-bin/appmsg", "/cgi-bin/searchbiz"):
+            self._count(endpoint)
+            error = self._list_error()
+            if error:
+                return 200, "application/json", json.dumps({"base_resp": error})
+            key = query.get("query", "") if endpoint == "searchbiz" else f"{query.get('fakeid', '')}_{begin}"
+            body = self._fixture(endpoint, key)
+            if body is None:
+                if endpoint == "searchbiz":
+                    data = self.data.searchbiz(base, key, begin, count)
+                else:
+                    data = getattr(self.data, "publish_page" if endpoint == "appmsgpublish" else "appmsg")(
+                        base, query.get("fakeid", ""), begin, count)
+                body = json.dumps(data, ensure_ascii=False)
+            return 200, "application/json", body
+        if path.startswith("/s/"):
+            self._count("article")
+            if self.verify_rate and self.rand.random() < self.verify_rate:
+                return 200, "text/html; charset=utf-8", VERIFY_PAGE
+            aid = path[3:]
+            body = self._fixture("s", aid, "html")
+            return 200, "text/html; charset=utf-8", body if body is not None else self.data.page(base, aid)
+        if path.startswith("/img/"):
+            self._count("image")
+            # 1x1 透明PNG
+            return 200, "image/png", bytes.fromhex(
+                "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+                "1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082")
+        if path == "/__stats":
+            return 200, "application/json", json.dumps(self.stats())
+        if path == "/__mode":
+            self.mode = query.get("mode", "ok")
+            return 200, "application/json", json.dumps({"mode": self.mode})
+        return 404, "text/plain", "not found"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                if not url.path.startswith("/__"):
+                    server._delay()
+                status, content_type, body = server.handle(url.path, query)
+                data = body if isinstance(body, bytes) else body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "WxMockServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description="公众号平台模拟服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--fixtures", default=None, help="录制的响应目录")
+    parser.add_argument("--latency", type=int, default=0, help="响应延迟 单位毫秒")
+    parser.add_argument("--jitter", type=int, default=0, help="延迟抖动 单位毫秒")
+    parser.add_argument("--mode", default="ok", choices=["ok", "freq", "session"])
+    parser.add_argument("--error-rate", type=float, default=0.0, help="随机返回200013的比例")
+    parser.add_argument("--verify-rate", type=float, default=0.0, help="文章页返回验证页的比例")
+    parser.add_argument("--feeds", type=int, default=5, help="模拟公众号数量")
+    parser.add_argument("--pushes", type=int, default=20, help="每个公众号的推送次数")
+    args = parser.parse_args()
+
+    server = WxMockServer(fixtures=args.fixtures, host=args.host, port=args.port,
+                          latency=args.latency, jitter=args.jitter, mode=args.mode,
+                          error_rate=args.error_rate, verify_rate=args.verify_rate,
+                          data=MockData(feeds=args.feeds, pushes=args.pushes))
+    print(f"模拟服务已启动: {server.base_url}  (gather.mp_host 设置为该地址即可使用)")
+    print("公众号fakeid: " + ", ".join(server.data.feeds))
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
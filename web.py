@@ -58,6 +58,11 @@ async def add_custom_header(request: Request, call_next):
     response.headers["GITHUB"] = "https://github.com/rachelos/we-mp-rss"
     response.headers["Server"] = cfg.get("app_name", "WeRSS")
     return response
+@app.on_event("startup")
+def start_queue():
+    # 接口加入的队列任务由本进程执行，多个工作进程共用持久化队列时每个任务只会被一个进程认领
+    from core.queue import TaskQueue
+    TaskQueue.run_task_background()
 # 创建API路由分组
 api_router = APIRouter(prefix=f"{API_BASE}")
 api_router.include_router(auth_router)
@@ -1,7 +1,8 @@
 export const RES_BASE_URL = "/static/res/logo/"
-export const Avatar = (url) => {
+// width 大于0时返回该宽度的WebP缩略图
+export const Avatar = (url, width = 0) => {
   if (url.startsWith('http://') || url.startsWith('https://')) {
-      return `${RES_BASE_URL}${url}`;
+      return width ? `${RES_BASE_URL}${url}?w=${width}&fmt=webp` : `${RES_BASE_URL}${url}`;
     }
     return url;
 }
\ No newline at end of file